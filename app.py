@@ -1,6 +1,7 @@
 from flask import Flask, render_template, Response, jsonify, request
 from flask_socketio import SocketIO
 import cv2
+import numpy as np
 import base64
 import logging
 import os
@@ -16,6 +17,13 @@ from modules.snake_game import SnakeGame
 from modules.keyboard_controller import KeyboardController
 from modules.gesture_config import GestureConfig
 from modules.drawing import DrawingCanvas
+from modules.tracing import LatencyTracker
+from modules.preprocess import FrameContext
+from modules.inference_pool import create_inference_pool
+from modules.scheduler import create_inference_scheduler
+from modules.effects import EffectChain
+from modules.matrix_effect import MatrixEffect
+from modules.background_effect import BackgroundEffect
 
 # 加载环境变量
 load_dotenv()
@@ -50,6 +58,16 @@ gesture_recognizer = GestureRecognizer()
 face_recognizer = FaceRecognizer()
 stats_tracker = StatsTracker()
 
+# 初始化特效链，新增特效只需在这里注册
+effect_chain = EffectChain()
+effect_chain.register(BackgroundEffect())
+effect_chain.register(MatrixEffect())
+
+# 贪吃蛇预览使用独立的特效链（320x240，在游戏线程中运行），每帧同步主特效链的设置
+preview_effect_chain = EffectChain()
+preview_effect_chain.register(BackgroundEffect())
+preview_effect_chain.register(MatrixEffect())
+
 # 初始化键盘控制器
 keyboard_controller = KeyboardController()
 
@@ -63,9 +81,25 @@ drawing_canvas = DrawingCanvas()
 face_recognition_enabled = False
 keyboard_shortcuts_enabled = False
 
+# 延迟追踪：各循环各阶段的滚动分位数，可选地随帧发送追踪数据
+latency_tracker = LatencyTracker()
+trace_payload_enabled = os.environ.get('TRACE_PAYLOAD', '0') == '1'
+
 # 初始化贪吃蛇游戏
 snake_game = SnakeGame()
 
+# 等待新帧的最长时间（秒），超时视为获取帧失败
+FRAME_WAIT_TIMEOUT = 0.5
+
+# 推理进程池（INFERENCE_WORKERS > 0 时在第一次请求视频帧时启动）
+inference_pool = None
+inference_pool_initialized = False
+pooled_loop_running = False
+
+# 推理调度器（INFERENCE_SCHEDULER=1 时在第一次请求视频帧时启动）
+inference_scheduler = None
+inference_scheduler_initialized = False
+
 @app.route('/')
 def index():
     """渲染主页"""
@@ -116,16 +150,47 @@ def handle_stop_camera(data=None):
 
 @socketio.on('toggle_effect')
 def handle_toggle_effect(data=None):
-    """切换特效"""
-    effect_enabled = gesture_recognizer.toggle_matrix_effect()
-    logger.info(f'特效状态: {"开启" if effect_enabled else "关闭"}')
-    return {'status': 'success', 'enabled': effect_enabled}
+    """切换特效，data 中的 effect 指定特效名称，默认为黑客帝国特效"""
+    name = (data or {}).get('effect', 'matrix')
+    effect_enabled = effect_chain.toggle(name)
+    if effect_enabled is None:
+        return {'status': 'error', 'message': f'未知的特效: {name}'}
+    logger.info(f'特效 {name} 状态: {"开启" if effect_enabled else "关闭"}')
+    return {'status': 'success', 'effect': name, 'enabled': effect_enabled}
+
+@socketio.on('get_effects')
+def handle_get_effects(data=None):
+    """获取已注册的特效及其顺序、开关和更新间隔"""
+    return {'status': 'success', 'effects': effect_chain.get_effects()}
+
+@socketio.on('set_effect_order')
+def handle_set_effect_order(data=None):
+    """调整特效顺序"""
+    order = (data or {}).get('order', [])
+    if not effect_chain.set_order(order):
+        return {'status': 'error', 'message': f'无效的特效顺序: {order}'}
+    return {'status': 'success', 'effects': effect_chain.get_effects()}
+
+@socketio.on('set_effect_interval')
+def handle_set_effect_interval(data=None):
+    """设置特效的更新间隔（帧）"""
+    data = data or {}
+    name = data.get('effect')
+    try:
+        interval = int(data.get('interval', 1))
+    except (TypeError, ValueError):
+        return {'status': 'error', 'message': '无效的更新间隔'}
+    if not effect_chain.set_interval(name, interval):
+        return {'status': 'error', 'message': f'未知的特效: {name}'}
+    return {'status': 'success', 'effects': effect_chain.get_effects()}
 
 @socketio.on('toggle_face_recognition')
 def handle_toggle_face_recognition(data=None):
     """切换面部识别"""
     global face_recognition_enabled
     face_recognition_enabled = not face_recognition_enabled
+    if inference_scheduler is not None:
+        inference_scheduler.set_face_enabled(face_recognition_enabled)
     logger.info(f'面部识别状态: {"开启" if face_recognition_enabled else "关闭"}')
     return {'status': 'success', 'enabled': face_recognition_enabled}
 
@@ -137,12 +202,167 @@ def handle_toggle_keyboard_shortcuts(data=None):
     logger.info(f'键盘快捷键状态: {"开启" if keyboard_shortcuts_enabled else "关闭"}')
     return {'status': 'success', 'enabled': keyboard_shortcuts_enabled}
 
-def process_frame():
-    """处理视频帧并发送到客户端"""
-    logger.info('视频处理线程已启动')
+@socketio.on('toggle_trace_payload')
+def handle_toggle_trace_payload(data=None):
+    """切换是否随帧发送延迟追踪数据"""
+    global trace_payload_enabled
+    trace_payload_enabled = not trace_payload_enabled
+    logger.info(f'延迟追踪数据: {"开启" if trace_payload_enabled else "关闭"}')
+    return {'status': 'success', 'enabled': trace_payload_enabled}
+
+def emit_processed_frame(frame, trace, context, hand_frame=None, face_landmarks=None, update_hands=True, update_faces=True):
+    """
+    识别、标注一帧并发送到客户端，进程内推理和推理进程池两种处理循环共用
+    
+    @param {numpy.ndarray} frame - 原始视频帧
+    @param {FrameTrace} trace - 延迟追踪记录
+    @param {FrameContext} context - 复用的预处理和标注缓冲区
+    @param {HandFrame|None} hand_frame - 推理进程池返回的手部关键点
+    @param {numpy.ndarray|None} face_landmarks - 推理进程池返回的面部关键点
+    @param {bool} update_hands - 手部关键点是否为新结果，为False时只绘制上一次的识别结果
+    @param {bool} update_faces - 面部关键点是否为新结果，为False时只绘制，不更新表情状态
+    @returns {bool} 是否发送了处理后的帧（失败时已发送原始帧）
+    """
+    ctx = context.begin(frame)
+    
+    # 背景特效在绘制标注之前作用于标注缓冲区中的原始像素
+    effect_chain.apply(ctx.annotated, trace=trace, stage='background')
+    
+    # 识别手势并直接在上下文的标注缓冲区上绘制
+    result = gesture_recognizer.recognize(
+        frame, trace=trace, prepared=ctx.prepared, hand_frame=hand_frame, update=update_hands
+    )
+    processed_frame = gesture_recognizer.annotate_frame(frame, result, trace=trace, context=ctx)
+    gestures = result.gestures
+    direction_name = result.direction_name
+    
+    # 如果启用了面部识别，处理面部表情（在原始帧上检测，复用同一份RGB转换和标注缓冲区）
+    expressions = []
+    expression_events = []
+    face_ids = []
+    if face_recognition_enabled and processed_frame is not None:
+        processed_frame, expressions = face_recognizer.process_frame(
+            processed_frame, trace=trace, context=ctx, face_landmarks=face_landmarks, update=update_faces
+        )
+        expression_events = face_recognizer.expression_events
+        face_ids = face_recognizer.face_ids.tolist()
+    
+    # 按顺序应用开启的标注后特效（标注失败时返回的是原始帧，不在原始帧上写入）
+    if processed_frame is not None and processed_frame is not frame:
+        effect_chain.apply(processed_frame, trace=trace, stage='effect')
+    
+    # 记录统计数据（手势按事件计数，保持同一手势只计一次）
+    if result.events:
+        stats_tracker.record_gestures(result.events)
+    # 表情按脸计数
+    for event in expression_events:
+        stats_tracker.record_expressions([event['expression']], face_id=event['face_id'])
+    
+    # 如果启用了键盘快捷键，每个手势事件只触发一次快捷键
+    if keyboard_shortcuts_enabled and result.events:
+        for gesture in result.events:
+            keyboard_controller.handle_gesture(gesture)
+    
+    if processed_frame is None:
+        # 如果处理失败但有原始帧，至少发送原始帧
+        emit_raw_frame(frame)
+        return False
+    
+    # 将帧编码为JPEG
+    _, buffer = cv2.imencode('.jpg', processed_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    frame_bytes = buffer.tobytes()
+    
+    # 转换为base64字符串
+    frame_base64 = base64.b64encode(frame_bytes).decode('utf-8')
+    
+    trace.mark('encode')
+    
+    # 获取最新统计数据
+    current_stats = stats_tracker.get_stats()
+    
+    payload = {
+        'image': f'data:image/jpeg;base64,{frame_base64}',
+        'gestures': gestures,
+        'gesture_events': result.events,
+        'hand_ids': result.hand_ids.tolist(),
+        'expressions': expressions,
+        'expression_events': expression_events,
+        'face_ids': face_ids,
+        'stats': current_stats,
+        'direction': direction_name
+    }
+    if trace_payload_enabled:
+        payload['trace'] = trace.to_payload()
+    
+    # 发送到客户端
+    socketio.emit('frame', payload)
+    trace.mark('emit')
+    latency_tracker.record(trace)
+    return True
+
+def emit_raw_frame(frame):
+    """
+    发送未处理的原始帧
+    
+    @param {numpy.ndarray} frame - 原始视频帧
+    """
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+    frame_bytes = buffer.tobytes()
+    frame_base64 = base64.b64encode(frame_bytes).decode('utf-8')
+    socketio.emit('frame', {
+        'image': f'data:image/jpeg;base64,{frame_base64}',
+        'gestures': [],
+        'expressions': [],
+        'direction': None
+    })
+
+def get_inference_pool():
+    """
+    获取推理进程池，第一次调用时按环境变量创建（只在实际处理帧的进程中启动工作进程）
+    
+    @returns {InferencePool|None} 进程池，未启用、启动失败或已不可用时返回None
+    """
+    global inference_pool, inference_pool_initialized
+    if not inference_pool_initialized:
+        inference_pool_initialized = True
+        inference_pool = create_inference_pool()
+    if inference_pool is not None and not inference_pool.alive:
+        logger.warning('推理进程池已不可用，改用进程内推理')
+        inference_pool.close()
+        inference_pool = None
+    return inference_pool
+
+def get_inference_scheduler():
+    """
+    获取推理调度器，第一次调用时按环境变量创建并启动
+    
+    @returns {InferenceScheduler|None} 调度器，未启用时返回None
+    """
+    global inference_scheduler, inference_scheduler_initialized
+    if not inference_scheduler_initialized:
+        inference_scheduler_initialized = True
+        # 重新启动摄像头时会重新创建这些全局对象，调度器每次通过函数获取当前的对象
+        inference_scheduler = create_inference_scheduler(
+            lambda: camera, lambda: gesture_recognizer, lambda: face_recognizer,
+            face_enabled=face_recognition_enabled
+        )
+    return inference_scheduler
+
+def process_frame(scheduler=None):
+    """
+    处理视频帧并发送到客户端
+    
+    @param {InferenceScheduler|None} scheduler - 推理调度器，提供时手部和面部检测在调度器的线程中运行，
+                                                 这里每帧只合并两者的最新结果
+    """
+    logger.info('视频处理线程已启动' + ('（推理调度器）' if scheduler is not None else ''))
     frame_count = 0
     error_count = 0
     max_errors = 10  # 最大连续错误次数
+    last_seq = None  # 已处理的最新帧序号
+    last_hand_seq = None  # 调度器已交给识别流程的手部、面部结果对应的帧序号
+    last_face_seq = None
+    context = FrameContext()  # 复用的预处理和标注缓冲区
     
     # 等待摄像头初始化完成
     time.sleep(1.0)
@@ -156,6 +376,7 @@ def process_frame():
             return
     
     while True:
+        handle = None
         try:
             # 检查摄像头是否仍在运行
             if not camera.is_running:
@@ -169,83 +390,45 @@ def process_frame():
                     socketio.emit('camera_error', {'message': '摄像头已停止运行且无法重新启动'})
                     break
             
-            frame = camera.get_frame()
-            if frame is not None:
+            # 摄像头对象被重新创建后帧序号从头开始
+            if last_seq is not None and camera.latest_seq < last_seq:
+                last_seq = None
+            
+            # 等待新帧到达后立即处理，不重复处理旧帧
+            handle = camera.wait_for_frame(timeout=FRAME_WAIT_TIMEOUT, after_seq=last_seq)
+            if handle is not None:
+                last_seq = handle.seq
+                frame = handle.frame
+                trace = latency_tracker.start('main', handle.seq, handle.timestamp)
+                trace.mark('acquire')
                 try:
-                    # 处理帧并识别手势
-                    processed_frame, gestures, finger_direction, direction_name = gesture_recognizer.process_frame(frame)
-                    
-                    # 如果启用了面部识别，处理面部表情
-                    expressions = []
-                    if face_recognition_enabled and processed_frame is not None:
-                        processed_frame, expressions = face_recognizer.process_frame(processed_frame)
-                    
-                    # 记录统计数据
-                    if gestures:
-                        stats_tracker.record_gestures(gestures)
-                    if expressions:
-                        stats_tracker.record_expressions(expressions)
-                    
-                    # 如果启用了键盘快捷键，处理手势快捷键
-                    if keyboard_shortcuts_enabled and gestures:
-                        for gesture in gestures:
-                            keyboard_controller.handle_gesture(gesture)
-                    
-                    if processed_frame is not None:
-                        # 将帧编码为JPEG
-                        _, buffer = cv2.imencode('.jpg', processed_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                        frame_bytes = buffer.tobytes()
-                        
-                        # 转换为base64字符串
-                        frame_base64 = base64.b64encode(frame_bytes).decode('utf-8')
-                        
-                        # 获取最新统计数据
-                        current_stats = stats_tracker.get_stats()
-                        
-                        # 发送到客户端
-                        socketio.emit('frame', {
-                            'image': f'data:image/jpeg;base64,{frame_base64}',
-                            'gestures': gestures,
-                            'expressions': expressions,
-                            'stats': current_stats,
-                            'direction': direction_name
-                        })
-                        
+                    update_hands = update_faces = True
+                    if scheduler is not None:
+                        # 调度器的结果会在多个输出帧上重复，只有新结果才更新跨帧状态
+                        hand_frame, hand_seq, face_landmarks, face_seq = scheduler.latest()
+                        update_hands, update_faces = hand_seq != last_hand_seq, face_seq != last_face_seq
+                        last_hand_seq, last_face_seq = hand_seq, face_seq
+                    else:
+                        hand_frame, face_landmarks = None, None
+                    if emit_processed_frame(frame, trace, context, hand_frame=hand_frame, face_landmarks=face_landmarks,
+                                            update_hands=update_hands, update_faces=update_faces):
                         # 重置错误计数
                         error_count = 0
                         
                         frame_count += 1
                         if frame_count % 100 == 0:  # 每100帧记录一次
-                            logger.info(f'已处理 {frame_count} 帧视频')
+                            gate_stats = gesture_recognizer.motion_gate.get_stats()
+                            logger.info(f'已处理 {frame_count} 帧视频，手势推理跳过 {gate_stats["skipped"]}/{gate_stats["frames"]} 帧')
                             # 每100帧自动保存一次统计数据
                             stats_tracker.save_stats()
                     else:
-                        # 如果处理失败但有原始帧，至少发送原始帧
-                        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                        frame_bytes = buffer.tobytes()
-                        frame_base64 = base64.b64encode(frame_bytes).decode('utf-8')
-                        socketio.emit('frame', {
-                            'image': f'data:image/jpeg;base64,{frame_base64}',
-                            'gestures': [],
-                            'expressions': [],
-                            'direction': None
-                        })
-                        
                         logger.warning('处理视频帧失败，发送原始帧')
                         error_count += 1
                 except Exception as e:
                     logger.error(f'处理视频帧时出错: {str(e)}')
                     # 如果处理出错但有原始帧，发送原始帧
                     try:
-                        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                        frame_bytes = buffer.tobytes()
-                        frame_base64 = base64.b64encode(frame_bytes).decode('utf-8')
-                        socketio.emit('frame', {
-                            'image': f'data:image/jpeg;base64,{frame_base64}',
-                            'gestures': [],
-                            'expressions': [],
-                            'direction': None
-                        })
+                        emit_raw_frame(frame)
                         logger.warning('发送原始帧')
                     except Exception as frame_error:
                         logger.error(f'发送原始帧时出错: {str(frame_error)}')
@@ -282,15 +465,132 @@ def process_frame():
                 socketio.emit('camera_error', {'message': '视频处理出错'})
                 break
             socketio.sleep(0.1)
-        
-        # 短暂休眠以减少CPU使用率
-        socketio.sleep(0.03)  # 约30 FPS
+        finally:
+            if handle is not None:
+                handle.release()
+
+def process_frame_pooled(pool):
+    """
+    使用推理进程池处理视频帧并发送到客户端
+    
+    新帧复制进进程池的共享内存后立即提交，结果按提交顺序取回后再标注和发送；
+    在处理中的帧数达到上限时等待最早的结果，新帧被跳过，延迟保持有界
+    
+    @param {InferencePool} pool - 推理进程池
+    """
+    global pooled_loop_running
+    pooled_loop_running = True
+    logger.info('视频处理线程已启动（推理进程池）')
+    frame_count = 0
+    error_count = 0
+    max_errors = 10  # 最大连续取帧失败次数
+    last_seq = None
+    context = FrameContext()
+    
+    if not camera.is_running:
+        logger.warning('摄像头未运行，尝试启动')
+        if not camera.start():
+            logger.error('无法启动摄像头，退出视频处理线程')
+            socketio.emit('camera_error', {'message': '无法启动摄像头'})
+            pooled_loop_running = False
+            return
+    
+    camera_failed = False
+    while pool.alive:
+        try:
+            # 检查摄像头是否仍在运行（停止摄像头或重新创建摄像头对象后）
+            if not camera.is_running:
+                logger.warning('摄像头已停止运行，尝试重新启动')
+                if camera.start():
+                    logger.info('摄像头重新启动成功')
+                    time.sleep(1.0)  # 等待摄像头初始化
+                    continue
+                logger.error('摄像头重新启动失败，退出视频处理线程')
+                socketio.emit('camera_error', {'message': '摄像头已停止运行且无法重新启动'})
+                camera_failed = True
+                break
+            
+            # 摄像头对象被重新创建后帧序号从头开始
+            if last_seq is not None and camera.latest_seq < last_seq:
+                last_seq = None
+            
+            # 窗口未满时提交新帧，帧复制进共享内存后立即归还摄像头缓冲区
+            if pool.can_submit():
+                handle = camera.wait_for_frame(timeout=FRAME_WAIT_TIMEOUT, after_seq=last_seq)
+                if handle is not None:
+                    error_count = 0
+                    with handle:
+                        last_seq = handle.seq
+                        trace = latency_tracker.start('main', handle.seq, handle.timestamp)
+                        trace.mark('acquire')
+                        pool.submit(handle.frame, handle.timestamp, tag=trace, face=face_recognition_enabled)
+                elif pool.in_flight == 0:
+                    logger.warning('获取视频帧失败')
+                    error_count += 1
+                    
+                    # 如果连续错误太多，尝试重新启动摄像头
+                    if error_count == 5:
+                        logger.warning('尝试重新启动摄像头')
+                        camera.stop()
+                        time.sleep(1.0)  # 等待资源释放
+                        if camera.start():
+                            logger.info('摄像头重新启动成功')
+                            error_count = 0
+                            time.sleep(1.0)  # 等待摄像头初始化
+                            continue
+                    
+                    # 如果连续错误太多，可能摄像头已断开
+                    if error_count > max_errors:
+                        logger.error(f'连续 {max_errors} 次获取视频帧失败，停止处理')
+                        socketio.emit('camera_error', {'message': '摄像头可能已断开连接'})
+                        camera_failed = True
+                        break
+                    continue
+            
+            # 按提交顺序取回结果，窗口已满时等待最早的结果
+            result = pool.get_result(timeout=0 if pool.can_submit() else FRAME_WAIT_TIMEOUT)
+            if result is None:
+                continue
+            
+            with result:
+                trace = result.tag
+                trace.mark('inference')
+                try:
+                    if emit_processed_frame(result.frame, trace, context, hand_frame=result.hands, face_landmarks=result.faces):
+                        frame_count += 1
+                        if frame_count % 100 == 0:  # 每100帧记录一次
+                            pool_stats = pool.get_stats()
+                            logger.info(f'已处理 {frame_count} 帧视频，推理进程池丢弃 {pool_stats["dropped"]}/{pool_stats["submitted"] + pool_stats["dropped"]} 帧')
+                            # 每100帧自动保存一次统计数据
+                            stats_tracker.save_stats()
+                except Exception as e:
+                    logger.error(f'处理视频帧时出错: {str(e)}')
+                    emit_raw_frame(result.frame)
+        except Exception as e:
+            logger.error(f'处理视频帧时出错: {str(e)}')
+            socketio.sleep(0.1)
+    
+    pooled_loop_running = False
+    if camera_failed:
+        return
+    
+    # 工作进程全部退出后回退到进程内推理
+    logger.warning('推理进程池已不可用，改用进程内推理')
+    process_frame()
 
 @socketio.on('request_frames')
 def handle_request_frames(data=None):
     """处理客户端请求视频帧"""
     logger.info('开始发送视频帧')
-    socketio.start_background_task(process_frame)
+    pool = get_inference_pool()
+    if pool is not None:
+        # 进程池只能由一个处理循环使用
+        if pooled_loop_running:
+            logger.info('推理进程池处理循环已在运行')
+            return
+        socketio.start_background_task(process_frame_pooled, pool)
+    else:
+        socketio.start_background_task(process_frame, get_inference_scheduler())
 
 @socketio.on('get_stats')
 def handle_get_stats(data=None):
@@ -299,6 +599,29 @@ def handle_get_stats(data=None):
     logger.info('发送统计数据')
     return {'status': 'success', 'stats': stats}
 
+@socketio.on('get_pipeline_stats')
+def handle_get_pipeline_stats(data=None):
+    """获取处理流水线的性能统计"""
+    return {
+        'status': 'success',
+        'motion_gate': {
+            'gesture': gesture_recognizer.motion_gate.get_stats(),
+            'face': face_recognizer.motion_gate.get_stats()
+        },
+        'landmark_tracking': gesture_recognizer.landmark_tracker.get_stats(),
+        'motion_gestures': gesture_recognizer.motion_gestures.get_stats(),
+        'hand_identity': gesture_recognizer.hand_identity.get_stats(),
+        'face_identity': face_recognizer.face_states.get_stats(),
+        'roi': {
+            'hand': gesture_recognizer.hand_roi.get_stats(),
+            'face': face_recognizer.face_roi.get_stats()
+        },
+        'effects': effect_chain.get_stats(),
+        'latency': latency_tracker.get_summary(),
+        'inference_pool': inference_pool.get_stats() if inference_pool is not None else None,
+        'scheduler': inference_scheduler.get_stats() if inference_scheduler is not None else None
+    }
+
 @socketio.on('reset_stats')
 def handle_reset_stats(data=None):
     """重置统计数据"""
@@ -339,6 +662,8 @@ def process_snake_game():
     """处理贪吃蛇游戏并发送到客户端"""
     logger.info('贪吃蛇游戏线程已启动')
     frame_count = 0
+    context = FrameContext()
+    camera_preview = None  # 缩小后的摄像头画面缓冲区
     
     # 确保摄像头已启动
     if not camera.is_running:
@@ -349,56 +674,69 @@ def process_snake_game():
             return
     
     while True:
+        handle = None
         try:
-            # 获取视频帧
-            frame = camera.get_frame()
-            if frame is not None:
-                # 处理帧并识别手势
-                processed_frame, gestures, finger_direction, direction_name = gesture_recognizer.process_frame(frame)
+            # 获取视频帧（游戏按自身帧率推进，允许重复使用最新帧）
+            handle = camera.get_frame()
+            if handle is not None:
+                frame = handle.frame
+                trace = latency_tracker.start('snake', handle.seq, handle.timestamp)
+                trace.mark('acquire')
+                
+                # 只识别不绘制，标注画在缩小后的预览图上
+                ctx = context.begin(frame)
+                result = gesture_recognizer.recognize(frame, trace=trace, prepared=ctx.prepared)
+                gestures = result.gestures
+                direction_name = result.direction_name
                 
                 # 记录调试信息
-                if finger_direction:
-                    logger.debug(f"检测到食指方向: {finger_direction}, 方向名称: {direction_name}")
+                if result.finger_direction:
+                    logger.debug(f"检测到食指方向: {result.finger_direction}, 方向名称: {direction_name}")
                 
                 # 更新游戏状态
-                if finger_direction:
-                    # 如果检测到方向，无论是否有手势都更新方向
-                    snake_game.handle_gesture(gestures[0] if gestures else None, finger_direction)
-                elif gestures and len(gestures) > 0:
-                    # 如果只有手势没有方向，也传递手势
-                    snake_game.handle_gesture(gestures[0], None)
-                
+                snake_game.handle_gesture_result(result)
                 snake_game.update()
                 
                 # 渲染游戏画面
                 game_frame = snake_game.render()
+                trace.mark('game')
                 
                 # 将游戏画面编码为JPEG
                 _, game_buffer = cv2.imencode('.jpg', game_frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
                 game_bytes = game_buffer.tobytes()
                 game_base64 = base64.b64encode(game_bytes).decode('utf-8')
                 
-                # 将摄像头画面编码为JPEG
-                if processed_frame is not None:
-                    # 调整摄像头画面大小
-                    processed_frame = cv2.resize(processed_frame, (320, 240))
-                    _, camera_buffer = cv2.imencode('.jpg', processed_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
-                    camera_bytes = camera_buffer.tobytes()
-                    camera_base64 = base64.b64encode(camera_bytes).decode('utf-8')
-                else:
-                    camera_base64 = None
+                # 将摄像头画面缩小后再绘制手势标注，只在小图上绘制
+                if camera_preview is None:
+                    camera_preview = np.empty((240, 320, 3), dtype=np.uint8)
+                cv2.resize(frame, (320, 240), dst=camera_preview)
+                preview_effect_chain.sync(effect_chain)
+                preview_effect_chain.apply(camera_preview, stage='background')
+                gesture_recognizer.render(camera_preview, result)
+                preview_effect_chain.apply(camera_preview, stage='effect')
+                _, camera_buffer = cv2.imencode('.jpg', camera_preview, [cv2.IMWRITE_JPEG_QUALITY, 70])
+                camera_bytes = camera_buffer.tobytes()
+                camera_base64 = base64.b64encode(camera_bytes).decode('utf-8')
+                
+                trace.mark('encode')
                 
                 # 获取游戏信息
                 game_info = snake_game.get_game_info()
                 
-                # 发送到客户端
-                socketio.emit('snake_frame', {
+                payload = {
                     'game_image': f'data:image/jpeg;base64,{game_base64}',
                     'camera_image': f'data:image/jpeg;base64,{camera_base64}' if camera_base64 else None,
                     'game_info': game_info,
                     'gestures': gestures,
                     'direction': direction_name
-                })
+                }
+                if trace_payload_enabled:
+                    payload['trace'] = trace.to_payload()
+                
+                # 发送到客户端
+                socketio.emit('snake_frame', payload)
+                trace.mark('emit')
+                latency_tracker.record(trace)
                 
                 frame_count += 1
                 if frame_count % 100 == 0:  # 每100帧记录一次
@@ -409,6 +747,9 @@ def process_snake_game():
         except Exception as e:
             logger.error(f'处理贪吃蛇游戏帧时出错: {str(e)}')
             socketio.sleep(0.1)
+        finally:
+            if handle is not None:
+                handle.release()
         
         # 按照游戏帧率控制速度
         socketio.sleep(1.0 / snake_game.fps)
@@ -506,6 +847,59 @@ def reset_gesture_config():
             'message': f'重置手势配置时出错: {str(e)}'
         }), 500
 
+@app.route('/api/gesture-templates', methods=['GET'])
+def get_gesture_templates():
+    """获取自定义手势模板及录制进度"""
+    return jsonify({
+        'status': 'success',
+        'templates': gesture_recognizer.gesture_templates.get_templates(),
+        'recording': gesture_recognizer.get_template_recording_status()
+    })
+
+@app.route('/api/gesture-templates/<gesture>', methods=['POST'])
+def record_gesture_template(gesture):
+    """开始从实时画面录制自定义手势模板"""
+    try:
+        data = request.get_json(silent=True) or {}
+        samples = int(data.get('samples', 30))
+
+        # 先注册为自定义手势，录制完成后即可在手势配置中绑定动作
+        if not gesture_config.add_custom_gesture(gesture):
+            return jsonify({
+                'status': 'error',
+                'message': f'无效的手势名称: {gesture}'
+            }), 400
+        keyboard_controller.gesture_config = gesture_config
+
+        recording = gesture_recognizer.start_template_recording(gesture, samples)
+        return jsonify({
+            'status': 'success',
+            'message': f'开始录制手势 {gesture}，请在摄像头前保持该手势',
+            'recording': recording
+        })
+    except Exception as e:
+        logger.error(f"录制手势模板时出错: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'录制手势模板时出错: {str(e)}'
+        }), 500
+
+@app.route('/api/gesture-templates/<gesture>', methods=['DELETE'])
+def delete_gesture_template(gesture):
+    """删除自定义手势的所有模板"""
+    if not gesture_recognizer.delete_gesture_template(gesture):
+        return jsonify({
+            'status': 'error',
+            'message': f'手势 {gesture} 没有模板'
+        }), 404
+
+    gesture_config.remove_custom_gesture(gesture)
+    keyboard_controller.gesture_config = gesture_config
+    return jsonify({
+        'status': 'success',
+        'message': f'手势 {gesture} 的模板已删除'
+    })
+
 @app.route('/drawing')
 def drawing_page():
     """渲染绘画页面"""
@@ -523,6 +917,8 @@ def process_drawing_frames():
     frame_count = 0
     error_count = 0
     max_errors = 10  # 最大连续错误次数
+    last_seq = None  # 已处理的最新帧序号
+    context = FrameContext()  # 复用的预处理和标注缓冲区
     
     # 等待摄像头初始化完成
     time.sleep(1.0)
@@ -536,6 +932,7 @@ def process_drawing_frames():
             return
     
     while True:
+        handle = None
         try:
             # 检查摄像头是否仍在运行
             if not camera.is_running:
@@ -549,21 +946,32 @@ def process_drawing_frames():
                     socketio.emit('camera_error', {'message': '摄像头已停止运行且无法重新启动'})
                     break
             
-            frame = camera.get_frame()
-            if frame is not None:
+            # 摄像头对象被重新创建后帧序号从头开始
+            if last_seq is not None and camera.latest_seq < last_seq:
+                last_seq = None
+            
+            # 等待新帧到达后立即处理，不重复处理旧帧
+            handle = camera.wait_for_frame(timeout=FRAME_WAIT_TIMEOUT, after_seq=last_seq)
+            if handle is not None:
+                last_seq = handle.seq
+                frame = handle.frame
+                trace = latency_tracker.start('drawing', handle.seq, handle.timestamp)
+                trace.mark('acquire')
                 try:
                     # 处理帧并识别手势
-                    processed_frame, hand_landmarks = gesture_recognizer.process_frame_for_drawing(frame)
+                    ctx = context.begin(frame)
+                    processed_frame, hand_frame = gesture_recognizer.process_frame_for_drawing(frame, trace=trace, context=ctx)
                     
                     # 处理绘画
-                    canvas, is_drawing = drawing_canvas.process_hand_landmarks(
-                        hand_landmarks, 
+                    canvas, is_drawing = drawing_canvas.process_hand_frame(
+                        hand_frame, 
                         frame.shape[1], 
                         frame.shape[0]
                     )
                     
-                    # 将画布叠加到视频帧上
-                    combined_frame = drawing_canvas.overlay_on_frame(processed_frame)
+                    # 将画布叠加到视频帧上（标注缓冲区可直接写入）
+                    combined_frame = drawing_canvas.overlay_on_frame(processed_frame, in_place=processed_frame is ctx.annotated)
+                    trace.mark('drawing')
                     
                     # 将画布编码为JPEG
                     _, canvas_buffer = cv2.imencode('.jpg', canvas, [cv2.IMWRITE_JPEG_QUALITY, 90])
@@ -575,12 +983,20 @@ def process_drawing_frames():
                     camera_bytes = camera_buffer.tobytes()
                     camera_base64 = base64.b64encode(camera_bytes).decode('utf-8')
                     
-                    # 发送到客户端
-                    socketio.emit('drawing_frame', {
+                    trace.mark('encode')
+                    
+                    payload = {
                         'canvas_image': f'data:image/jpeg;base64,{canvas_base64}',
                         'camera_image': f'data:image/jpeg;base64,{camera_base64}',
                         'is_drawing': is_drawing
-                    })
+                    }
+                    if trace_payload_enabled:
+                        payload['trace'] = trace.to_payload()
+                    
+                    # 发送到客户端
+                    socketio.emit('drawing_frame', payload)
+                    trace.mark('emit')
+                    latency_tracker.record(trace)
                     
                     # 重置错误计数
                     error_count = 0
@@ -622,9 +1038,9 @@ def process_drawing_frames():
                 socketio.emit('camera_error', {'message': '绘画处理出错'})
                 break
             socketio.sleep(0.1)
-        
-        # 短暂休眠以减少CPU使用率
-        socketio.sleep(0.03)  # 约30 FPS
+        finally:
+            if handle is not None:
+                handle.release()
 
 @socketio.on('toggle_eraser')
 def handle_toggle_eraser(data=None):
@@ -707,6 +1123,12 @@ def cleanup(exception=None):
         camera.stop()
         gesture_recognizer.release()
         face_recognizer.release()
+        effect_chain.release()
+        preview_effect_chain.release()
+        if inference_pool is not None:
+            inference_pool.close()
+        if inference_scheduler is not None:
+            inference_scheduler.stop()
 
 if __name__ == '__main__':
     logger.info("手势识别Web应用启动")
@@ -0,0 +1,164 @@
+import argparse
+import time
+import cv2
+import numpy as np
+from modules.frame_source import create_frame_source, PACING_FAST, PACING_REALTIME
+from modules.gesture import GestureRecognizer
+from modules.face import FaceRecognizer
+from modules.preprocess import FrameContext
+from modules.inference_pool import InferencePool
+
+def run_benchmark(source_spec, frames, pacing, face_enabled, annotate=True):
+    """
+    从指定帧源读取固定数量的帧，依次执行手势识别、面部识别和JPEG编码并统计耗时
+
+    @param {str} source_spec - 帧源描述，格式同 FRAME_SOURCE
+    @param {int} frames - 处理的帧数
+    @param {str} pacing - 节奏模式
+    @param {bool} face_enabled - 是否包含面部识别
+    @param {bool} annotate - 是否绘制手势标注
+    @returns {dict} 各阶段耗时（毫秒）列表
+    """
+    source = create_frame_source(source_spec, pacing=pacing)
+    if not source.open():
+        raise SystemExit(f"无法打开帧源: {source_spec}")
+
+    gesture_recognizer = GestureRecognizer()
+    face_recognizer = FaceRecognizer() if face_enabled else None
+    context = FrameContext()
+
+    timings = {'read': [], 'gesture': [], 'face': [], 'encode': [], 'total': []}
+    try:
+        for _ in range(frames):
+            t0 = time.perf_counter()
+            success, frame = source.read()
+            if not success:
+                break
+            if source.mirror:
+                frame = cv2.flip(frame, 1)
+            t1 = time.perf_counter()
+
+            ctx = context.begin(frame)
+            processed_frame, gestures, _, _ = gesture_recognizer.process_frame(frame, context=ctx, annotate=annotate)
+            t2 = time.perf_counter()
+
+            if face_recognizer is not None:
+                processed_frame, _ = face_recognizer.process_frame(processed_frame, context=ctx)
+            t3 = time.perf_counter()
+
+            cv2.imencode('.jpg', processed_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+            t4 = time.perf_counter()
+
+            timings['read'].append((t1 - t0) * 1000)
+            timings['gesture'].append((t2 - t1) * 1000)
+            if face_recognizer is not None:
+                timings['face'].append((t3 - t2) * 1000)
+            timings['encode'].append((t4 - t3) * 1000)
+            timings['total'].append((t4 - t0) * 1000)
+    finally:
+        source.release()
+        gesture_recognizer.release()
+        if face_recognizer is not None:
+            face_recognizer.release()
+
+    return timings
+
+def run_pooled_benchmark(source_spec, frames, pacing, face_enabled, workers):
+    """
+    使用推理进程池处理固定数量的帧，统计从读取到标注编码完成的端到端耗时
+
+    @param {str} source_spec - 帧源描述，格式同 FRAME_SOURCE
+    @param {int} frames - 处理的帧数
+    @param {str} pacing - 节奏模式
+    @param {bool} face_enabled - 是否包含面部识别
+    @param {int} workers - 工作进程数
+    @returns {dict} 各阶段耗时（毫秒）列表
+    """
+    source = create_frame_source(source_spec, pacing=pacing)
+    if not source.open():
+        raise SystemExit(f"无法打开帧源: {source_spec}")
+
+    pool = InferencePool(num_workers=workers)
+    pool.start()
+    gesture_recognizer = GestureRecognizer()
+    face_recognizer = FaceRecognizer() if face_enabled else None
+    context = FrameContext()
+
+    timings = {'inference': [], 'annotate': [], 'encode': [], 'total': []}
+    submitted = 0
+    exhausted = False
+    start = time.perf_counter()
+    try:
+        while len(timings['total']) < frames:
+            # 窗口未满时继续读取并提交
+            while not exhausted and submitted < frames and pool.can_submit():
+                t0 = time.perf_counter()
+                success, frame = source.read()
+                if not success:
+                    exhausted = True
+                    break
+                if source.mirror:
+                    frame = cv2.flip(frame, 1)
+                pool.submit(frame, time.monotonic(), tag=t0, face=face_enabled)
+                submitted += 1
+
+            result = pool.get_result(timeout=5.0)
+            if result is None:
+                break
+            with result:
+                t1 = time.perf_counter()
+                ctx = context.begin(result.frame)
+                processed_frame, _, _, _ = gesture_recognizer.process_frame(result.frame, context=ctx, hand_frame=result.hands)
+                if face_recognizer is not None:
+                    processed_frame, _ = face_recognizer.process_frame(processed_frame, context=ctx, face_landmarks=result.faces)
+                t2 = time.perf_counter()
+                cv2.imencode('.jpg', processed_frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
+                t3 = time.perf_counter()
+
+                timings['inference'].append((t1 - result.tag) * 1000)
+                timings['annotate'].append((t2 - t1) * 1000)
+                timings['encode'].append((t3 - t2) * 1000)
+                timings['total'].append((t3 - result.tag) * 1000)
+    finally:
+        source.release()
+        pool.close()
+        gesture_recognizer.release()
+        if face_recognizer is not None:
+            face_recognizer.release()
+
+    elapsed = time.perf_counter() - start
+    if timings['total']:
+        print(f"{workers} 个工作进程，吞吐 {len(timings['total']) / elapsed:.1f} FPS")
+    return timings
+
+def print_report(timings):
+    """
+    打印各阶段耗时统计
+
+    @param {dict} timings - 各阶段耗时（毫秒）列表
+    """
+    print(f"{'阶段':<10}{'均值':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, values in timings.items():
+        if not values:
+            continue
+        data = np.asarray(values)
+        p50, p95, p99 = np.percentile(data, [50, 95, 99])
+        print(f"{stage:<10}{data.mean():>10.2f}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}")
+    if timings['total']:
+        fps = 1000.0 / np.mean(timings['total'])
+        print(f"共处理 {len(timings['total'])} 帧，平均 {fps:.1f} FPS")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='手势识别流水线基准测试（无需摄像头）')
+    parser.add_argument('--source', default='synthetic', help='帧源描述，如 synthetic、video:clip.mp4、images:frames/')
+    parser.add_argument('--frames', type=int, default=300, help='处理的帧数')
+    parser.add_argument('--pacing', default=PACING_FAST, choices=[PACING_FAST, PACING_REALTIME], help='节奏模式')
+    parser.add_argument('--face', action='store_true', help='包含面部识别')
+    parser.add_argument('--no-annotate', action='store_true', help='只识别不绘制手势标注')
+    parser.add_argument('--workers', type=int, default=0, help='推理工作进程数，0表示进程内推理')
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        print_report(run_pooled_benchmark(args.source, args.frames, args.pacing, args.face, args.workers))
+    else:
+        print_report(run_benchmark(args.source, args.frames, args.pacing, args.face, annotate=not args.no_annotate))
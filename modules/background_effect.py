@@ -0,0 +1,212 @@
+import cv2
+import mediapipe as mp
+import numpy as np
+import logging
+import os
+import time
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.effects import Effect
+from modules.frame_source import parse_size
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/background_effect_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("background_effect")
+
+BACKGROUND_MODE_BLUR = 'blur'
+BACKGROUND_MODE_IMAGE = 'image'
+
+class BackgroundEffect(Effect):
+    """
+    背景虚化/替换特效
+
+    人像分割（MediaPipe Selfie Segmentation）在低分辨率图像上每N帧运行一次，
+    分割结果与上一次的蒙版做时间平滑后放大到输出分辨率并缓存，中间帧直接复用；
+    每帧只做背景生成（低分辨率模糊后放大，或缓存的替换背景）和一次 cv2.blendLinear 合成；
+    属于 background 阶段，在绘制标注之前作用于原始像素，分割不受标注干扰，合成也不会抹掉标注
+    """
+    name = 'background'
+    stage = 'background'
+
+    def __init__(self, mode=None, image_path=None, segmentation_size=None, interval=None,
+                 smoothing=None, blur_scale=4, blur_ksize=11):
+        """
+        @param {str|None} mode - blur（虚化）或 image（替换为图片），默认读取 BACKGROUND_MODE
+        @param {str|None} image_path - 替换背景的图片路径，默认读取 BACKGROUND_IMAGE
+        @param {tuple|None} segmentation_size - 分割推理分辨率 (宽, 高)，默认读取 SEGMENTATION_SIZE
+        @param {int|None} interval - 分割的运行间隔（帧），默认读取 SEGMENTATION_INTERVAL
+        @param {float|None} smoothing - 与上一次蒙版的平滑系数 (0~1)，默认读取 SEGMENTATION_SMOOTHING
+        @param {int} blur_scale - 模糊时的缩小倍数，在缩小后的图像上模糊再放大
+        @param {int} blur_ksize - 缩小后图像上的均值滤波核大小，做两遍近似高斯模糊
+        """
+        if image_path is None:
+            image_path = os.environ.get('BACKGROUND_IMAGE', '')
+        if mode is None:
+            mode = os.environ.get('BACKGROUND_MODE', BACKGROUND_MODE_IMAGE if image_path else BACKGROUND_MODE_BLUR)
+        if segmentation_size is None:
+            segmentation_size = parse_size(os.environ.get('SEGMENTATION_SIZE'), (256, 144))
+        if interval is None:
+            interval = int(os.environ.get('SEGMENTATION_INTERVAL', 3))
+        if smoothing is None:
+            smoothing = float(os.environ.get('SEGMENTATION_SMOOTHING', 0.5))
+
+        self.segmentation_size = segmentation_size
+        self.interval = max(1, interval)
+        self.smoothing = min(max(smoothing, 0.0), 0.95)
+        self.blur_scale = max(1, blur_scale)
+        self.blur_ksize = max(1, blur_ksize)
+
+        self.background_image = None
+        self.background_shape = None
+        if mode == BACKGROUND_MODE_IMAGE:
+            self.background_image = cv2.imread(image_path) if image_path else None
+            if self.background_image is None:
+                logger.warning(f"无法读取背景图片: {image_path}，改用背景虚化")
+                mode = BACKGROUND_MODE_BLUR
+        self.mode = mode
+
+        # 分割模型在第一次更新时才创建，未开启特效时不占用资源
+        self.segmenter = None
+        self.segmenter_failed = False
+        self.has_mask = False
+        self.mask_shape = None
+        self.segmentation_ms = 0.0
+        self.segmentations = 0
+
+    def _get_segmenter(self):
+        """
+        获取分割模型，创建失败后不再重试
+
+        @returns {object|None} SelfieSegmentation 实例
+        """
+        if self.segmenter is None and not self.segmenter_failed:
+            try:
+                # model_selection=1 为横向模型，输入 256x144，速度更快
+                self.segmenter = mp.solutions.selfie_segmentation.SelfieSegmentation(model_selection=1)
+                logger.info(f"人像分割初始化完成，分辨率 {self.segmentation_size[0]}x{self.segmentation_size[1]}，每 {self.interval} 帧运行一次")
+            except Exception as e:
+                self.segmenter_failed = True
+                logger.error(f"初始化人像分割时出错: {str(e)}")
+        return self.segmenter
+
+    def update(self, image, pool, frames=1):
+        """
+        在低分辨率图像上运行人像分割，平滑后放大为输出分辨率的前景/背景权重
+
+        @param {numpy.ndarray} image - 当前帧（BGR）
+        @param {BufferPool} pool - 缓冲区池
+        @param {int} frames - 距上次更新经过的帧数
+        """
+        segmenter = self._get_segmenter()
+        if segmenter is None:
+            return
+
+        start = time.perf_counter()
+        width, height = self.segmentation_size
+        small = pool.get('background.small', (height, width, 3))
+        rgb = pool.get('background.rgb', (height, width, 3))
+        cv2.resize(image, (width, height), dst=small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=rgb)
+        mask = segmenter.process(rgb).segmentation_mask
+        if mask is None:
+            return
+
+        # 与上一次的蒙版做指数平滑，减少边缘闪烁
+        small_mask = pool.get('background.small_mask', (height, width), np.float32)
+        if self.has_mask and self.smoothing > 0:
+            cv2.addWeighted(small_mask, self.smoothing, mask.astype(np.float32, copy=False), 1.0 - self.smoothing, 0, dst=small_mask)
+        else:
+            small_mask[:] = mask
+
+        # 放大到输出分辨率并缓存前景和背景权重，中间帧直接复用
+        out_height, out_width = image.shape[:2]
+        foreground = pool.get('background.foreground', (out_height, out_width), np.float32)
+        background = pool.get('background.inverse', (out_height, out_width), np.float32)
+        cv2.resize(small_mask, (out_width, out_height), dst=foreground, interpolation=cv2.INTER_LINEAR)
+        np.clip(foreground, 0.0, 1.0, out=foreground)
+        np.subtract(1.0, foreground, out=background)
+        self.has_mask = True
+        self.mask_shape = (out_height, out_width)
+
+        self.segmentation_ms = (time.perf_counter() - start) * 1000
+        self.segmentations += 1
+
+    def _background(self, image, pool):
+        """
+        生成当前帧的背景：缩小后模糊再放大，或缓存的替换图片
+
+        @param {numpy.ndarray} image - 当前帧（BGR）
+        @param {BufferPool} pool - 缓冲区池
+        @returns {numpy.ndarray} 与图像同尺寸的背景
+        """
+        height, width = image.shape[:2]
+        if self.background_image is not None:
+            background = pool.get('background.image', image.shape)
+            if self.background_shape != image.shape:
+                cv2.resize(self.background_image, (width, height), dst=background, interpolation=cv2.INTER_AREA)
+                self.background_shape = image.shape
+            return background
+
+        scale = self.blur_scale
+        small_size = (max(1, width // scale), max(1, height // scale))
+        small = pool.get('background.blur_small', (small_size[1], small_size[0], 3))
+        blurred = pool.get('background.blurred', image.shape)
+        cv2.resize(image, small_size, dst=small, interpolation=cv2.INTER_AREA)
+        # 两遍均值滤波近似高斯模糊，开销与核大小无关
+        ksize = (self.blur_ksize, self.blur_ksize)
+        cv2.blur(small, ksize, dst=small)
+        cv2.blur(small, ksize, dst=small)
+        cv2.resize(small, (width, height), dst=blurred, interpolation=cv2.INTER_LINEAR)
+        return blurred
+
+    def compose(self, image, pool):
+        """
+        按缓存的蒙版把前景和背景合成，直接写回输入图像
+
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {BufferPool} pool - 缓冲区池
+        """
+        height, width = image.shape[:2]
+        if not self.has_mask or self.mask_shape != (height, width):
+            return
+        foreground = pool.get('background.foreground', (height, width), np.float32)
+        background_weights = pool.get('background.inverse', (height, width), np.float32)
+        background = self._background(image, pool)
+        cv2.blendLinear(image, background, foreground, background_weights, dst=image)
+
+    def reset(self):
+        """
+        丢弃缓存的蒙版，下一次更新重新开始平滑
+        """
+        self.has_mask = False
+        self.mask_shape = None
+
+    def get_stats(self):
+        """
+        @returns {dict} 分割分辨率、模式、最近一次分割耗时和分割次数
+        """
+        return {
+            'mode': self.mode,
+            'segmentation_size': list(self.segmentation_size),
+            'segmentation_ms': round(self.segmentation_ms, 3),
+            'segmentations': self.segmentations
+        }
+
+    def release(self):
+        """
+        释放分割模型
+        """
+        if self.segmenter is not None:
+            self.segmenter.close()
+            self.segmenter = None
@@ -1,10 +1,13 @@
 import cv2
+import numpy as np
 import logging
 import threading
 from datetime import datetime
 from rich.logging import RichHandler
 import os
 import time
+from modules.frame_source import create_frame_source
+from modules.shared_frames import SharedFramePublisher
 
 # 设置日志
 if not os.path.exists('logs'):
@@ -21,19 +24,84 @@ logging.basicConfig(
 )
 logger = logging.getLogger("camera")
 
+class FrameHandle:
+    """
+    环形缓冲区中一帧的只读视图句柄
+
+    持有句柄期间，摄像头不会覆盖对应的缓冲槽；使用完毕后必须调用 release()
+    （或使用 with 语句）归还缓冲槽
+    """
+    def __init__(self, camera, slot, generation, seq, timestamp, frame):
+        """
+        @param {Camera} camera - 所属摄像头
+        @param {int} slot - 缓冲槽索引
+        @param {int} generation - 缓冲区代数，缓冲区重新分配后旧句柄不再影响引用计数
+        @param {int} seq - 帧序号（单调递增）
+        @param {float} timestamp - 捕获时间戳（time.monotonic）
+        @param {numpy.ndarray} frame - 只读的帧视图
+        """
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+        self._camera = camera
+        self._slot = slot
+        self._generation = generation
+        self._released = False
+    
+    def release(self):
+        """
+        归还缓冲槽，可重复调用
+        """
+        if self._released:
+            return
+        self._released = True
+        self._camera._release_slot(self._slot, self._generation)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
 class Camera:
     """
     摄像头处理类，负责捕获视频流
+    
+    捕获的帧写入预分配的N槽环形缓冲区，每帧带有单调递增的序号和捕获时间戳，
+    消费者通过 get_frame 获取零拷贝的只读视图
     """
-    def __init__(self):
+    def __init__(self, buffer_size=4, source=None, broadcast_name=None, broadcast_slots=8):
         """
         初始化摄像头
+        
+        @param {int} buffer_size - 环形缓冲区槽数，至少为2
+        @param {FrameSource|None} source - 帧源，默认根据环境变量 FRAME_SOURCE 创建
+        @param {str|None} broadcast_name - 共享内存名称，设置后同时将帧发布到共享内存供其他进程读取
+        @param {int} broadcast_slots - 共享内存环形缓冲区槽数
         """
-        self.video = None
+        self.source = source if source is not None else create_frame_source()
         self.is_running = False
-        self.frame = None
         self.lock = threading.Lock()
-        logger.info("摄像头模块初始化完成")
+        self.frame_ready = threading.Condition(self.lock)  # 新帧发布或摄像头停止时通知
+        
+        # 环形缓冲区
+        self.buffer_size = max(2, buffer_size)
+        self.frame_buffer = None  # 首帧到达时按帧尺寸分配 (N, h, w, 3)
+        self.buffer_generation = 0
+        self.slot_seqs = [0] * self.buffer_size  # 各槽的帧序号，0表示空槽或正在写入
+        self.slot_timestamps = [0.0] * self.buffer_size
+        self.slot_refs = [0] * self.buffer_size  # 各槽被消费者持有的次数
+        self.latest_slot = -1
+        self.latest_seq = 0
+        self.dropped_frames = 0  # 所有槽均被占用而丢弃的帧数
+        
+        # 共享内存广播（守护进程模式）
+        self.broadcast_name = broadcast_name
+        self.broadcast_slots = broadcast_slots
+        self.broadcast_generation = 0  # 共享内存每次重新创建时加一，连接端据此重新连接
+        self.publisher = None
+        
+        logger.info(f"摄像头模块初始化完成，帧源: {self.source.describe()}")
     
     def start(self):
         """
@@ -46,45 +114,22 @@ class Camera:
             return True
             
         try:
-            # 先确保之前的摄像头已释放
-            if self.video is not None:
-                self.video.release()
-                self.video = None
+            # 先确保之前的帧源已释放
+            if self.source.is_opened():
+                self.source.release()
                 time.sleep(0.5)  # 等待资源释放
             
-            # 尝试不同的摄像头索引
-            for camera_index in range(3):  # 尝试索引0, 1, 2
-                logger.info(f"尝试打开摄像头索引 {camera_index}")
-                self.video = cv2.VideoCapture(camera_index)
-                
-                # 设置摄像头属性
-                self.video.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                self.video.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                
-                # 检查摄像头是否成功打开
-                if self.video.isOpened():
-                    # 尝试读取一帧，确认摄像头工作正常
-                    success, test_frame = self.video.read()
-                    if success and test_frame is not None:
-                        logger.info(f"成功打开摄像头索引 {camera_index} 并读取测试帧")
-                        self.is_running = True
-                        threading.Thread(target=self._capture_loop, daemon=True).start()
-                        return True
-                    else:
-                        logger.warning(f"摄像头索引 {camera_index} 打开但无法读取帧")
-                        self.video.release()
-                else:
-                    logger.warning(f"无法打开摄像头索引 {camera_index}")
-                    if self.video:
-                        self.video.release()
+            if self.source.open():
+                logger.info(f"成功打开帧源: {self.source.describe()}")
+                self.is_running = True
+                threading.Thread(target=self._capture_loop, daemon=True).start()
+                return True
             
-            logger.error("所有摄像头索引尝试失败")
+            logger.error(f"无法打开帧源: {self.source.describe()}")
             return False
         except Exception as e:
             logger.error(f"摄像头启动失败: {str(e)}")
-            if self.video:
-                self.video.release()
-                self.video = None
+            self.source.release()
             return False
     
     def stop(self):
@@ -96,18 +141,19 @@ class Camera:
             return
         
         logger.info("正在停止摄像头...")
-        self.is_running = False
+        self._mark_stopped()
         
         # 等待一小段时间，确保捕获循环有机会退出
         time.sleep(0.5)
         
-        if self.video:
-            try:
-                self.video.release()
-            except Exception as e:
-                logger.error(f"释放摄像头资源时出错: {str(e)}")
-            finally:
-                self.video = None
+        try:
+            self.source.release()
+        except Exception as e:
+            logger.error(f"释放摄像头资源时出错: {str(e)}")
+        
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
         
         logger.info("摄像头已停止")
     
@@ -122,32 +168,31 @@ class Camera:
         
         while self.is_running:
             try:
-                if self.video is None or not self.video.isOpened():
-                    logger.error("摄像头已关闭，捕获循环退出")
-                    self.is_running = False
+                if not self.source.is_opened():
+                    logger.error("帧源已关闭，捕获循环退出")
+                    self._mark_stopped()
                     break
                     
-                success, frame = self.video.read()
+                success, frame = self.source.read()
+                if not success and self.source.exhausted:
+                    logger.info("帧源已读完，捕获循环退出")
+                    self._mark_stopped()
+                    break
+                
                 if not success:
                     error_count += 1
                     logger.warning(f"无法读取视频帧 (错误 {error_count}/{max_errors})")
                     
                     if error_count >= max_errors:
-                        logger.error(f"连续 {max_errors} 次无法读取视频帧，重新初始化摄像头")
-                        # 尝试重新初始化摄像头
-                        if self.video:
-                            self.video.release()
-                        
-                        self.video = cv2.VideoCapture(0)  # 重新打开摄像头
-                        # 设置摄像头属性
-                        self.video.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                        self.video.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+                        logger.error(f"连续 {max_errors} 次无法读取视频帧，重新初始化帧源")
+                        # 尝试重新初始化帧源
+                        self.source.release()
                         
-                        if not self.video.isOpened():
-                            logger.error("重新初始化摄像头失败")
+                        if not self.source.open():
+                            logger.error("重新初始化帧源失败")
                             time.sleep(1)  # 等待一秒再尝试
                         else:
-                            logger.info("摄像头重新初始化成功")
+                            logger.info("帧源重新初始化成功")
                             error_count = 0  # 重置错误计数
                     
                     time.sleep(0.1)  # 短暂等待
@@ -155,25 +200,177 @@ class Camera:
                     
                 # 成功读取，重置错误计数
                 error_count = 0
+                timestamp = time.monotonic()
                 
-                # 水平翻转，使其像镜子一样
-                frame = cv2.flip(frame, 1)
+                slot = self._acquire_write_slot(frame.shape)
+                if slot is None:
+                    self.dropped_frames += 1
+                    logger.debug("所有缓冲槽均被占用，丢弃当前帧")
+                    continue
+                
+                if self.source.mirror:
+                    # 水平翻转，使其像镜子一样（直接写入缓冲槽，不额外分配内存）
+                    cv2.flip(frame, 1, dst=self.frame_buffer[slot])
+                else:
+                    np.copyto(self.frame_buffer[slot], frame)
                 
-                with self.lock:
-                    self.frame = frame
+                self._publish_slot(slot, timestamp)
+                
+                if self.broadcast_name:
+                    self._broadcast(self.frame_buffer[slot], timestamp)
             except Exception as e:
                 logger.error(f"捕获视频帧时出错: {str(e)}")
                 time.sleep(0.1)  # 出错时短暂等待
         
         logger.info("摄像头捕获循环已结束")
     
-    def get_frame(self):
+    def _mark_stopped(self):
+        """
+        在锁内标记摄像头已停止并唤醒所有等待新帧的消费者，使其立即返回
+        """
+        with self.frame_ready:
+            self.is_running = False
+            self.frame_ready.notify_all()
+    
+    def _acquire_write_slot(self, shape):
         """
-        获取当前视频帧
+        选择一个可写入的缓冲槽：既不是最新帧，也没有被消费者持有，优先选择最旧的槽
         
-        @returns {numpy.ndarray|None} 当前视频帧或None
+        @param {tuple} shape - 帧形状
+        @returns {int|None} 缓冲槽索引，全部被占用时返回None
         """
         with self.lock:
-            if self.frame is None:
+            if self.frame_buffer is None or self.frame_buffer.shape[1:] != shape:
+                # 帧尺寸变化时重新分配缓冲区，旧句柄仍持有旧缓冲区的引用
+                self.frame_buffer = np.empty((self.buffer_size,) + tuple(shape), dtype=np.uint8)
+                self.buffer_generation += 1
+                self.slot_seqs = [0] * self.buffer_size
+                self.slot_refs = [0] * self.buffer_size
+                self.latest_slot = -1
+                logger.info(f"分配帧环形缓冲区: {self.buffer_size} x {shape}")
+            
+            candidates = [
+                i for i in range(self.buffer_size)
+                if i != self.latest_slot and self.slot_refs[i] == 0
+            ]
+            if not candidates:
                 return None
-            return self.frame.copy() 
\ No newline at end of file
+            slot = min(candidates, key=lambda i: self.slot_seqs[i])
+            self.slot_seqs[slot] = 0  # 标记为正在写入
+            return slot
+    
+    def _publish_slot(self, slot, timestamp):
+        """
+        将写入完成的缓冲槽发布为最新帧
+        
+        @param {int} slot - 缓冲槽索引
+        @param {float} timestamp - 捕获时间戳
+        """
+        with self.frame_ready:
+            self.latest_seq += 1
+            self.slot_seqs[slot] = self.latest_seq
+            self.slot_timestamps[slot] = timestamp
+            self.latest_slot = slot
+            self.frame_ready.notify_all()
+    
+    def _broadcast(self, frame, timestamp):
+        """
+        将帧发布到共享内存，帧尺寸变化时以新的代数重新创建共享内存
+        
+        @param {numpy.ndarray} frame - 视频帧
+        @param {float} timestamp - 捕获时间戳
+        """
+        if self.publisher is not None and self.publisher.shape != frame.shape:
+            self.publisher.close()
+            self.publisher = None
+        if self.publisher is None:
+            self.broadcast_generation += 1
+            self.publisher = SharedFramePublisher(
+                self.broadcast_name, frame.shape, self.broadcast_slots, self.broadcast_generation
+            )
+        self.publisher.publish(frame, timestamp)
+    
+    def _release_slot(self, slot, generation):
+        """
+        归还消费者持有的缓冲槽
+        
+        @param {int} slot - 缓冲槽索引
+        @param {int} generation - 句柄创建时的缓冲区代数
+        """
+        with self.lock:
+            if generation == self.buffer_generation and self.slot_refs[slot] > 0:
+                self.slot_refs[slot] -= 1
+    
+    def get_frame(self, after_seq=None):
+        """
+        获取最新视频帧的只读视图
+        
+        返回的句柄持有对应缓冲槽，使用完毕后必须调用 release()（或使用 with 语句）
+        
+        @param {int|None} after_seq - 只返回序号大于该值的帧，用于跳过重复帧
+        @returns {FrameHandle|None} 帧句柄，没有（新）帧时返回None
+        """
+        with self.lock:
+            return self._take_latest(after_seq)
+    
+    def wait_for_frame(self, timeout=None, after_seq=None):
+        """
+        阻塞等待序号大于 after_seq 的新帧，新帧发布时立即返回
+        
+        与 get_frame 相同，返回的句柄使用完毕后必须调用 release()
+        
+        @param {float|None} timeout - 最长等待时间（秒），None表示一直等待
+        @param {int|None} after_seq - 只返回序号大于该值的帧
+        @returns {FrameHandle|None} 帧句柄，超时或摄像头停止时返回None
+        """
+        with self.frame_ready:
+            self.frame_ready.wait_for(
+                lambda: not self.is_running or self._has_frame_after(after_seq),
+                timeout
+            )
+            return self._take_latest(after_seq)
+    
+    def _has_frame_after(self, after_seq):
+        """
+        @param {int|None} after_seq - 帧序号
+        @returns {bool} 是否有序号大于 after_seq 的帧（需持有锁）
+        """
+        return self.latest_slot >= 0 and (after_seq is None or self.latest_seq > after_seq)
+    
+    def _take_latest(self, after_seq):
+        """
+        为消费者持有最新帧所在的缓冲槽（需持有锁）
+        
+        @param {int|None} after_seq - 只返回序号大于该值的帧
+        @returns {FrameHandle|None} 帧句柄
+        """
+        if not self._has_frame_after(after_seq):
+            return None
+        slot = self.latest_slot
+        seq = self.slot_seqs[slot]
+        self.slot_refs[slot] += 1
+        frame = self.frame_buffer[slot].view()
+        frame.flags.writeable = False
+        return FrameHandle(self, slot, self.buffer_generation, seq, self.slot_timestamps[slot], frame) 
+
+if __name__ == '__main__':
+    # 采集守护进程：独占摄像头并将帧发布到共享内存，其他进程通过 SharedFrameClient 读取
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='摄像头采集守护进程')
+    parser.add_argument('--name', default=os.environ.get('FRAME_SHM_NAME', 'nysm_frames'), help='共享内存名称')
+    parser.add_argument('--source', default=None, help='帧源描述，默认读取 FRAME_SOURCE')
+    parser.add_argument('--slots', type=int, default=8, help='共享内存环形缓冲区槽数')
+    args = parser.parse_args()
+    
+    daemon_camera = Camera(source=create_frame_source(args.source), broadcast_name=args.name, broadcast_slots=args.slots)
+    if not daemon_camera.start():
+        raise SystemExit(1)
+    logger.info(f"采集守护进程已启动，共享内存: {args.name}")
+    try:
+        while daemon_camera.is_running:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon_camera.stop()
@@ -5,6 +5,7 @@ import os
 from datetime import datetime
 from rich.logging import RichHandler
 import time
+from modules.hand_frame import INDEX_FINGER_TIP, MIDDLE_FINGER_TIP
 
 # 设置日志
 if not os.path.exists('logs'):
@@ -67,6 +68,11 @@ class DrawingCanvas:
         self.history = []
         self.max_history = 10  # 最大历史记录数
         
+        # 叠加到视频帧时复用的缓冲区
+        self.overlay_canvas = None
+        self.overlay_gray = None
+        self.overlay_mask = None
+        
         # 保存当前画布状态
         self.save_history()
         
@@ -269,36 +275,31 @@ class DrawingCanvas:
         
         return filepath
     
-    def process_hand_landmarks(self, hand_landmarks, frame_width, frame_height):
+    def process_hand_frame(self, hand_frame, frame_width, frame_height):
         """
         处理手部关键点，用于绘画
         
-        @param {list} hand_landmarks - 手部关键点列表
+        @param {HandFrame|None} hand_frame - 手部关键点数组，使用第一只手
         @param {int} frame_width - 视频帧宽度
         @param {int} frame_height - 视频帧高度
         @returns {tuple} 处理后的画布和是否正在绘画
         """
-        if not hand_landmarks:
+        if hand_frame is None or not len(hand_frame):
             # 如果没有检测到手，停止绘画
             self.stop_drawing()
             return self.get_canvas(), False
         
+        landmarks = hand_frame.landmarks[0]
+        
         # 获取绘画手指的索引
         finger_index = self.get_drawing_finger_index()
         
-        # 获取绘画手指的坐标
-        finger_tip = hand_landmarks[finger_index]
-        
-        # 将归一化坐标转换为画布坐标
-        x = int(finger_tip.x * self.width)
-        y = int(finger_tip.y * self.height)
+        # 将绘画手指的归一化坐标转换为画布坐标
+        x = int(landmarks[finger_index, 0] * self.width)
+        y = int(landmarks[finger_index, 1] * self.height)
         
-        # 获取食指和中指的坐标，用于判断是否绘画
-        index_tip = hand_landmarks[8]
-        middle_tip = hand_landmarks[12]
-        
-        # 计算食指和中指的距离
-        distance = np.sqrt((index_tip.x - middle_tip.x) ** 2 + (index_tip.y - middle_tip.y) ** 2)
+        # 计算食指和中指指尖的距离，用于判断是否绘画
+        distance = float(np.linalg.norm(landmarks[INDEX_FINGER_TIP, :2] - landmarks[MIDDLE_FINGER_TIP, :2]))
         
         # 如果食指和中指靠近，表示不绘画
         if distance < 0.05:
@@ -313,22 +314,33 @@ class DrawingCanvas:
         
         return self.get_canvas(), self.is_drawing
     
-    def overlay_on_frame(self, frame):
+    def overlay_on_frame(self, frame, in_place=False):
         """
         将画布叠加到视频帧上
         
         @param {numpy.ndarray} frame - 视频帧
+        @param {bool} in_place - 是否直接写入输入帧（帧必须可写），否则写入副本
         @returns {numpy.ndarray} 叠加后的视频帧
         """
-        # 调整画布大小以匹配视频帧
-        resized_canvas = cv2.resize(self.canvas, (frame.shape[1], frame.shape[0]))
+        height, width = frame.shape[:2]
+        
+        # 调整画布大小以匹配视频帧（尺寸相同时直接使用画布）
+        if (width, height) == (self.width, self.height):
+            resized_canvas = self.canvas
+        else:
+            if self.overlay_canvas is None or self.overlay_canvas.shape != frame.shape:
+                self.overlay_canvas = np.empty(frame.shape, dtype=np.uint8)
+            resized_canvas = cv2.resize(self.canvas, (width, height), dst=self.overlay_canvas)
         
         # 创建画布的掩码（白色区域为不透明，其他区域为透明）
-        mask = cv2.cvtColor(resized_canvas, cv2.COLOR_BGR2GRAY)
-        mask = cv2.bitwise_not(mask)  # 反转掩码
+        if self.overlay_gray is None or self.overlay_gray.shape != (height, width):
+            self.overlay_gray = np.empty((height, width), dtype=np.uint8)
+            self.overlay_mask = np.empty((height, width), dtype=bool)
+        cv2.cvtColor(resized_canvas, cv2.COLOR_BGR2GRAY, dst=self.overlay_gray)
+        np.equal(self.overlay_gray, 255, out=self.overlay_mask)  # 等价于反转后为0的区域
         
         # 将画布叠加到视频帧上
-        result = frame.copy()
-        result[mask == 0] = resized_canvas[mask == 0]
+        result = frame if in_place else frame.copy()
+        np.copyto(result, resized_canvas, where=self.overlay_mask[:, :, None])
         
         return result 
\ No newline at end of file
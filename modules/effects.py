@@ -0,0 +1,353 @@
+import numpy as np
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from rich.logging import RichHandler
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/effects_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("effects")
+
+class BufferPool:
+    """
+    特效缓冲区池，按 (名称, 形状, 类型) 复用数组，尺寸不变时每帧不再分配内存
+    """
+    def __init__(self):
+        self.buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        """
+        获取缓冲区，第一次请求时分配并清零
+
+        @param {str} name - 缓冲区名称，建议以特效名称为前缀
+        @param {tuple} shape - 形状
+        @param {numpy.dtype} dtype - 数据类型
+        @returns {numpy.ndarray} 复用的缓冲区
+        """
+        key = (name, tuple(shape), np.dtype(dtype).str)
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = np.zeros(shape, dtype=dtype)
+            self.buffers[key] = buffer
+        return buffer
+
+    def clear(self):
+        """
+        释放所有缓冲区
+        """
+        self.buffers = {}
+
+    def get_stats(self):
+        """
+        @returns {dict} 缓冲区数量和占用字节数
+        """
+        return {
+            'buffers': len(self.buffers),
+            'bytes': int(sum(buffer.nbytes for buffer in self.buffers.values()))
+        }
+
+class Effect:
+    """
+    特效基类
+
+    update 做昂贵的计算（粒子更新、图层渲染等），结果保存在缓冲区池或特效自身状态中，
+    按 interval 每N帧执行一次；compose 每帧把缓存的结果合成到图像上，应尽量便宜。
+    stage 为特效所在的阶段：'background' 在绘制标注之前作用于原始像素，'effect' 在标注之后叠加
+    """
+    name = 'effect'
+    interval = 1
+    stage = 'effect'
+
+    def update(self, image, pool, frames=1):
+        """
+        重新计算特效图层
+
+        @param {numpy.ndarray} image - 当前帧（BGR）
+        @param {BufferPool} pool - 缓冲区池
+        @param {int} frames - 距上次更新经过的帧数，用于按时间推进动画
+        """
+        pass
+
+    def compose(self, image, pool):
+        """
+        把特效合成到图像上，直接写回输入图像
+
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {BufferPool} pool - 缓冲区池
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        重置特效状态
+        """
+        pass
+
+    def get_stats(self):
+        """
+        特效自身的统计数据，合并到特效链的统计中
+
+        @returns {dict} 统计数据
+        """
+        return {}
+
+    def release(self):
+        """
+        释放特效持有的模型等资源
+        """
+        pass
+
+class EffectState:
+    """
+    特效在链中的状态：开关、更新间隔和耗时统计
+    """
+    __slots__ = ('effect', 'enabled', 'interval', 'frames_until_update', 'shape',
+                 'updates', 'frames', 'update_ms', 'compose_ms', 'frame_ms')
+
+    def __init__(self, effect, enabled, interval, window):
+        self.effect = effect
+        self.enabled = enabled
+        self.interval = interval
+        self.frames_until_update = 0
+        self.shape = None
+        self.updates = 0
+        self.frames = 0
+        self.update_ms = deque(maxlen=window)
+        self.compose_ms = deque(maxlen=window)
+        self.frame_ms = deque(maxlen=window)
+
+class EffectChain:
+    """
+    特效链
+
+    注册的特效按顺序作用在同一张图像上，每个特效可以单独开关、调整顺序和更新间隔；
+    每帧记录各特效的更新和合成耗时
+    """
+    def __init__(self, window=120):
+        """
+        @param {int} window - 耗时统计保留的最近帧数
+        """
+        self.window = window
+        self.states = {}
+        self.order = []
+        self.pool = BufferPool()
+
+    def register(self, effect, enabled=False, interval=None):
+        """
+        注册特效，追加到链的末尾
+
+        @param {Effect} effect - 特效
+        @param {bool} enabled - 是否默认开启
+        @param {int|None} interval - 更新间隔（帧），默认使用特效自身的 interval
+        @returns {Effect} 注册的特效
+        """
+        if effect.name in self.states:
+            self.order.remove(effect.name)
+        interval = effect.interval if interval is None else interval
+        self.states[effect.name] = EffectState(effect, enabled, max(1, int(interval)), self.window)
+        self.order.append(effect.name)
+        logger.info(f"注册特效: {effect.name}，更新间隔 {interval} 帧")
+        return effect
+
+    def get(self, name):
+        """
+        @param {str} name - 特效名称
+        @returns {Effect|None} 特效，未注册时为None
+        """
+        state = self.states.get(name)
+        return state.effect if state is not None else None
+
+    def is_enabled(self, name):
+        """
+        @param {str} name - 特效名称
+        @returns {bool} 特效是否开启
+        """
+        state = self.states.get(name)
+        return state is not None and state.enabled
+
+    def set_enabled(self, name, enabled):
+        """
+        开启或关闭特效，重新开启时下一帧立即更新
+
+        @param {str} name - 特效名称
+        @param {bool} enabled - 是否开启
+        @returns {bool|None} 设置后的状态，特效未注册时为None
+        """
+        state = self.states.get(name)
+        if state is None:
+            logger.warning(f"未注册的特效: {name}")
+            return None
+        state.enabled = bool(enabled)
+        state.frames_until_update = 0
+        logger.info(f"特效 {name}: {'开启' if state.enabled else '关闭'}")
+        return state.enabled
+
+    def toggle(self, name):
+        """
+        切换特效开关
+
+        @param {str} name - 特效名称
+        @returns {bool|None} 切换后的状态，特效未注册时为None
+        """
+        state = self.states.get(name)
+        if state is None:
+            logger.warning(f"未注册的特效: {name}")
+            return None
+        return self.set_enabled(name, not state.enabled)
+
+    def set_interval(self, name, interval):
+        """
+        设置特效的更新间隔
+
+        @param {str} name - 特效名称
+        @param {int} interval - 每N帧更新一次，中间帧复用缓存的结果
+        @returns {bool} 是否设置成功
+        """
+        state = self.states.get(name)
+        if state is None:
+            return False
+        state.interval = max(1, int(interval))
+        state.frames_until_update = 0
+        return True
+
+    def set_order(self, names):
+        """
+        调整特效顺序，列出的特效按给定顺序排在前面，其余保持原顺序排在后面
+
+        @param {list} names - 特效名称列表
+        @returns {bool} 是否设置成功（包含未注册的特效时不修改）
+        """
+        unknown = [name for name in names if name not in self.states]
+        if unknown or len(set(names)) != len(names):
+            logger.warning(f"无效的特效顺序: {names}")
+            return False
+        self.order = list(names) + [name for name in self.order if name not in names]
+        return True
+
+    def sync(self, source):
+        """
+        按另一条特效链同步开关、更新间隔和顺序
+
+        两条链各自持有特效实例、缓冲区和状态，可以在不同线程、不同分辨率下使用而不互相干扰
+
+        @param {EffectChain} source - 作为设置来源的特效链
+        """
+        for name, state in self.states.items():
+            other = source.states.get(name)
+            if other is None:
+                continue
+            if state.enabled != other.enabled or state.interval != other.interval:
+                state.enabled = other.enabled
+                state.interval = other.interval
+                state.frames_until_update = 0
+        order = [name for name in source.order if name in self.states]
+        if self.order[:len(order)] != order:
+            self.order = order + [name for name in self.order if name not in order]
+
+    def has_enabled(self):
+        """
+        @returns {bool} 是否有开启的特效
+        """
+        return any(state.enabled for state in self.states.values())
+
+    def apply(self, image, trace=None, stage=None):
+        """
+        按顺序应用所有开启的特效，直接写回输入图像
+
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {FrameTrace|None} trace - 延迟追踪记录，有特效开启时记录特效所在的阶段（默认 effect）
+        @param {str|None} stage - 只应用该阶段的特效（'background' 或 'effect'），为None时应用全部
+        @returns {numpy.ndarray} 同一个图像
+        """
+        applied = False
+        for name in self.order:
+            state = self.states[name]
+            if not state.enabled or (stage is not None and state.effect.stage != stage):
+                continue
+
+            try:
+                start = time.perf_counter()
+                # 到达更新间隔或图像尺寸变化时重新计算，中间帧只合成缓存的结果
+                if state.frames_until_update <= 0 or state.shape != image.shape:
+                    frames = state.interval if state.shape == image.shape else 1
+                    state.effect.update(image, self.pool, frames)
+                    state.shape = image.shape
+                    state.frames_until_update = state.interval
+                    state.updates += 1
+                    updated = time.perf_counter()
+                    state.update_ms.append((updated - start) * 1000)
+                else:
+                    updated = start
+                state.effect.compose(image, self.pool)
+                end = time.perf_counter()
+                state.compose_ms.append((end - updated) * 1000)
+                state.frame_ms.append((end - start) * 1000)
+                state.frames_until_update -= 1
+                state.frames += 1
+                applied = True
+            except Exception as e:
+                logger.error(f"应用特效 {name} 时出错: {str(e)}")
+
+        if applied and trace is not None:
+            trace.mark(stage or 'effect')
+        return image
+
+    def get_effects(self):
+        """
+        @returns {list} 按顺序排列的特效 [{name, enabled, interval}]
+        """
+        return [
+            {'name': name, 'enabled': self.states[name].enabled, 'interval': self.states[name].interval}
+            for name in self.order
+        ]
+
+    def get_stats(self):
+        """
+        获取各特效的耗时统计
+
+        @returns {dict} 顺序、缓冲区池占用以及各特效的平均更新、合成和每帧耗时（毫秒）
+        """
+        def mean(samples):
+            return round(float(np.mean(samples)), 3) if samples else 0.0
+
+        return {
+            'order': list(self.order),
+            'pool': self.pool.get_stats(),
+            'effects': {
+                name: {
+                    'enabled': state.enabled,
+                    'interval': state.interval,
+                    'updates': state.updates,
+                    'frames': state.frames,
+                    'update_ms': mean(state.update_ms),
+                    'compose_ms': mean(state.compose_ms),
+                    'frame_ms': mean(state.frame_ms),
+                    **state.effect.get_stats()
+                }
+                for name, state in self.states.items()
+            }
+        }
+
+    def release(self):
+        """
+        释放所有特效的资源和缓冲区池
+        """
+        for name, state in self.states.items():
+            try:
+                state.effect.release()
+            except Exception as e:
+                logger.error(f"释放特效 {name} 时出错: {str(e)}")
+        self.pool.clear()
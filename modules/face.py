@@ -5,7 +5,11 @@ import logging
 from datetime import datetime
 from rich.logging import RichHandler
 import os
-from collections import deque
+from modules.motion_gate import MotionGate
+from modules.roi import RoiCropper
+from modules.face_identity import FaceStateTracker
+from modules.face_frame import faces_to_array, empty_faces, FACE_LANDMARKS
+from modules.renderer import FaceRenderer, FACE_DETAIL_NONE
 
 # 设置日志
 if not os.path.exists('logs'):
@@ -22,27 +26,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger("face")
 
+# 裁剪图上的面部关键点距边缘小于该比例时，认为面部被裁剪截断，回到整帧搜索
+ROI_EDGE_MARGIN = 0.01
+
 class FaceRecognizer:
     """
     面部识别类，负责识别面部表情如微笑和眨眼
+
+    可同时跟踪多张脸（MAX_NUM_FACES），每张脸有跨帧稳定的ID和独立的表情状态
     """
     def __init__(self):
         """
         初始化面部识别器
         """
         try:
+            self.max_num_faces = max(1, int(os.environ.get('MAX_NUM_FACES', 1)))
             # 初始化MediaPipe Face Mesh
             self.mp_face_mesh = mp.solutions.face_mesh
-            self.mp_drawing = mp.solutions.drawing_utils
-            self.drawing_spec = self.mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
+            # 面部网格渲染器，细节级别由 FACE_MESH_DETAIL 控制
+            self.face_renderer = FaceRenderer()
             
             # 初始化面部网格检测器
-            self.face_mesh = self.mp_face_mesh.FaceMesh(
-                static_image_mode=False,
-                max_num_faces=1,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
+            self.face_mesh = self._create_face_mesh()
             
             # 定义面部表情
             self.expressions = {
@@ -70,10 +75,8 @@ class FaceRecognizer:
             self.right_eye_left = [133]  # 右眼左角
             self.right_eye_right = [33]  # 右眼右角
             
-            # 状态变量
-            self.left_eye_state = deque(maxlen=10)  # 存储最近10帧左眼状态
-            self.right_eye_state = deque(maxlen=10)  # 存储最近10帧右眼状态
-            self.smile_state = deque(maxlen=10)  # 存储最近10帧微笑状态
+            # 把上述关键点预先整理为索引数组，每帧只取用到的关键点一次计算所有特征
+            self._build_feature_index()
             
             # 表情检测阈值
             self.eye_aspect_ratio_threshold = 0.2  # 眼睛长宽比阈值，小于此值认为眼睛闭合
@@ -83,121 +86,199 @@ class FaceRecognizer:
             self.blink_frames_threshold = 3  # 连续多少帧检测到眨眼才算一次眨眼
             self.smile_frames_threshold = 5  # 连续多少帧检测到微笑才算一次微笑
             
-            # 冷却时间（避免重复检测）
-            self.blink_cooldown = 0
-            self.smile_cooldown = 0
-            self.cooldown_frames = 15  # 冷却帧数
+            # 每张脸的稳定ID和表情状态（环形缓冲区、冷却帧数）按结构数组保存
+            self.face_states = FaceStateTracker(
+                self.max_num_faces, self.blink_frames_threshold, self.smile_frames_threshold
+            )
+            self.cooldown_frames = 15  # 冷却帧数（避免同一张脸重复检测）
+            
+            # 最近一帧的面部ID和表情事件 [{face_id, expression}]
+            self.face_ids = np.empty(0, dtype=np.int64)
+            self.expression_events = []
             
             # 调试模式
             self.debug = True
             
+            # 运动门控：画面静止时复用上一次的检测结果
+            self.motion_gate = MotionGate()
+            self.last_faces = None
+            
+            # 感兴趣区域裁剪：只在上一次面部附近的区域推理
+            self.face_roi = RoiCropper('FACE_ROI')
+            
             logger.info("面部识别模块初始化完成")
         except Exception as e:
             logger.error(f"初始化面部识别器时出错: {str(e)}")
             # 确保即使初始化失败，对象也能正常使用
+            if not hasattr(self, 'max_num_faces'):
+                self.max_num_faces = 1
             if not hasattr(self, 'mp_face_mesh'):
                 self.mp_face_mesh = mp.solutions.face_mesh
-            if not hasattr(self, 'mp_drawing'):
-                self.mp_drawing = mp.solutions.drawing_utils
+            if not hasattr(self, 'face_renderer'):
+                self.face_renderer = FaceRenderer()
             if not hasattr(self, 'face_mesh'):
                 self.face_mesh = None
+            if not hasattr(self, 'motion_gate'):
+                self.motion_gate = MotionGate()
+            if not hasattr(self, 'face_roi'):
+                self.face_roi = RoiCropper('FACE_ROI')
+            self.last_faces = None
+            self.face_ids = np.empty(0, dtype=np.int64)
+            self.expression_events = []
+    
+    def _create_face_mesh(self):
+        """
+        创建面部网格检测器
+        
+        @returns {object} FaceMesh 实例
+        """
+        return self.mp_face_mesh.FaceMesh(
+            static_image_mode=False,
+            max_num_faces=self.max_num_faces,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
     
-    def process_frame(self, frame):
+    def _build_feature_index(self):
+        """
+        构建表情特征用到的关键点索引
+
+        feature_index 为需要从468个关键点中取出的关键点（去重），
+        pair_a/pair_b 为取出后的数组中逐对求距离的下标，依次是：
+        左眼上下缘所有组合、右眼上下缘所有组合、左右眼宽度、嘴巴宽度、嘴巴高度
+        """
+        eyes = [
+            (self.left_eye_top, self.left_eye_bottom, self.left_eye_left, self.left_eye_right),
+            (self.right_eye_top, self.right_eye_bottom, self.right_eye_left, self.right_eye_right)
+        ]
+        pairs = []
+        for top, bottom, _, _ in eyes:
+            pairs.extend((t, b) for t in top for b in bottom)
+        self.eye_height_pairs = len(eyes[0][0]) * len(eyes[0][1])
+        pairs.extend((left[0], right[0]) for _, _, left, right in eyes)
+        pairs.append((self.mouth_left[0], self.mouth_right[0]))
+        pairs.append((self.mouth_top[0], self.mouth_bottom[0]))
+        
+        pairs = np.array(pairs, dtype=np.int32)
+        self.feature_index, inverse = np.unique(pairs, return_inverse=True)
+        inverse = inverse.reshape(pairs.shape)
+        self.pair_a = inverse[:, 0]
+        self.pair_b = inverse[:, 1]
+        self.feature_index_list = self.feature_index.tolist()
+    
+    def _compute_features(self, points):
+        """
+        一次计算所有面部的双眼长宽比和嘴巴宽高比
+        
+        @param {numpy.ndarray} points - (面部数, 特征关键点数, 2) 按原始帧宽高换算后的特征关键点
+        @returns {tuple} ((面部数, 2) 左右眼长宽比, (面部数,) 嘴巴宽高比)
+        """
+        diffs = points[:, self.pair_a] - points[:, self.pair_b]
+        distances = np.sqrt(np.einsum('fpc,fpc->fp', diffs, diffs))
+        
+        n = self.eye_height_pairs
+        # 眼睛高度为上下缘所有组合距离的平均
+        eye_heights = distances[:, :2 * n].reshape(-1, 2, n).mean(axis=2)
+        eye_widths = distances[:, 2 * n:2 * n + 2]
+        mouth_widths = distances[:, 2 * n + 2]
+        mouth_heights = distances[:, 2 * n + 3]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ears = np.where(eye_widths > 0, eye_heights / eye_widths, 1.0)
+            mars = np.where(mouth_heights > 0, mouth_widths / mouth_heights, 0.0)
+        return ears, mars
+    
+    def process_frame(self, frame, trace=None, prepared=None, context=None, face_landmarks=None, update=True):
         """
         处理视频帧，检测面部表情
         
-        @param {numpy.ndarray} frame - 输入的视频帧
-        @returns {tuple} (处理后的帧, 识别到的表情)
+        @param {numpy.ndarray} frame - 输入的视频帧（可以是已标注手势的帧，表情标注画在它的副本上）
+        @param {FrameTrace|None} trace - 延迟追踪记录，记录 face/face_annotate 阶段
+        @param {PreparedFrame|None} prepared - 原始帧的共享预处理结果，提供时在原始帧上检测，不再单独做颜色转换
+        @param {FrameContext|None} context - 帧上下文，提供时直接在其标注缓冲区上绘制，不再复制帧
+        @param {numpy.ndarray|None} face_landmarks - 已在其他地方（如推理进程池）检测好的 (面部数, 468, 3) 关键点，提供时不再运行检测
+        @param {bool} update - 为False时 face_landmarks 与上一次相同（如推理调度器还没有新结果），
+                               只绘制，不更新面部身份、表情状态和冷却，也不产生表情事件
+        @returns {tuple} (处理后的帧, 识别到的表情)；各表情所属的面部ID见 expression_events
         """
         if frame is None:
             return None, []
         
         try:
-            # 检查面部识别器是否已初始化
-            if not hasattr(self, 'face_mesh') or self.face_mesh is None:
-                logger.warning("面部识别器未初始化，重新初始化")
-                self.face_mesh = self.mp_face_mesh.FaceMesh(
-                    static_image_mode=False,
-                    max_num_faces=1,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5
-                )
-            
-            # 转换为RGB格式
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if context is not None and prepared is None:
+                prepared = context.prepared
             
-            # 处理图像
-            results = self.face_mesh.process(rgb_frame)
+            source_frame = prepared.bgr if prepared is not None else frame
+            if face_landmarks is not None:
+                faces = face_landmarks
+            else:
+                faces = self._detect_faces(frame, prepared)
+            if trace is not None:
+                trace.mark('face')
             
-            # 复制原始帧用于绘制
-            annotated_frame = frame.copy()
+            # 在帧上下文的标注缓冲区上绘制，没有上下文时复制输入帧
+            annotated_frame = context.annotated if context is not None else frame.copy()
             
             detected_expressions = []
+            self.expression_events = []
             
-            # 更新冷却计数器
-            if self.blink_cooldown > 0:
-                self.blink_cooldown -= 1
-            if self.smile_cooldown > 0:
-                self.smile_cooldown -= 1
+            # 重复的检测结果只绘制；脸数与上一次不一致时说明结果已经变化，照常更新
+            update = update or len(faces) != len(self.face_ids)
+            states = self.face_states
+            if update:
+                # 更新所有脸的冷却计数器
+                states.tick()
+                
+                # 为每张脸分配稳定ID（没有脸时也要更新，离开的脸累计丢失帧数）
+                slots, self.face_ids = states.assign(self._face_centers(faces))
             
             # 如果检测到面部
-            if results.multi_face_landmarks:
-                for face_landmarks in results.multi_face_landmarks:
-                    # 绘制面部网格
-                    self.mp_drawing.draw_landmarks(
-                        image=annotated_frame,
-                        landmark_list=face_landmarks,
-                        connections=self.mp_face_mesh.FACEMESH_TESSELATION,
-                        landmark_drawing_spec=None,
-                        connection_drawing_spec=self.mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=1)
-                    )
-                    
-                    # 提取关键点坐标
-                    h, w, _ = annotated_frame.shape
-                    landmarks = []
-                    for landmark in face_landmarks.landmark:
-                        x, y = int(landmark.x * w), int(landmark.y * h)
-                        landmarks.append((x, y))
-                    landmarks = np.array(landmarks)
-                    
-                    # 检测眨眼
-                    left_eye_closed = self._is_eye_closed(landmarks, self.left_eye_top, self.left_eye_bottom, self.left_eye_left, self.left_eye_right)
-                    right_eye_closed = self._is_eye_closed(landmarks, self.right_eye_top, self.right_eye_bottom, self.right_eye_left, self.right_eye_right)
-                    
-                    # 更新眼睛状态队列
-                    self.left_eye_state.append(left_eye_closed)
-                    self.right_eye_state.append(right_eye_closed)
-                    
-                    # 检测微笑
-                    is_smiling = self._is_smiling(landmarks)
-                    
-                    # 更新微笑状态队列
-                    self.smile_state.append(is_smiling)
-                    
-                    # 在调试模式下显示眼睛和嘴巴状态
-                    if self.debug:
-                        left_status = "闭合" if left_eye_closed else "睁开"
-                        right_status = "闭合" if right_eye_closed else "睁开"
-                        smile_status = "微笑" if is_smiling else "不笑"
-                        
-                        cv2.putText(annotated_frame, f"左眼: {left_status}", (10, 30), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                        cv2.putText(annotated_frame, f"右眼: {right_status}", (10, 60), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                        cv2.putText(annotated_frame, f"嘴巴: {smile_status}", (10, 90), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                    
-                    # 判断是否眨眼（两只眼睛都闭合然后睁开）
-                    if self.blink_cooldown == 0 and self._detect_blink():
+            if len(faces):
+                # 绘制按标注缓冲区（输出分辨率）换算，表情特征按原始帧的宽高比换算，与推理和输出分辨率无关
+                h, w, _ = annotated_frame.shape
+                source_h, source_w = source_frame.shape[:2]
+                draw_scale = np.array([w, h], dtype=np.float32)
+                feature_scale = np.array([source_w, source_h], dtype=np.float32)
+                
+                # 完整关键点时先取出特征关键点；只提取了特征关键点时直接使用
+                full_mesh = faces.shape[1] == FACE_LANDMARKS
+                points = faces[:, self.feature_index, :2] if full_mesh else faces[:, :, :2]
+                # 所有脸的特征一次计算，状态一次写入各自的环形缓冲区
+                ears, mars = self._compute_features(points * feature_scale)
+                closed = ears < self.eye_aspect_ratio_threshold
+                smiling = mars > self.smile_ratio_threshold
+                
+                if update:
+                    # 判断各脸是否眨眼、微笑，检测到后该脸进入冷却
+                    states.push(slots, closed, smiling)
+                    blinks = self._detect_blink(slots)
+                    smiles = self._detect_smile(slots)
+                    states.blink_cooldown[slots[blinks]] = self.cooldown_frames
+                    states.smile_cooldown[slots[smiles]] = self.cooldown_frames
+                else:
+                    blinks = smiles = np.zeros(len(faces), dtype=bool)
+                
+                if full_mesh:
+                    # 绘制面部网格（所有面部的连线一次绘制）
+                    self.face_renderer.draw(annotated_frame, (faces[:, :, :2] * draw_scale).astype(np.int32))
+                
+                for i in range(len(faces)):
+                    face_id = int(self.face_ids[i])
+                    if blinks[i]:
                         detected_expressions.append("blink")
-                        self.blink_cooldown = self.cooldown_frames
-                        logger.info("检测到眨眼")
-                    
-                    # 判断是否微笑
-                    if self.smile_cooldown == 0 and self._detect_smile():
+                        self.expression_events.append({'face_id': face_id, 'expression': "blink"})
+                        logger.info(f"检测到眨眼（脸 {face_id}）")
+                    if smiles[i]:
                         detected_expressions.append("smile")
-                        self.smile_cooldown = self.cooldown_frames
-                        logger.info("检测到微笑")
+                        self.expression_events.append({'face_id': face_id, 'expression': "smile"})
+                        logger.info(f"检测到微笑（脸 {face_id}）")
+                
+                # 在调试模式下显示眼睛和嘴巴状态
+                if self.debug:
+                    self._draw_debug(annotated_frame, points * draw_scale, closed, smiling)
+            
+            if trace is not None:
+                trace.mark('face_annotate')
             
             return annotated_frame, detected_expressions
             
@@ -207,12 +288,11 @@ class FaceRecognizer:
             try:
                 if hasattr(self, 'face_mesh') and self.face_mesh is not None:
                     self.face_mesh.close()
-                self.face_mesh = self.mp_face_mesh.FaceMesh(
-                    static_image_mode=False,
-                    max_num_faces=1,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5
-                )
+                self.face_mesh = self._create_face_mesh()
+                self.last_faces = None
+                self.face_states.reset()
+                self.motion_gate.reset()
+                self.face_roi.reset()
                 logger.info("面部识别器已重新初始化")
             except Exception as reinit_error:
                 logger.error(f"重新初始化面部识别器失败: {str(reinit_error)}")
@@ -220,91 +300,138 @@ class FaceRecognizer:
             # 返回原始帧和空表情列表
             return frame, []
     
-    def _is_eye_closed(self, landmarks, top_points, bottom_points, left_point, right_point):
-        """
-        判断眼睛是否闭合
-        
-        @param {numpy.ndarray} landmarks - 面部关键点
-        @param {list} top_points - 眼睛上缘点索引
-        @param {list} bottom_points - 眼睛下缘点索引
-        @param {list} left_point - 眼睛左角点索引
-        @param {list} right_point - 眼睛右角点索引
-        @returns {bool} 眼睛是否闭合
+    def detect_faces(self, frame, prepared=None):
         """
-        # 计算眼睛的高度（上下缘的平均距离）
-        eye_height = 0
-        for top_idx in top_points:
-            for bottom_idx in bottom_points:
-                height = np.linalg.norm(landmarks[top_idx] - landmarks[bottom_idx])
-                eye_height += height
-        eye_height /= (len(top_points) * len(bottom_points))
-        
-        # 计算眼睛的宽度
-        eye_width = np.linalg.norm(landmarks[left_point[0]] - landmarks[right_point[0]])
+        只运行面部检测（含运动门控），不判断表情也不绘制
         
-        # 计算眼睛长宽比
-        ear = eye_height / eye_width if eye_width > 0 else 1.0
+        供推理调度器在独立线程中调用，结果再通过 process_frame(face_landmarks=...) 交给表情判断
         
-        # 判断眼睛是否闭合
-        return ear < self.eye_aspect_ratio_threshold
+        @param {numpy.ndarray} frame - BGR视频帧
+        @param {PreparedFrame|None} prepared - 共享的预处理结果
+        @returns {numpy.ndarray} 面部关键点，出错时为空
+        """
+        try:
+            return self._detect_faces(frame, prepared)
+        except Exception as e:
+            logger.error(f"面部检测时出错: {str(e)}")
+            return empty_faces()
     
-    def _is_smiling(self, landmarks):
+    def _detect_faces(self, frame, prepared=None):
         """
-        判断是否在微笑
+        运行面部检测，画面静止时复用上一次的检测结果
         
-        @param {numpy.ndarray} landmarks - 面部关键点
-        @returns {bool} 是否在微笑
+        @param {numpy.ndarray} frame - BGR视频帧
+        @param {PreparedFrame|None} prepared - 共享的预处理结果
+        @returns {numpy.ndarray} (面部数, 468, 3) 关键点；不绘制网格时只包含表情特征用到的关键点
         """
-        # 计算嘴巴的宽度（左右嘴角的距离）
-        mouth_width = np.linalg.norm(landmarks[self.mouth_left[0]] - landmarks[self.mouth_right[0]])
+        # 检查面部识别器是否已初始化
+        if not hasattr(self, 'face_mesh') or self.face_mesh is None:
+            logger.warning("面部识别器未初始化，重新初始化")
+            self.face_mesh = self._create_face_mesh()
         
-        # 计算嘴巴的高度（上下嘴唇的距离）
-        mouth_height = np.linalg.norm(landmarks[self.mouth_top[0]] - landmarks[self.mouth_bottom[0]])
+        source_frame = prepared.bgr if prepared is not None else frame
+        if self.last_faces is not None and not self.motion_gate.should_process(source_frame):
+            # 画面静止，复用上一次的检测结果
+            return self.last_faces
         
-        # 计算嘴巴宽高比
-        mar = mouth_width / mouth_height if mouth_height > 0 else 0
+        # 转换为RGB格式
+        if prepared is not None:
+            rgb_frame = prepared.inference_rgb
+        else:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
-        # 判断是否在微笑
-        return mar > self.smile_ratio_threshold
+        # 处理图像，关键点只转换一次为数组；不绘制网格时只提取表情特征用到的关键点
+        draw_mesh = self.face_renderer.detail != FACE_DETAIL_NONE
+        self.last_faces = self._process_faces(rgb_frame, None if draw_mesh else self.feature_index_list)
+        return self.last_faces
     
-    def _detect_blink(self):
+    def _process_faces(self, rgb_frame, indices=None):
         """
-        检测眨眼动作（闭眼然后睁眼的过程）
+        在整帧或感兴趣区域裁剪图上运行 FaceMesh，关键点统一为整帧坐标
         
-        @returns {bool} 是否检测到眨眼
-        """
-        if len(self.left_eye_state) < self.blink_frames_threshold or len(self.right_eye_state) < self.blink_frames_threshold:
-            return False
+        裁剪图上没有找到面部、或面部贴近裁剪图边缘（可能被截断）时，同一帧立即回到整帧搜索
         
-        # 检查是否有连续的闭眼帧，然后是睁眼帧
-        left_closed_count = sum(1 for state in list(self.left_eye_state)[-self.blink_frames_threshold:] if state)
-        right_closed_count = sum(1 for state in list(self.right_eye_state)[-self.blink_frames_threshold:] if state)
+        @param {numpy.ndarray} rgb_frame - 推理用的RGB整帧
+        @param {list|None} indices - 只提取这些关键点，为None时提取全部
+        @returns {numpy.ndarray} 整帧归一化坐标的面部关键点
+        """
+        roi = self.face_roi
+        image, rect = roi.begin(rgb_frame)
+        faces = faces_to_array(self.face_mesh.process(image), indices)
         
-        # 最近的帧是否是睁眼状态
-        recent_left_open = not self.left_eye_state[-1]
-        recent_right_open = not self.right_eye_state[-1]
+        if rect is not None:
+            xy = faces[..., :2]
+            if len(faces) and xy.min() >= ROI_EDGE_MARGIN and xy.max() <= 1.0 - ROI_EDGE_MARGIN:
+                faces = roi.map_landmarks(faces, rect)
+            else:
+                logger.debug("裁剪区域内未找到完整的面部，回到整帧搜索")
+                faces = faces_to_array(self.face_mesh.process(roi.full(rgb_frame)), indices)
         
-        # 之前是否有足够的闭眼帧
-        enough_left_closed = left_closed_count >= self.blink_frames_threshold - 1
-        enough_right_closed = right_closed_count >= self.blink_frames_threshold - 1
+        roi.update(faces)
+        return faces
+    
+    def _face_centers(self, faces):
+        """
+        计算各脸的中心，用于跨帧匹配面部ID
         
-        # 检测到眨眼的条件：之前有足够的闭眼帧，最近的帧是睁眼状态
-        return (enough_left_closed and recent_left_open) or (enough_right_closed and recent_right_open)
+        @param {numpy.ndarray} faces - 面部关键点（完整网格或只含特征关键点）
+        @returns {numpy.ndarray} (面部数, 2) 归一化坐标的中心
+        """
+        if not len(faces):
+            return np.empty((0, 2), dtype=np.float32)
+        return faces[:, :, :2].mean(axis=1)
     
-    def _detect_smile(self):
+    def _detect_blink(self, slots):
         """
-        检测微笑动作
+        检测各脸的眨眼动作（闭眼然后睁眼的过程）
         
-        @returns {bool} 是否检测到微笑
+        @param {numpy.ndarray} slots - 各脸的状态槽位
+        @returns {numpy.ndarray} (面部数,) 是否检测到眨眼
         """
-        if len(self.smile_state) < self.smile_frames_threshold:
-            return False
+        states = self.face_states
+        ready = (states.eye_size[slots] == states.blink_window) & (states.blink_cooldown[slots] == 0)
         
-        # 检查是否有连续的微笑帧
-        smile_count = sum(1 for state in list(self.smile_state)[-self.smile_frames_threshold:] if state)
+        # 最近的帧是睁眼状态，且窗口内有足够的闭眼帧（左右眼任意一只）
+        opened = ~states.last_eyes(slots) & (states.eye_closed_counts[slots] >= self.blink_frames_threshold - 1)
+        return ready & opened.any(axis=1)
+    
+    def _detect_smile(self, slots):
+        """
+        检测各脸的微笑动作
         
-        # 如果连续帧中大部分是微笑状态，则认为检测到微笑
-        return smile_count >= self.smile_frames_threshold - 1
+        @param {numpy.ndarray} slots - 各脸的状态槽位
+        @returns {numpy.ndarray} (面部数,) 是否检测到微笑
+        """
+        states = self.face_states
+        ready = (states.smile_size[slots] == states.smile_window) & (states.smile_cooldown[slots] == 0)
+        # 如果窗口内大部分帧是微笑状态，则认为检测到微笑
+        return ready & (states.smile_counts[slots] >= self.smile_frames_threshold - 1)
+    
+    def _draw_debug(self, image, points, closed, smiling):
+        """
+        绘制各脸的眼睛和嘴巴状态；只有一张脸时画在左上角，多张脸时画在各脸的特征点上方并标注ID
+        
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {numpy.ndarray} points - (面部数, 特征关键点数, 2) 按标注图像换算的特征关键点
+        @param {numpy.ndarray} closed - (面部数, 2) 左右眼是否闭合
+        @param {numpy.ndarray} smiling - (面部数,) 是否微笑
+        """
+        for i in range(len(points)):
+            left_status = "闭合" if closed[i, 0] else "睁开"
+            right_status = "闭合" if closed[i, 1] else "睁开"
+            smile_status = "微笑" if smiling[i] else "不笑"
+            lines = [f"左眼: {left_status}", f"右眼: {right_status}", f"嘴巴: {smile_status}"]
+            
+            if self.max_num_faces == 1:
+                x, y = 10, 30
+            else:
+                lines.insert(0, f"ID: {int(self.face_ids[i])}")
+                x = int(points[i, :, 0].min())
+                y = max(30, int(points[i, :, 1].min()) - 30 * len(lines))
+            
+            for row, text in enumerate(lines):
+                cv2.putText(image, text, (x, y + 30 * row), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
     
     def release(self):
         """
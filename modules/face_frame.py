@@ -0,0 +1,33 @@
+import numpy as np
+
+# MediaPipe FaceMesh 关键点数量（未启用 refine_landmarks）
+FACE_LANDMARKS = 468
+
+def empty_faces():
+    """
+    @returns {numpy.ndarray} 没有面部的关键点数组
+    """
+    return np.empty((0, FACE_LANDMARKS, 3), dtype=np.float32)
+
+def faces_to_array(results, indices=None):
+    """
+    将MediaPipe FaceMesh结果转换为关键点数组，每帧只遍历一次protobuf对象
+
+    @param {object} results - face_mesh.process 的返回值
+    @param {list|None} indices - 只提取这些关键点（int列表），为None时提取全部468个
+    @returns {numpy.ndarray} (面部数, 468或索引数, 3) float32 归一化坐标
+    """
+    if results is None or not results.multi_face_landmarks:
+        if indices is None:
+            return empty_faces()
+        return np.empty((0, len(indices), 3), dtype=np.float32)
+    if indices is None:
+        return np.array(
+            [[(lm.x, lm.y, lm.z) for lm in face.landmark] for face in results.multi_face_landmarks],
+            dtype=np.float32
+        )
+    # 只访问需要的关键点，不构建完整的468点列表
+    return np.array(
+        [[(lm.x, lm.y, lm.z) for lm in (face.landmark[i] for i in indices)] for face in results.multi_face_landmarks],
+        dtype=np.float32
+    )
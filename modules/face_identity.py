@@ -0,0 +1,196 @@
+import numpy as np
+import logging
+import os
+from datetime import datetime
+from rich.logging import RichHandler
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/face_identity_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("face_identity")
+
+class FaceStateTracker:
+    """
+    多张脸的身份跟踪和表情状态
+
+    按中心位置把每帧的脸与已有的脸匹配，得到跨帧稳定的面部ID；
+    每张脸占用一个槽位，所有状态按结构数组保存（每个字段一个以槽位为第一维的数组）：
+    左右眼闭合、微笑的环形缓冲区及窗口内计数、冷却帧数，每帧对所有脸一次向量化更新
+    """
+    def __init__(self, max_faces=1, blink_window=3, smile_window=5, max_distance=0.2, max_missed=5):
+        """
+        @param {int} max_faces - 同时检测的最大脸数，槽位数为其两倍，刚离开的脸保留状态时新脸仍有空位
+        @param {int} blink_window - 眨眼判断的窗口长度（帧）
+        @param {int} smile_window - 微笑判断的窗口长度（帧）
+        @param {float} max_distance - 同一张脸相邻两次出现的最大中心距离（归一化坐标）
+        @param {int} max_missed - 脸连续未检测到多少帧后释放其槽位
+        """
+        slots = 2 * max(1, max_faces)
+        self.blink_window = max(1, blink_window)
+        self.smile_window = max(1, smile_window)
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+
+        # 身份：槽位所属的面部ID（-1 为空闲）、中心位置和连续丢失帧数
+        self.ids = np.full(slots, -1, dtype=np.int64)
+        self.centers = np.zeros((slots, 2), dtype=np.float32)
+        self.missed = np.zeros(slots, dtype=np.int32)
+
+        # 眼睛环形缓冲区：(槽位, 2, 窗口) 左右眼是否闭合，两只眼共用写入位置
+        self.eyes = np.zeros((slots, 2, self.blink_window), dtype=bool)
+        self.eye_closed_counts = np.zeros((slots, 2), dtype=np.int32)
+        self.eye_index = np.zeros(slots, dtype=np.int32)
+        self.eye_size = np.zeros(slots, dtype=np.int32)
+
+        # 微笑环形缓冲区：(槽位, 窗口)
+        self.smiles = np.zeros((slots, self.smile_window), dtype=bool)
+        self.smile_counts = np.zeros(slots, dtype=np.int32)
+        self.smile_index = np.zeros(slots, dtype=np.int32)
+        self.smile_size = np.zeros(slots, dtype=np.int32)
+
+        # 冷却帧数（避免同一张脸重复检测）
+        self.blink_cooldown = np.zeros(slots, dtype=np.int32)
+        self.smile_cooldown = np.zeros(slots, dtype=np.int32)
+
+        self.next_id = 1
+
+    def assign(self, centers):
+        """
+        为当前帧的脸分配槽位和稳定ID，未匹配到的脸累计丢失帧数
+
+        @param {numpy.ndarray} centers - (脸数, 2) 各脸中心（归一化坐标）
+        @returns {tuple} ((脸数,) 槽位编号, (脸数,) 面部ID)
+        """
+        count = len(centers)
+        slots = np.full(count, -1, dtype=np.intp)
+        active = np.flatnonzero(self.ids >= 0)
+
+        # 按距离从小到大贪心匹配（每帧只有几张脸，贪心与最优匹配几乎一致）
+        if count and len(active):
+            costs = np.linalg.norm(centers[:, None, :] - self.centers[None, active, :], axis=2)
+            used = np.zeros(len(active), dtype=bool)
+            for flat in np.argsort(costs, axis=None):
+                i, j = divmod(int(flat), len(active))
+                if costs[i, j] > self.max_distance:
+                    break
+                if slots[i] >= 0 or used[j]:
+                    continue
+                slots[i] = active[j]
+                used[j] = True
+
+        # 未匹配到的已有脸累计丢失帧数，超过上限后释放槽位
+        unmatched = np.setdiff1d(active, slots[slots >= 0])
+        self.missed[unmatched] += 1
+        expired = unmatched[self.missed[unmatched] > self.max_missed]
+        if len(expired):
+            logger.debug(f"脸 {self.ids[expired].tolist()} 已离开")
+            self.ids[expired] = -1
+
+        # 新出现的脸占用空闲槽位，没有空闲时替换丢失最久的脸
+        for i in np.flatnonzero(slots < 0):
+            free = np.flatnonzero(self.ids < 0)
+            if len(free):
+                slot = int(free[0])
+            else:
+                candidates = np.setdiff1d(np.flatnonzero(self.ids >= 0), slots[slots >= 0])
+                slot = int(candidates[np.argmax(self.missed[candidates])])
+            self._clear_slot(slot)
+            self.ids[slot] = self.next_id
+            self.next_id += 1
+            slots[i] = slot
+            logger.debug(f"新的脸 {self.ids[slot]}")
+
+        if count:
+            self.centers[slots] = centers
+            self.missed[slots] = 0
+        return slots, self.ids[slots].copy()
+
+    def push(self, slots, closed, smiling):
+        """
+        把各脸本帧的状态写入各自的环形缓冲区，覆盖窗口内最早的一帧
+
+        @param {numpy.ndarray} slots - (脸数,) 槽位编号，互不相同
+        @param {numpy.ndarray} closed - (脸数, 2) 左右眼是否闭合
+        @param {numpy.ndarray} smiling - (脸数,) 是否微笑
+        """
+        if not len(slots):
+            return
+
+        index = self.eye_index[slots]
+        # 窗口已满时先减去被覆盖的一帧
+        full = (self.eye_size[slots] == self.blink_window)[:, None]
+        self.eye_closed_counts[slots] += closed.astype(np.int32) - (full & self.eyes[slots, :, index])
+        self.eyes[slots, :, index] = closed
+        self.eye_index[slots] = (index + 1) % self.blink_window
+        self.eye_size[slots] = np.minimum(self.eye_size[slots] + 1, self.blink_window)
+
+        index = self.smile_index[slots]
+        full = self.smile_size[slots] == self.smile_window
+        self.smile_counts[slots] += smiling.astype(np.int32) - (full & self.smiles[slots, index])
+        self.smiles[slots, index] = smiling
+        self.smile_index[slots] = (index + 1) % self.smile_window
+        self.smile_size[slots] = np.minimum(self.smile_size[slots] + 1, self.smile_window)
+
+    def last_eyes(self, slots):
+        """
+        @param {numpy.ndarray} slots - 槽位编号
+        @returns {numpy.ndarray} (脸数, 2) 各脸最近一帧左右眼是否闭合
+        """
+        return self.eyes[slots, :, (self.eye_index[slots] - 1) % self.blink_window]
+
+    def tick(self):
+        """
+        所有槽位的冷却帧数减一
+        """
+        np.maximum(self.blink_cooldown - 1, 0, out=self.blink_cooldown)
+        np.maximum(self.smile_cooldown - 1, 0, out=self.smile_cooldown)
+
+    def _clear_slot(self, slot):
+        """
+        清空一个槽位的表情状态
+
+        @param {int} slot - 槽位编号
+        """
+        self.eyes[slot] = False
+        self.eye_closed_counts[slot] = 0
+        self.eye_index[slot] = 0
+        self.eye_size[slot] = 0
+        self.smiles[slot] = False
+        self.smile_counts[slot] = 0
+        self.smile_index[slot] = 0
+        self.smile_size[slot] = 0
+        self.blink_cooldown[slot] = 0
+        self.smile_cooldown[slot] = 0
+        self.missed[slot] = 0
+
+    def reset(self):
+        """
+        清除所有脸的身份和状态
+        """
+        self.ids.fill(-1)
+        for slot in range(len(self.ids)):
+            self._clear_slot(slot)
+
+    def get_stats(self):
+        """
+        获取身份跟踪统计数据
+
+        @returns {dict} 当前的脸和已分配的ID数
+        """
+        active = np.flatnonzero(self.ids >= 0)
+        return {
+            'faces': [
+                {'id': int(self.ids[slot]), 'missed': int(self.missed[slot])} for slot in active
+            ],
+            'ids_assigned': self.next_id - 1
+        }
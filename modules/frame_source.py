@@ -0,0 +1,470 @@
+import cv2
+import numpy as np
+import logging
+import os
+import time
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.shared_frames import SharedFrameClient
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/frame_source_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("frame_source")
+
+# 节奏模式
+PACING_REALTIME = "realtime"  # 按帧率实时输出
+PACING_FAST = "fast"  # 尽可能快地输出，用于基准测试
+
+class FrameSource:
+    """
+    帧源基类，Camera 通过该接口读取视频帧
+
+    子类实现 _open/_read/_release，基类负责节奏控制
+    """
+    # 是否需要水平翻转（镜像显示）
+    mirror = False
+
+    def __init__(self, fps=30.0, pacing=PACING_REALTIME):
+        """
+        @param {float} fps - 实时模式下的目标帧率
+        @param {str} pacing - 节奏模式：realtime 或 fast
+        """
+        if pacing not in (PACING_REALTIME, PACING_FAST):
+            logger.warning(f"未知的节奏模式: {pacing}，使用 {PACING_REALTIME}")
+            pacing = PACING_REALTIME
+        self.fps = fps if fps and fps > 0 else 30.0
+        self.pacing = pacing
+        self.opened = False
+        self.exhausted = False  # 不循环的帧源读完后为True
+        self.frame_index = 0
+        self._next_deadline = None
+
+    def open(self):
+        """
+        打开帧源
+
+        @returns {bool} 是否成功打开
+        """
+        self.exhausted = False
+        self.frame_index = 0
+        self._next_deadline = None
+        self.opened = self._open()
+        return self.opened
+
+    def read(self):
+        """
+        读取下一帧
+
+        @returns {tuple} (是否成功, 帧)
+        """
+        if not self.opened:
+            return False, None
+        self._pace()
+        success, frame = self._read()
+        if success:
+            self.frame_index += 1
+        return success, frame
+
+    def release(self):
+        """
+        释放帧源
+        """
+        if self.opened:
+            self._release()
+        self.opened = False
+
+    def is_opened(self):
+        """
+        @returns {bool} 帧源是否已打开
+        """
+        return self.opened
+
+    def describe(self):
+        """
+        @returns {str} 帧源描述，用于日志
+        """
+        return self.__class__.__name__
+
+    def _pace(self):
+        """
+        实时模式下按目标帧率等待
+        """
+        if self.pacing != PACING_REALTIME:
+            return
+        now = time.monotonic()
+        if self._next_deadline is None:
+            self._next_deadline = now
+        delay = self._next_deadline - now
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # 落后太多时不追帧
+            self._next_deadline = max(self._next_deadline, now - 1.0 / self.fps)
+        self._next_deadline += 1.0 / self.fps
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _read(self):
+        raise NotImplementedError
+
+    def _release(self):
+        pass
+
+class WebcamSource(FrameSource):
+    """
+    摄像头帧源，依次尝试多个摄像头索引
+    """
+    mirror = True
+
+    def __init__(self, indices=(0, 1, 2), width=640, height=480):
+        """
+        @param {tuple} indices - 依次尝试的摄像头索引
+        @param {int} width - 采集宽度
+        @param {int} height - 采集高度
+        """
+        # 摄像头本身按硬件帧率阻塞，无需额外节奏控制
+        super().__init__(pacing=PACING_FAST)
+        self.indices = tuple(indices)
+        self.width = width
+        self.height = height
+        self.video = None
+        self.index = None
+
+    def _open(self):
+        for camera_index in self.indices:
+            logger.info(f"尝试打开摄像头索引 {camera_index}")
+            video = cv2.VideoCapture(camera_index)
+
+            # 设置摄像头属性
+            video.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            video.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+
+            # 检查摄像头是否成功打开
+            if video.isOpened():
+                # 尝试读取一帧，确认摄像头工作正常
+                success, test_frame = video.read()
+                if success and test_frame is not None:
+                    logger.info(f"成功打开摄像头索引 {camera_index} 并读取测试帧，采集分辨率 {test_frame.shape[1]}x{test_frame.shape[0]}")
+                    self.video = video
+                    self.index = camera_index
+                    return True
+                logger.warning(f"摄像头索引 {camera_index} 打开但无法读取帧")
+            else:
+                logger.warning(f"无法打开摄像头索引 {camera_index}")
+            video.release()
+
+        logger.error("所有摄像头索引尝试失败")
+        return False
+
+    def _read(self):
+        if self.video is None or not self.video.isOpened():
+            return False, None
+        return self.video.read()
+
+    def _release(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+
+    def describe(self):
+        return f"摄像头 {self.index if self.index is not None else list(self.indices)}"
+
+class VideoFileSource(FrameSource):
+    """
+    视频文件帧源，默认读到末尾后从头循环
+    """
+    def __init__(self, path, pacing=PACING_REALTIME, loop=True):
+        """
+        @param {str} path - 视频文件路径
+        @param {str} pacing - 节奏模式
+        @param {bool} loop - 是否循环播放
+        """
+        super().__init__(pacing=pacing)
+        self.path = path
+        self.loop = loop
+        self.video = None
+
+    def _open(self):
+        if not os.path.isfile(self.path):
+            logger.error(f"视频文件不存在: {self.path}")
+            return False
+        self.video = cv2.VideoCapture(self.path)
+        if not self.video.isOpened():
+            logger.error(f"无法打开视频文件: {self.path}")
+            self.video.release()
+            self.video = None
+            return False
+        file_fps = self.video.get(cv2.CAP_PROP_FPS)
+        if file_fps and file_fps > 0:
+            self.fps = file_fps
+        return True
+
+    def _read(self):
+        success, frame = self.video.read()
+        if not success and self.loop:
+            # 回到开头继续播放
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.video.read()
+        if not success:
+            self.exhausted = True
+        return success, frame
+
+    def _release(self):
+        if self.video is not None:
+            self.video.release()
+            self.video = None
+
+    def describe(self):
+        return f"视频文件 {self.path}"
+
+class ImageDirectorySource(FrameSource):
+    """
+    图片目录帧源，按文件名顺序输出目录中的图片
+    """
+    extensions = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, directory, fps=30.0, pacing=PACING_REALTIME, loop=True, preload=True):
+        """
+        @param {str} directory - 图片目录
+        @param {float} fps - 实时模式下的帧率
+        @param {str} pacing - 节奏模式
+        @param {bool} loop - 是否循环输出
+        @param {bool} preload - 是否预先解码全部图片，避免解码开销干扰基准测试
+        """
+        super().__init__(fps=fps, pacing=pacing)
+        self.directory = directory
+        self.loop = loop
+        self.preload = preload
+        self.files = []
+        self.images = []
+        self.position = 0
+
+    def _open(self):
+        if not os.path.isdir(self.directory):
+            logger.error(f"图片目录不存在: {self.directory}")
+            return False
+        self.files = sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.lower().endswith(self.extensions)
+        )
+        if not self.files:
+            logger.error(f"图片目录中没有图片: {self.directory}")
+            return False
+        self.images = []
+        if self.preload:
+            self.images = [cv2.imread(path) for path in self.files]
+        self.position = 0
+        logger.info(f"图片目录帧源包含 {len(self.files)} 张图片")
+        return True
+
+    def _read(self):
+        if self.position >= len(self.files):
+            if not self.loop:
+                self.exhausted = True
+                return False, None
+            self.position = 0
+        if self.preload:
+            frame = self.images[self.position]
+        else:
+            frame = cv2.imread(self.files[self.position])
+        self.position += 1
+        return frame is not None, frame
+
+    def _release(self):
+        self.images = []
+
+    def describe(self):
+        return f"图片目录 {self.directory}"
+
+class SyntheticSource(FrameSource):
+    """
+    合成帧源，生成可复现的测试画面（渐变背景和运动的圆形）
+    """
+    def __init__(self, width=640, height=480, fps=30.0, pacing=PACING_REALTIME, seed=0):
+        """
+        @param {int} width - 帧宽度
+        @param {int} height - 帧高度
+        @param {float} fps - 实时模式下的帧率
+        @param {str} pacing - 节奏模式
+        @param {int} seed - 随机种子，相同种子生成相同的帧序列
+        """
+        super().__init__(fps=fps, pacing=pacing)
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.background = None
+        self.frame = None
+        self.blobs = None
+
+    def _open(self):
+        rng = np.random.default_rng(self.seed)
+
+        # 预先生成背景，每帧只复制背景再画运动物体
+        xs = np.linspace(0, 255, self.width, dtype=np.float32)
+        ys = np.linspace(0, 255, self.height, dtype=np.float32)
+        self.background = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.background[:, :, 0] = xs[None, :]
+        self.background[:, :, 1] = ys[:, None]
+        self.background[:, :, 2] = 128
+        self.frame = np.empty_like(self.background)
+
+        # 运动物体：圆心、速度、半径、颜色
+        count = 3
+        self.blobs = {
+            'pos': rng.uniform([0, 0], [self.width, self.height], size=(count, 2)),
+            'vel': rng.uniform(-8, 8, size=(count, 2)),
+            'radius': rng.integers(20, 60, size=count),
+            'color': rng.integers(0, 256, size=(count, 3))
+        }
+        return True
+
+    def _read(self):
+        np.copyto(self.frame, self.background)
+
+        # 按帧序号计算位置，在边界处反弹
+        size = np.array([self.width, self.height], dtype=np.float64)
+        pos = self.blobs['pos'] + self.blobs['vel'] * self.frame_index
+        pos = np.abs((pos + size) % (2 * size) - size)
+        for (x, y), radius, color in zip(pos, self.blobs['radius'], self.blobs['color']):
+            cv2.circle(self.frame, (int(x), int(y)), int(radius), tuple(int(c) for c in color), -1)
+        return True, self.frame
+
+    def _release(self):
+        self.background = None
+        self.frame = None
+
+    def describe(self):
+        return f"合成帧源 {self.width}x{self.height}"
+
+class SharedMemorySource(FrameSource):
+    """
+    共享内存帧源，读取采集守护进程（python -m modules.camera）发布的帧
+    """
+    def __init__(self, name, timeout=1.0):
+        """
+        @param {str} name - 共享内存名称
+        @param {float} timeout - 等待新帧的最长时间（秒）
+        """
+        # 发布端决定帧率，这里只需等待新帧
+        super().__init__(pacing=PACING_FAST)
+        self.name = name
+        self.timeout = timeout
+        self.client = None
+        self.last_seq = None
+        self.frame = None
+
+    def _open(self):
+        try:
+            self.client = SharedFrameClient(self.name)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"无法连接共享内存 {self.name}: {str(e)}")
+            return False
+        self.last_seq = None
+        self.frame = np.empty(self.client.shape, dtype=np.uint8)
+        return True
+
+    def _read(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            handle = self.client.wait_for_frame(
+                timeout=max(0.0, deadline - time.monotonic()),
+                after_seq=self.last_seq
+            )
+            if handle is None:
+                return False, None
+            if self.frame.shape != handle.frame.shape:
+                # 发布端重新创建了不同尺寸的共享内存
+                self.frame = np.empty(handle.frame.shape, dtype=np.uint8)
+            np.copyto(self.frame, handle.frame)
+            # 复制期间被发布端覆盖则重读
+            if handle.is_valid():
+                self.last_seq = handle.seq
+                return True, self.frame
+
+    def _release(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+    def describe(self):
+        return f"共享内存 {self.name}"
+
+def parse_size(value, default=None):
+    """
+    解析 "宽x高" 格式的分辨率
+
+    @param {str|None} value - 分辨率描述，如 "640x480"
+    @param {tuple|None} default - 为空或格式错误时的返回值
+    @returns {tuple|None} (宽, 高)
+    """
+    if not value:
+        return default
+    width, _, height = value.strip().lower().partition('x')
+    try:
+        size = (int(width), int(height))
+    except ValueError:
+        logger.warning(f"无法解析分辨率: {value}")
+        return default
+    if size[0] <= 0 or size[1] <= 0:
+        logger.warning(f"无效的分辨率: {value}")
+        return default
+    return size
+
+def create_frame_source(spec=None, pacing=None):
+    """
+    根据描述创建帧源，未指定时读取环境变量
+
+    描述格式：
+      webcam / webcam:1            摄像头（可指定索引）
+      video:/path/to/file.mp4      视频文件
+      images:/path/to/directory    图片目录
+      synthetic / synthetic:WxH    合成帧
+      shm:name                     采集守护进程发布的共享内存帧
+
+    环境变量：FRAME_SOURCE（描述）、FRAME_SOURCE_PACING（realtime/fast）、
+    FRAME_SOURCE_FPS（图片目录和合成帧源的帧率）、CAPTURE_SIZE（摄像头采集分辨率，如 1280x720）
+
+    @param {str|None} spec - 帧源描述
+    @param {str|None} pacing - 节奏模式
+    @returns {FrameSource} 帧源
+    """
+    spec = spec or os.environ.get('FRAME_SOURCE', 'webcam')
+    pacing = pacing or os.environ.get('FRAME_SOURCE_PACING', PACING_REALTIME)
+    fps = float(os.environ.get('FRAME_SOURCE_FPS', 30))
+
+    kind, _, arg = spec.partition(':')
+    kind = kind.strip().lower()
+    arg = arg.strip()
+
+    if kind == 'webcam':
+        width, height = parse_size(os.environ.get('CAPTURE_SIZE'), (640, 480))
+        if arg:
+            return WebcamSource(indices=(int(arg),), width=width, height=height)
+        return WebcamSource(width=width, height=height)
+    if kind == 'video':
+        return VideoFileSource(arg, pacing=pacing)
+    if kind == 'images':
+        return ImageDirectorySource(arg, fps=fps, pacing=pacing)
+    if kind == 'synthetic':
+        width, height = parse_size(arg, (640, 480))
+        return SyntheticSource(width, height, fps=fps, pacing=pacing)
+
+    if kind == 'shm':
+        return SharedMemorySource(arg or 'nysm_frames')
+
+    logger.warning(f"未知的帧源描述: {spec}，使用摄像头")
+    width, height = parse_size(os.environ.get('CAPTURE_SIZE'), (640, 480))
+    return WebcamSource(width=width, height=height)
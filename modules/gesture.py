@@ -1,11 +1,19 @@
 import cv2
 import mediapipe as mp
 import numpy as np
+import copy
 import logging
-import random
 from datetime import datetime
 from rich.logging import RichHandler
 import os
+from modules.motion_gate import MotionGate
+from modules.hand_frame import HandFrame, INDEX_FINGER_MCP, INDEX_FINGER_TIP
+from modules.landmark_flow import LandmarkTracker
+from modules.roi import RoiCropper
+from modules.gesture_templates import GestureTemplateIndex, TemplateRecorder, hand_features
+from modules.motion_gestures import MotionGestureRecognizer
+from modules.hand_identity import HandIdentityTracker
+from modules.renderer import HandRenderer
 
 # 设置日志
 if not os.path.exists('logs'):
@@ -22,6 +30,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger("gesture")
 
+class GestureResult:
+    """
+    手势识别的结构化结果，不包含任何绘制
+    """
+    def __init__(self, hands=None):
+        """
+        @param {HandFrame|None} hands - 手部关键点数组
+        """
+        self.hands = hands if hands is not None else HandFrame.empty()
+        self.gestures = []  # 当前生效的手势（各手的稳定手势、本帧的缩放和动态手势），不重复
+        self.events = []  # 本帧新开始的手势（稳定手势的开始、缩放和动态手势），每次动作只出现一次
+        self.hand_ids = np.empty(0, dtype=np.int32)  # 每只手跨帧稳定的ID
+        self.hand_gestures = []  # 每只手经过滞回的稳定手势
+        self.raw_hand_gestures = []  # 每只手本帧的原始手势
+        self.hand_events = []  # 各手稳定手势的开始/结束事件
+        self.motion_gestures = []  # 本帧识别到的动态手势（挥动、画圈）
+        self.directions = np.empty((0, 2), dtype=np.float32)  # 每只手的食指方向
+        self.direction_names = []
+        self.finger_direction = None  # 最后一只手的食指方向 (dx, dy)
+        self.direction_name = None
+    
+    def repeated(self):
+        """
+        同一检测结果再次用于后续输出帧时的结果：保留手、稳定手势和方向用于绘制和显示，
+        去掉只属于第一次识别那一帧的事件、缩放和动态手势，避免重复触发
+        
+        @returns {GestureResult} 浅拷贝的结果
+        """
+        result = copy.copy(self)
+        result.events = []
+        result.hand_events = []
+        result.motion_gestures = []
+        result.gestures = [gesture for gesture in dict.fromkeys(self.hand_gestures) if gesture]
+        return result
+
 class GestureRecognizer:
     """
     手势识别类，使用MediaPipe进行手部检测和手势识别
@@ -31,17 +74,13 @@ class GestureRecognizer:
         初始化手势识别器
         """
         try:
+            self.max_num_hands = int(os.environ.get('MAX_NUM_HANDS', 2))
             self.mp_hands = mp.solutions.hands
-            self.mp_drawing = mp.solutions.drawing_utils
-            self.mp_drawing_styles = mp.solutions.drawing_styles
+            # 绘制样式和连线索引只构建一次
+            self.hand_renderer = HandRenderer()
             
             # 初始化手部检测器
-            self.hands = self.mp_hands.Hands(
-                static_image_mode=False,
-                max_num_hands=2,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
+            self.hands = self._create_hands()
             
             # 手势定义
             self.gestures = {
@@ -51,281 +90,159 @@ class GestureRecognizer:
                 "peace": "剪刀手",
                 "pointing": "指向",
                 "zoom_in": "放大",
-                "zoom_out": "缩小"
+                "zoom_out": "缩小",
+                "swipe_left": "向左挥动",
+                "swipe_right": "向右挥动",
+                "swipe_up": "向上挥动",
+                "swipe_down": "向下挥动",
+                "circle_cw": "顺时针画圈",
+                "circle_ccw": "逆时针画圈"
             }
             
-            # 特效相关
-            self.matrix_effect_enabled = False
-            self.matrix_chars = []
-            self.init_matrix_effect()
-            
-            # 双手手势相关
-            self.prev_hands_distance = None
+            # 双手手势相关：按手部ID对记录距离和冷却，手的顺序变化不影响
+            self.pair_distances = {}
+            self.pair_cooldowns = {}
             self.distance_threshold = 0.05  # 距离变化阈值
-            self.zoom_cooldown = 0
             self.zoom_cooldown_frames = 10  # 缩放手势冷却帧数
             
+            # 手部身份：跨帧稳定的ID和每只手的手势滞回
+            self.hand_identity = HandIdentityTracker()
+            
+            # 运动门控：画面静止时复用上一次的检测结果
+            self.motion_gate = MotionGate()
+            self.last_hand_frame = None
+            
+            # 最近一次识别的结果，检测结果没有更新时用于重复绘制
+            self.last_result = None
+            
+            # 关键点光流跟踪：每N帧完整推理一次，中间帧用光流传播关键点
+            self.landmark_tracker = LandmarkTracker()
+            
+            # 感兴趣区域裁剪：在上一次手部包围盒附近的裁剪图上推理
+            self.hand_roi = RoiCropper('HAND_ROI')
+            
+            # 自定义手势模板：k近邻匹配，匹配成功时优先于内置规则
+            self.gesture_templates = GestureTemplateIndex()
+            self.template_recorder = None
+            
+            # 动态手势：食指指尖轨迹的环形缓冲区与批量DTW模板匹配
+            self.motion_gestures = MotionGestureRecognizer(max_hands=self.max_num_hands)
+            
             logger.info("手势识别模块初始化完成")
         except Exception as e:
             logger.error(f"初始化手势识别器时出错: {str(e)}")
             # 确保即使初始化失败，对象也能正常使用
+            if not hasattr(self, 'max_num_hands'):
+                self.max_num_hands = 2
             if not hasattr(self, 'mp_hands'):
                 self.mp_hands = mp.solutions.hands
-            if not hasattr(self, 'mp_drawing'):
-                self.mp_drawing = mp.solutions.drawing_utils
-            if not hasattr(self, 'mp_drawing_styles'):
-                self.mp_drawing_styles = mp.solutions.drawing_styles
+            if not hasattr(self, 'hand_renderer'):
+                self.hand_renderer = HandRenderer()
             if not hasattr(self, 'hands'):
                 self.hands = None
             if not hasattr(self, 'gestures'):
                 self.gestures = {}
-            if not hasattr(self, 'matrix_effect_enabled'):
-                self.matrix_effect_enabled = False
-            if not hasattr(self, 'matrix_chars'):
-                self.matrix_chars = []
-    
-    def init_matrix_effect(self):
-        """初始化黑客帝国特效"""
-        # 创建一些随机的字符用于矩阵效果
-        chars = "01"
-        self.matrix_chars = []
-        for i in range(100):  # 创建100个随机字符
-            char = random.choice(chars)
-            x = random.randint(0, 640)
-            y = random.randint(0, 480)
-            speed = random.randint(5, 15)
-            size = random.uniform(0.5, 1.5)
-            self.matrix_chars.append({
-                'char': char,
-                'x': x,
-                'y': y,
-                'speed': speed,
-                'size': size
-            })
-    
-    def toggle_matrix_effect(self):
-        """切换黑客帝国特效状态"""
-        self.matrix_effect_enabled = not self.matrix_effect_enabled
-        logger.info(f"黑客帝国特效: {'开启' if self.matrix_effect_enabled else '关闭'}")
-        return self.matrix_effect_enabled
+            if not hasattr(self, 'motion_gate'):
+                self.motion_gate = MotionGate()
+            if not hasattr(self, 'landmark_tracker'):
+                self.landmark_tracker = LandmarkTracker()
+            if not hasattr(self, 'hand_roi'):
+                self.hand_roi = RoiCropper('HAND_ROI')
+            if not hasattr(self, 'gesture_templates'):
+                self.gesture_templates = GestureTemplateIndex()
+            if not hasattr(self, 'motion_gestures'):
+                self.motion_gestures = MotionGestureRecognizer(max_hands=self.max_num_hands)
+            if not hasattr(self, 'hand_identity'):
+                self.hand_identity = HandIdentityTracker()
+            if not hasattr(self, 'zoom_cooldown_frames'):
+                self.distance_threshold = 0.05
+                self.zoom_cooldown_frames = 10
+            self.pair_distances = {}
+            self.pair_cooldowns = {}
+            self.template_recorder = None
+            self.last_hand_frame = None
+            self.last_result = None
     
-    def apply_matrix_effect(self, image):
-        """应用黑客帝国特效"""
-        if not self.matrix_effect_enabled:
-            return image
-        
-        # 创建一个黑色背景
-        height, width = image.shape[:2]
-        matrix_overlay = np.zeros((height, width, 3), dtype=np.uint8)
-        
-        # 更新字符位置并绘制
-        for char in self.matrix_chars:
-            # 更新Y位置（下落效果）
-            char['y'] += char['speed']
-            if char['y'] > height:
-                char['y'] = 0
-                char['x'] = random.randint(0, width)
-            
-            # 绘制字符
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            color = (0, 255, 0)  # 绿色
-            cv2.putText(matrix_overlay, char['char'], 
-                       (int(char['x']), int(char['y'])), 
-                       font, char['size'], color, 1, cv2.LINE_AA)
-        
-        # 将原始图像转换为绿色色调
-        green_image = np.zeros_like(image)
-        green_image[:,:,1] = image[:,:,1]  # 只保留绿色通道
-        
-        # 混合原始图像和矩阵效果
-        alpha = 0.7
-        beta = 0.5
-        gamma = 0
-        
-        # 先将原始图像转为绿色调
-        green_tint = cv2.addWeighted(image, 0.1, green_image, 0.9, gamma)
-        
-        # 然后添加矩阵字符
-        result = cv2.addWeighted(green_tint, alpha, matrix_overlay, beta, gamma)
+    def _create_hands(self):
+        """
+        创建MediaPipe手部检测器
         
-        return result
+        @returns {object} Hands 实例
+        """
+        return self.mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=self.max_num_hands,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
     
-    def process_frame(self, frame):
+    def recognize(self, frame, trace=None, prepared=None, hand_frame=None, update=True):
         """
-        处理视频帧，检测手部并识别手势
+        只识别不绘制：检测手部并返回结构化结果
         
         @param {numpy.ndarray} frame - 输入的视频帧
-        @returns {tuple} (处理后的帧, 识别到的手势, 食指方向, 方向名称)
+        @param {FrameTrace|None} trace - 延迟追踪记录，记录 hands 阶段
+        @param {PreparedFrame|None} prepared - 共享的预处理结果，提供时不再单独做颜色转换
+        @param {HandFrame|None} hand_frame - 已在其他地方（如推理进程池）检测好的手部关键点，提供时不再运行检测
+        @param {bool} update - 为False时 hand_frame 与上一次相同（如推理调度器还没有新结果），
+                               直接复用上一次的识别结果，不更新身份滞回、动态手势轨迹和缩放
+        @returns {GestureResult} 识别结果
         """
         if frame is None:
-            return None, [], None, None
+            return GestureResult()
+        
+        if not update and self.last_result is not None and self.last_result.hands is hand_frame:
+            if trace is not None:
+                trace.mark('hands')
+            return self.last_result.repeated()
         
         try:
             # 检查手势识别器是否已初始化
             if not hasattr(self, 'hands') or self.hands is None:
                 logger.warning("手势识别器未初始化，重新初始化")
-                self.hands = self.mp_hands.Hands(
-                    static_image_mode=False,
-                    max_num_hands=2,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5
-                )
+                self.hands = self._create_hands()
             
-            # 转换为RGB格式，MediaPipe需要RGB输入
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if hand_frame is None:
+                hand_frame = self._detect_hands(frame, prepared)
+            if trace is not None:
+                trace.mark('hands')
             
-            # 处理图像
-            results = self.hands.process(rgb_frame)
+            result = GestureResult(hand_frame)
+            self.last_result = result
             
-            # 复制原始帧用于绘制
-            annotated_frame = frame.copy()
+            # 原始手势经过身份匹配和滞回得到各手的稳定手势（没有手时也要更新，以便老化离开的手）
+            if len(hand_frame):
+                result.raw_hand_gestures = hand_frame.gestures()
+                self._match_templates(frame, hand_frame, result)
+            result.hand_ids, result.hand_gestures, result.hand_events = self.hand_identity.update(
+                hand_frame, result.raw_hand_gestures
+            )
             
-            detected_gestures = []
-            finger_direction = None
-            direction_name = None
+            height, width = frame.shape[:2]
+            result.motion_gestures = self.motion_gestures.update(hand_frame, width / height, hand_ids=result.hand_ids)
+            zoom_gestures = self._detect_zoom(hand_frame, result.hand_ids)
             
-            # 缩放手势冷却时间减少
-            if hasattr(self, 'zoom_cooldown') and self.zoom_cooldown > 0:
-                self.zoom_cooldown -= 1
+            started = [event['gesture'] for event in result.hand_events if event['type'] == 'start']
+            for gesture in zoom_gestures + result.hand_gestures + result.motion_gestures:
+                if gesture and gesture not in result.gestures:
+                    result.gestures.append(gesture)
+            for gesture in zoom_gestures + started + result.motion_gestures:
+                if gesture not in result.events:
+                    result.events.append(gesture)
             
-            # 如果检测到手
-            if results.multi_hand_landmarks:
-                # 检测到的手的数量
-                num_hands = len(results.multi_hand_landmarks)
-                
-                # 如果检测到两只手，处理双手手势
-                if num_hands == 2:
-                    # 获取两只手的中心点
-                    hand1_landmarks = results.multi_hand_landmarks[0].landmark
-                    hand2_landmarks = results.multi_hand_landmarks[1].landmark
-                    
-                    # 计算两手中心点
-                    hand1_center_x = sum(landmark.x for landmark in hand1_landmarks) / len(hand1_landmarks)
-                    hand1_center_y = sum(landmark.y for landmark in hand1_landmarks) / len(hand1_landmarks)
-                    
-                    hand2_center_x = sum(landmark.x for landmark in hand2_landmarks) / len(hand2_landmarks)
-                    hand2_center_y = sum(landmark.y for landmark in hand2_landmarks) / len(hand2_landmarks)
-                    
-                    # 计算两手之间的距离
-                    current_distance = np.sqrt((hand1_center_x - hand2_center_x)**2 + (hand1_center_y - hand2_center_y)**2)
-                    
-                    # 在图像上绘制两手之间的连线
-                    h, w, c = annotated_frame.shape
-                    hand1_center = (int(hand1_center_x * w), int(hand1_center_y * h))
-                    hand2_center = (int(hand2_center_x * w), int(hand2_center_y * h))
-                    cv2.line(annotated_frame, hand1_center, hand2_center, (255, 0, 255), 2)
-                    
-                    # 在连线中间显示距离
-                    mid_point = ((hand1_center[0] + hand2_center[0]) // 2, (hand1_center[1] + hand2_center[1]) // 2)
-                    cv2.putText(
-                        annotated_frame,
-                        f"距离: {current_distance:.2f}",
-                        mid_point,
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.7,
-                        (255, 0, 255),
-                        2
-                    )
-                    
-                    # 如果有前一帧的距离记录，比较距离变化
-                    if hasattr(self, 'prev_hands_distance') and self.prev_hands_distance is not None and self.zoom_cooldown == 0:
-                        # 计算距离变化
-                        distance_change = current_distance - self.prev_hands_distance
-                        
-                        # 如果距离变化超过阈值，识别为缩放手势
-                        if abs(distance_change) > self.distance_threshold:
-                            if distance_change > 0:
-                                # 两手分开，放大
-                                detected_gestures.append("zoom_in")
-                                logger.info(f"检测到放大手势，距离变化: {distance_change:.2f}")
-                            else:
-                                # 两手靠近，缩小
-                                detected_gestures.append("zoom_out")
-                                logger.info(f"检测到缩小手势，距离变化: {distance_change:.2f}")
-                            
-                            # 设置缩放手势冷却时间
-                            self.zoom_cooldown = self.zoom_cooldown_frames
-                    
-                    # 更新前一帧的距离记录
-                    self.prev_hands_distance = current_distance
-                else:
-                    # 如果只检测到一只手，重置前一帧的距离记录
-                    self.prev_hands_distance = None
-                
-                # 处理每只手的单手手势
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # 绘制手部关键点和连接线
-                    self.mp_drawing.draw_landmarks(
-                        annotated_frame,
-                        hand_landmarks,
-                        self.mp_hands.HAND_CONNECTIONS,
-                        self.mp_drawing_styles.get_default_hand_landmarks_style(),
-                        self.mp_drawing_styles.get_default_hand_connections_style()
-                    )
-                    
-                    # 识别手势
-                    gesture = self._recognize_gesture(hand_landmarks.landmark)
-                    
-                    # 无论是什么手势，都计算食指方向
-                    # 这样即使手势不是"指向"，也能获取食指方向
-                    finger_direction, direction_name = self._get_finger_direction(hand_landmarks.landmark)
-                    
-                    # 在图像上绘制方向箭头
-                    h, w, c = annotated_frame.shape
-                    landmarks = hand_landmarks.landmark
-                    index_mcp = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_MCP.value]
-                    index_tip = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_TIP.value]
-                    
-                    # 计算箭头起点和终点
-                    start_point = (int(index_mcp.x * w), int(index_mcp.y * h))
-                    end_point = (int(index_tip.x * w), int(index_tip.y * h))
-                    
-                    # 绘制箭头
-                    cv2.arrowedLine(
-                        annotated_frame, 
-                        start_point, 
-                        end_point, 
-                        (0, 255, 255), 
-                        2, 
-                        tipLength=0.3
-                    )
-                    
-                    # 在箭头附近显示方向名称
-                    cv2.putText(
-                        annotated_frame,
-                        f"方向: {direction_name}",
-                        (end_point[0] + 10, end_point[1]),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.7,
-                        (0, 255, 255),
-                        2
-                    )
-                    
-                    if gesture and gesture not in ["zoom_in", "zoom_out"]:
-                        # 避免重复添加缩放手势
-                        if gesture not in detected_gestures:
-                            detected_gestures.append(gesture)
-                        
-                        # 在图像上显示手势名称
-                        cx = int(sum(landmark.x for landmark in landmarks) / len(landmarks) * w)
-                        cy = int(sum(landmark.y for landmark in landmarks) / len(landmarks) * h)
-                        
-                        # 在图像上显示手势名称
-                        cv2.putText(
-                            annotated_frame, 
-                            self.gestures.get(gesture, gesture), 
-                            (cx - 50, cy - 20),
-                            cv2.FONT_HERSHEY_SIMPLEX, 
-                            1, 
-                            (0, 255, 0), 
-                            2
-                        )
-            
-            # 应用黑客帝国特效（如果启用）
-            if self.matrix_effect_enabled:
-                annotated_frame = self.apply_matrix_effect(annotated_frame)
-            
-            return annotated_frame, detected_gestures, finger_direction, direction_name
+            if not len(hand_frame):
+                return result
+            
+            # 所有手的食指方向一次性计算
+            # 无论是什么手势，都计算食指方向，这样即使手势不是"指向"，也能获取食指方向
+            result.directions, result.direction_names = hand_frame.finger_directions()
+            
+            # 与逐手处理时一致，方向取最后一只手
+            result.finger_direction = (float(result.directions[-1, 0]), float(result.directions[-1, 1]))
+            result.direction_name = result.direction_names[-1]
+            logger.debug(f"食指方向: dx={result.finger_direction[0]:.2f}, dy={result.finger_direction[1]:.2f}, 方向={result.direction_name}")
+            
+            return result
             
         except Exception as e:
             logger.error(f"处理视频帧时出错: {str(e)}")
@@ -333,120 +250,317 @@ class GestureRecognizer:
             try:
                 if hasattr(self, 'hands') and self.hands is not None:
                     self.hands.close()
-                self.hands = self.mp_hands.Hands(
-                    static_image_mode=False,
-                    max_num_hands=2,
-                    min_detection_confidence=0.5,
-                    min_tracking_confidence=0.5
-                )
+                self.hands = self._create_hands()
+                self.last_hand_frame = None
+                self.last_result = None
+                self.motion_gate.reset()
+                self.landmark_tracker.reset()
+                self.hand_roi.reset()
+                self.motion_gestures.reset()
+                self.hand_identity.reset()
+                self.pair_distances = {}
+                self.pair_cooldowns = {}
                 logger.info("手势识别器已重新初始化")
             except Exception as reinit_error:
                 logger.error(f"重新初始化手势识别器失败: {str(reinit_error)}")
             
-            # 返回原始帧和空手势列表
-            return frame, [], None, None
+            return GestureResult()
     
-    def _recognize_gesture(self, landmarks):
-        """
-        识别手势
-        
-        @param {list} landmarks - 手部关键点
-        @returns {str} 识别到的手势名称
-        """
-        if not landmarks:
-            return None
-        
-        # 获取特定关键点
-        thumb_tip = landmarks[self.mp_hands.HandLandmark.THUMB_TIP.value]
-        thumb_ip = landmarks[self.mp_hands.HandLandmark.THUMB_IP.value]
-        index_tip = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_TIP.value]
-        index_pip = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_PIP.value]
-        middle_tip = landmarks[self.mp_hands.HandLandmark.MIDDLE_FINGER_TIP.value]
-        middle_pip = landmarks[self.mp_hands.HandLandmark.MIDDLE_FINGER_PIP.value]
-        ring_tip = landmarks[self.mp_hands.HandLandmark.RING_FINGER_TIP.value]
-        ring_pip = landmarks[self.mp_hands.HandLandmark.RING_FINGER_PIP.value]
-        pinky_tip = landmarks[self.mp_hands.HandLandmark.PINKY_TIP.value]
-        pinky_pip = landmarks[self.mp_hands.HandLandmark.PINKY_PIP.value]
-        
-        # 计算手指是否伸展
-        thumb_extended = thumb_tip.y < thumb_ip.y  # Y坐标比较
-        index_extended = index_tip.y < index_pip.y
-        middle_extended = middle_tip.y < middle_pip.y
-        ring_extended = ring_tip.y < ring_pip.y
-        pinky_extended = pinky_tip.y < pinky_pip.y
-        
-        # 识别手势
-        # 握拳：所有手指都弯曲
-        if not any([thumb_extended, index_extended, middle_extended, ring_extended, pinky_extended]):
-            return "fist"
-        
-        # 手掌：所有手指都伸展
-        if all([thumb_extended, index_extended, middle_extended, ring_extended, pinky_extended]):
-            return "palm"
-        
-        # 点赞：只有拇指伸展
-        if thumb_extended and not any([index_extended, middle_extended, ring_extended, pinky_extended]):
-            return "thumb_up"
-        
-        # 剪刀手：食指和中指伸展，其他弯曲
-        if index_extended and middle_extended and not any([thumb_extended, ring_extended, pinky_extended]):
-            return "peace"
-        
-        # 指向：只有食指伸展
-        if index_extended and not any([thumb_extended, middle_extended, ring_extended, pinky_extended]):
-            return "pointing"
-        
-        # 无法识别的手势
-        return None
+    def _detect_zoom(self, hand_frame, hand_ids):
+        """
+        双手缩放手势：按手部ID对比较相邻两帧的两手中心距离，每对手有各自的冷却时间
+        
+        @param {HandFrame} hand_frame - 手部关键点
+        @param {numpy.ndarray} hand_ids - 各手的稳定ID
+        @returns {list} 本帧识别到的缩放手势
+        """
+        gestures = []
+        centers = hand_frame.centers()
+        distances = {}
+        cooldowns = {}
+        for a in range(len(centers)):
+            for b in range(a + 1, len(centers)):
+                pair = (min(hand_ids[a], hand_ids[b]), max(hand_ids[a], hand_ids[b]))
+                current_distance = float(np.linalg.norm(centers[a] - centers[b]))
+                cooldown = max(0, self.pair_cooldowns.get(pair, 0) - 1)
+                
+                # 如果有同一对手前一帧的距离记录，比较距离变化
+                previous = self.pair_distances.get(pair)
+                if previous is not None and cooldown == 0:
+                    distance_change = current_distance - previous
+                    
+                    # 如果距离变化超过阈值，识别为缩放手势
+                    if abs(distance_change) > self.distance_threshold:
+                        # 两手分开放大，靠近缩小
+                        gesture = "zoom_in" if distance_change > 0 else "zoom_out"
+                        if gesture not in gestures:
+                            gestures.append(gesture)
+                        logger.info(f"检测到{'放大' if distance_change > 0 else '缩小'}手势，手 {pair[0]} 和 {pair[1]}，距离变化: {distance_change:.2f}")
+                        cooldown = self.zoom_cooldown_frames
+                
+                distances[pair] = current_distance
+                cooldowns[pair] = cooldown
+        
+        # 只保留本帧仍同时出现的手对
+        self.pair_distances = distances
+        self.pair_cooldowns = cooldowns
+        return gestures
     
-    def _get_finger_direction(self, landmarks):
+    def _match_templates(self, frame, hand_frame, result):
         """
-        计算食指的指向方向
+        用自定义手势模板分类各手，并为正在录制的模板采集样本
         
-        @param {list} landmarks - 手部关键点
-        @returns {tuple} 食指方向向量 (x, y) 和方向名称
+        @param {numpy.ndarray} frame - 输入的视频帧，用于取宽高比
+        @param {HandFrame} hand_frame - 手部关键点
+        @param {GestureResult} result - 识别结果，匹配成功的手覆盖内置规则的原始手势
+        """
+        recorder = self.template_recorder
+        if not len(self.gesture_templates) and recorder is None:
+            return
+        
+        height, width = frame.shape[:2]
+        features = hand_features(hand_frame.landmarks, hand_frame.handedness, width / height)
+        
+        if recorder is not None and not recorder.done and recorder.feed(features):
+            self.gesture_templates.add(recorder.name, np.array(recorder.collected))
+            self.gesture_templates.save()
+            logger.info(f"手势模板 {recorder.name} 录制完成，共 {len(recorder.collected)} 个样本")
+        
+        for i, name in enumerate(self.gesture_templates.classify(features)):
+            if name is not None:
+                result.raw_hand_gestures[i] = name
+    
+    def start_template_recording(self, name, samples=30):
+        """
+        开始从实时画面录制手势模板，画面中需要恰好一只手
+        
+        @param {str} name - 手势名称，已有同名模板时追加样本
+        @param {int} samples - 需要采集的样本数
+        @returns {dict} 录制进度
+        """
+        self.template_recorder = TemplateRecorder(name, samples)
+        logger.info(f"开始录制手势模板 {name}，需要 {samples} 个样本")
+        return self.template_recorder.get_status()
+    
+    def get_template_recording_status(self):
+        """
+        @returns {dict|None} 当前（或最近一次）录制的进度，没有录制时返回None
+        """
+        recorder = self.template_recorder
+        return recorder.get_status() if recorder is not None else None
+    
+    def delete_gesture_template(self, name):
+        """
+        删除一个自定义手势的所有模板
+        
+        @param {str} name - 手势名称
+        @returns {bool} 是否存在该手势
+        """
+        if not self.gesture_templates.remove(name):
+            return False
+        self.gesture_templates.save()
+        logger.info(f"已删除手势模板 {name}")
+        return True
+    
+    def render(self, image, result):
+        """
+        将识别结果绘制到图像上，关键点为归一化坐标，因此可以直接画在任意分辨率的图像上
+        
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {GestureResult} result - recognize 返回的识别结果
+        @returns {numpy.ndarray} 同一个图像
+        """
+        hand_frame = result.hands
+        if not len(hand_frame):
+            return image
+        
+        h, w = image.shape[:2]
+        pixel_centers = (hand_frame.centers() * np.array([w, h], dtype=np.float32)).astype(np.int32)
+        pixels = hand_frame.pixel_coords(w, h)
+        
+        # 两只手时绘制两手之间的连线，并在连线中间显示距离
+        current_distance = hand_frame.two_hand_distance()
+        if current_distance is not None:
+            hand1_center = tuple(int(v) for v in pixel_centers[0])
+            hand2_center = tuple(int(v) for v in pixel_centers[1])
+            cv2.line(image, hand1_center, hand2_center, (255, 0, 255), 2)
+            
+            mid_point = ((hand1_center[0] + hand2_center[0]) // 2, (hand1_center[1] + hand2_center[1]) // 2)
+            cv2.putText(
+                image,
+                f"距离: {current_distance:.2f}",
+                mid_point,
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (255, 0, 255),
+                2
+            )
+        
+        # 所有手的关键点和连接线批量绘制
+        self.hand_renderer.draw(image, pixels)
+        
+        for i in range(len(hand_frame)):
+            # 在图像上绘制方向箭头（食指指根到指尖）
+            start_point = tuple(int(v) for v in pixels[i, INDEX_FINGER_MCP])
+            end_point = tuple(int(v) for v in pixels[i, INDEX_FINGER_TIP])
+            cv2.arrowedLine(
+                image, 
+                start_point, 
+                end_point, 
+                (0, 255, 255), 
+                2, 
+                tipLength=0.3
+            )
+            
+            # 在箭头附近显示方向名称
+            cv2.putText(
+                image,
+                f"方向: {result.direction_names[i]}",
+                (end_point[0] + 10, end_point[1]),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.7,
+                (0, 255, 255),
+                2
+            )
+            
+            # 在手的中心附近显示手势名称
+            gesture = result.hand_gestures[i]
+            if gesture:
+                cx, cy = pixel_centers[i]
+                cv2.putText(
+                    image, 
+                    self.gestures.get(gesture, gesture), 
+                    (int(cx) - 50, int(cy) - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 
+                    1, 
+                    (0, 255, 0), 
+                    2
+                )
+        
+        return image
+    
+    def process_frame(self, frame, trace=None, prepared=None, context=None, annotate=True, hand_frame=None):
+        """
+        处理视频帧，检测手部并识别手势
+        
+        @param {numpy.ndarray} frame - 输入的视频帧
+        @param {FrameTrace|None} trace - 延迟追踪记录，记录 hands/annotate 阶段
+        @param {PreparedFrame|None} prepared - 共享的预处理结果，提供时不再单独做颜色转换
+        @param {FrameContext|None} context - 帧上下文，提供时直接在其标注缓冲区上绘制，不再复制帧
+        @param {bool} annotate - 是否绘制标注，为False时直接返回未标注的帧
+        @param {HandFrame|None} hand_frame - 已检测好的手部关键点，提供时不再运行检测
+        @returns {tuple} (处理后的帧, 当前生效的手势, 食指方向, 方向名称)
+        """
+        if frame is None:
+            return None, [], None, None
+        
+        if context is not None and prepared is None:
+            prepared = context.prepared
+        
+        result = self.recognize(frame, trace=trace, prepared=prepared, hand_frame=hand_frame)
+        output_frame = self.annotate_frame(frame, result, trace=trace, context=context, annotate=annotate)
+        return output_frame, result.gestures, result.finger_direction, result.direction_name
+    
+    def annotate_frame(self, frame, result, trace=None, context=None, annotate=True):
+        """
+        绘制识别结果（背景特效在绘制之前、其余特效在绘制之后由 EffectChain 单独应用）
+        
+        @param {numpy.ndarray} frame - 输入的视频帧
+        @param {GestureResult} result - recognize 返回的识别结果
+        @param {FrameTrace|None} trace - 延迟追踪记录，记录 annotate 阶段
+        @param {FrameContext|None} context - 帧上下文，提供时直接在其标注缓冲区上绘制，不再复制帧
+        @param {bool} annotate - 是否绘制标注，为False时直接返回未标注的帧
+        @returns {numpy.ndarray} 处理后的帧
+        """
+        if not annotate:
+            return context.annotated if context is not None else frame
+        
+        try:
+            # 在帧上下文的标注缓冲区上绘制，没有上下文时复制原始帧
+            annotated_frame = context.annotated if context is not None else frame.copy()
+            self.render(annotated_frame, result)
+            if trace is not None:
+                trace.mark('annotate')
+            
+            return annotated_frame
+            
+        except Exception as e:
+            logger.error(f"绘制手势标注时出错: {str(e)}")
+            return frame
+    
+    def detect_hands(self, frame, prepared=None):
+        """
+        只运行手部检测（含运动门控、光流跟踪和裁剪），不识别手势也不绘制
+        
+        供推理调度器在独立线程中调用，结果再通过 recognize(hand_frame=...) 交给识别流程
+        
+        @param {numpy.ndarray} frame - BGR视频帧
+        @param {PreparedFrame|None} prepared - 共享的预处理结果
+        @returns {HandFrame} 手部关键点，出错时为空
         """
         try:
-            # 获取食指关键点
-            wrist = landmarks[self.mp_hands.HandLandmark.WRIST.value]
-            index_mcp = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_MCP.value]
-            index_pip = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_PIP.value]
-            index_tip = landmarks[self.mp_hands.HandLandmark.INDEX_FINGER_TIP.value]
-            
-            # 使用整个食指的方向，而不仅仅是指尖和指根
-            # 这样可以获得更稳定的方向
-            dx = index_tip.x - index_mcp.x
-            dy = index_tip.y - index_mcp.y
-            
-            # 归一化向量
-            length = np.sqrt(dx**2 + dy**2)
-            if length > 0:
-                dx /= length
-                dy /= length
-            
-            # 确定方向名称
-            direction_name = "未知"
-            
-            # 使用更宽松的阈值，更容易识别主要方向
-            if abs(dx) > abs(dy) * 1.2:  # 水平方向为主
-                direction_name = "右" if dx > 0 else "左"
-            elif abs(dy) > abs(dx) * 1.2:  # 垂直方向为主
-                direction_name = "下" if dy > 0 else "上"
-            else:  # 对角线方向
-                if dx > 0 and dy < 0:
-                    direction_name = "右上"
-                elif dx > 0 and dy > 0:
-                    direction_name = "右下"
-                elif dx < 0 and dy < 0:
-                    direction_name = "左上"
-                elif dx < 0 and dy > 0:
-                    direction_name = "左下"
-            
-            logger.debug(f"食指方向: dx={dx:.2f}, dy={dy:.2f}, 方向={direction_name}")
-            return (dx, dy), direction_name
+            return self._detect_hands(frame, prepared)
         except Exception as e:
-            logger.error(f"计算食指方向时出错: {str(e)}")
-            return None, "错误"
+            logger.error(f"手部检测时出错: {str(e)}")
+            return HandFrame.empty()
+    
+    def _detect_hands(self, frame, prepared=None):
+        """
+        运行手部检测，画面静止时复用上一次的检测结果；启用光流跟踪时，
+        推理之间的帧用光流传播关键点，跟踪失败时立即重新推理
+        
+        关键点在每次检测后只转换一次为 HandFrame 数组，复用结果时一并复用
+        
+        @param {numpy.ndarray} frame - BGR视频帧
+        @param {PreparedFrame|None} prepared - 共享的预处理结果
+        @returns {HandFrame} 手部关键点
+        """
+        if self.last_hand_frame is not None and not self.motion_gate.should_process(frame):
+            return self.last_hand_frame
+        
+        tracker = self.landmark_tracker
+        if tracker.enabled:
+            tracker.update_gray(frame)
+            if not tracker.should_detect():
+                tracked = tracker.track()
+                if tracked is not None:
+                    self.last_hand_frame = tracked
+                    return tracked
+        
+        # 转换为RGB格式，MediaPipe需要RGB输入
+        if prepared is not None:
+            rgb_frame = prepared.inference_rgb
+        else:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        
+        # 处理图像，启用裁剪时只在上一次手部附近的区域推理
+        self.last_hand_frame = self._process_hands(rgb_frame)
+        if tracker.enabled:
+            tracker.set_detection(self.last_hand_frame)
+        return self.last_hand_frame
+    
+    def _process_hands(self, rgb_frame):
+        """
+        在整帧或感兴趣区域裁剪图上运行手部推理，关键点统一为整帧坐标
+        
+        裁剪图上没有找到手时，同一帧立即回到整帧搜索
+        
+        @param {numpy.ndarray} rgb_frame - 推理用的RGB整帧
+        @returns {HandFrame} 手部关键点
+        """
+        roi = self.hand_roi
+        image, rect = roi.begin(rgb_frame)
+        hand_frame = HandFrame.from_results(self.hands.process(image))
+        
+        if rect is not None:
+            if len(hand_frame):
+                hand_frame = HandFrame(roi.map_landmarks(hand_frame.landmarks, rect), hand_frame.handedness, hand_frame.scores)
+            else:
+                logger.debug("裁剪区域内未找到手，回到整帧搜索")
+                hand_frame = HandFrame.from_results(self.hands.process(roi.full(rgb_frame)))
+        
+        roi.update(hand_frame.landmarks)
+        return hand_frame
     
     def release(self):
         """
@@ -459,45 +573,54 @@ class GestureRecognizer:
             logger.error(f"释放手势识别资源时出错: {str(e)}")
         logger.info("手势识别资源已释放")
     
-    def process_frame_for_drawing(self, frame):
+    def process_frame_for_drawing(self, frame, trace=None, prepared=None, context=None, annotate=True):
         """
         处理视频帧，用于绘画功能
         
         @param {numpy.ndarray} frame - 输入视频帧
-        @returns {tuple} 处理后的视频帧和手部关键点
+        @param {FrameTrace|None} trace - 延迟追踪记录，记录 hands/annotate 阶段
+        @param {PreparedFrame|None} prepared - 共享的预处理结果
+        @param {FrameContext|None} context - 帧上下文，提供时直接在其标注缓冲区上绘制
+        @param {bool} annotate - 是否绘制手部关键点，为False时只返回关键点
+        @returns {tuple} 处理后的视频帧和 HandFrame（只包含第一只手，未检测到手时为None）
         """
         if frame is None:
             logger.warning("输入帧为空")
             return None, None
         
         try:
-            # 复制输入帧
-            output_frame = frame.copy()
-            
-            # 转换为RGB（MediaPipe需要RGB输入）
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if context is not None:
+                output_frame = context.annotated
+                if prepared is None:
+                    prepared = context.prepared
+            elif annotate:
+                # 复制输入帧
+                output_frame = frame.copy()
+            else:
+                output_frame = frame
             
             # 处理图像
-            results = self.hands.process(rgb_frame)
+            hand_frame = self._detect_hands(frame, prepared)
+            if trace is not None:
+                trace.mark('hands')
             
             # 初始化手部关键点
-            hand_landmarks = None
+            first_hand = None
             
             # 如果检测到手
-            if results.multi_hand_landmarks:
+            if len(hand_frame):
                 # 只处理第一只手
-                hand_landmarks = results.multi_hand_landmarks[0].landmark
+                first_hand = HandFrame(hand_frame.landmarks[:1], hand_frame.handedness[:1], hand_frame.scores[:1])
                 
                 # 绘制手部关键点和连接线
-                self.mp_drawing.draw_landmarks(
-                    output_frame,
-                    results.multi_hand_landmarks[0],
-                    self.mp_hands.HAND_CONNECTIONS,
-                    self.mp_drawing_styles.get_default_hand_landmarks_style(),
-                    self.mp_drawing_styles.get_default_hand_connections_style()
-                )
+                if annotate:
+                    h, w = output_frame.shape[:2]
+                    self.hand_renderer.draw(output_frame, first_hand.pixel_coords(w, h))
+            
+            if trace is not None and annotate:
+                trace.mark('annotate')
             
-            return output_frame, hand_landmarks
+            return output_frame, first_hand
         
         except Exception as e:
             logger.error(f"处理视频帧时出错: {str(e)}")
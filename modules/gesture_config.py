@@ -1,5 +1,6 @@
 import json
 import os
+import re
 import logging
 from datetime import datetime
 from rich.logging import RichHandler
@@ -74,6 +75,14 @@ class GestureConfig:
             }
         }
         
+        # 动态手势（挥动、画圈），默认无动作
+        for gesture in ("swipe_left", "swipe_right", "swipe_up", "swipe_down", "circle_cw", "circle_ccw"):
+            self.default_config[gesture] = {
+                "action": "none",
+                "params": {},
+                "description": "无动作"
+            }
+        
         # 可用的动作类型
         self.available_actions = {
             "none": "无动作",
@@ -163,7 +172,7 @@ class GestureConfig:
         @param {str} description - 动作描述
         @returns {bool} 是否成功设置
         """
-        if gesture not in self.default_config:
+        if not self.is_known_gesture(gesture):
             logger.warning(f"未知的手势: {gesture}")
             return False
         
@@ -189,6 +198,8 @@ class GestureConfig:
             "params": params,
             "description": description
         }
+        if gesture not in self.default_config:
+            self.config[gesture]["custom"] = True
         
         # 保存配置
         self.save_config()
@@ -196,6 +207,62 @@ class GestureConfig:
         logger.info(f"已设置手势 {gesture} 的配置: {action}, {params}, {description}")
         return True
     
+    def is_known_gesture(self, gesture):
+        """
+        判断是否为内置手势或已注册的自定义手势
+        
+        @param {str} gesture - 手势名称
+        @returns {bool} 是否已知
+        """
+        return gesture in self.default_config or self.config.get(gesture, {}).get("custom", False)
+    
+    def add_custom_gesture(self, gesture):
+        """
+        注册自定义手势（由手势模板识别），默认无动作
+        
+        @param {str} gesture - 手势名称，只能包含文字、数字、下划线和连字符
+        @returns {bool} 是否成功注册（已注册时也返回True）
+        """
+        if not gesture or not re.fullmatch(r'[\w\-]{1,32}', gesture):
+            logger.warning(f"无效的手势名称: {gesture}")
+            return False
+        if self.is_known_gesture(gesture):
+            return True
+        
+        self.config[gesture] = {
+            "action": "none",
+            "params": {},
+            "description": "无动作",
+            "custom": True
+        }
+        self.save_config()
+        logger.info(f"已注册自定义手势 {gesture}")
+        return True
+    
+    def remove_custom_gesture(self, gesture):
+        """
+        删除自定义手势的配置，内置手势不能删除
+        
+        @param {str} gesture - 手势名称
+        @returns {bool} 是否成功删除
+        """
+        if gesture in self.default_config or not self.is_known_gesture(gesture):
+            logger.warning(f"不是自定义手势: {gesture}")
+            return False
+        
+        del self.config[gesture]
+        self.save_config()
+        logger.info(f"已删除自定义手势 {gesture}")
+        return True
+    
+    def get_custom_gestures(self):
+        """
+        获取所有自定义手势名称
+        
+        @returns {list} 自定义手势名称
+        """
+        return [gesture for gesture in self.config if gesture not in self.default_config and self.is_known_gesture(gesture)]
+    
     def get_all_configs(self):
         """
         获取所有手势配置
@@ -226,5 +293,14 @@ class GestureConfig:
         
         @returns {bool} 是否成功重置
         """
+        # 自定义手势保留注册，只把动作重置为无动作
+        custom_gestures = self.get_custom_gestures()
         self.config = self.default_config.copy()
+        for gesture in custom_gestures:
+            self.config[gesture] = {
+                "action": "none",
+                "params": {},
+                "description": "无动作",
+                "custom": True
+            }
         return self.save_config() 
\ No newline at end of file
@@ -0,0 +1,297 @@
+import numpy as np
+import logging
+import os
+import threading
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.hand_frame import WRIST, MIDDLE_FINGER_MCP, NUM_LANDMARKS, HANDEDNESS_LEFT
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/gesture_templates_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("gesture_templates")
+
+# 特征维度：除手腕外20个关键点的 (x, y, z)
+FEATURE_DIM = (NUM_LANDMARKS - 1) * 3
+
+def hand_features(landmarks, handedness=None, aspect=1.0):
+    """
+    将手部关键点批量转换为与平移、缩放、旋转无关的特征向量
+
+    以手腕为原点，旋转使手腕到中指指根的方向朝上，再除以这段距离（掌长）；
+    左手沿X轴镜像，左右手共用同一组模板
+
+    @param {numpy.ndarray} landmarks - (手数, 21, 3) 归一化坐标
+    @param {numpy.ndarray|None} handedness - (手数,) 左右手编码
+    @param {float} aspect - 图像宽高比，用于把归一化坐标还原为等比例坐标
+    @returns {numpy.ndarray} (手数, 60) float32 特征向量
+    """
+    points = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3).copy()
+    if not len(points):
+        return np.empty((0, FEATURE_DIM), dtype=np.float32)
+
+    # x 和 z 都以图像宽度归一化，乘以宽高比后与 y 同一单位
+    points[:, :, 0] *= aspect
+    points[:, :, 2] *= aspect
+    points -= points[:, WRIST:WRIST + 1]
+
+    axis = points[:, MIDDLE_FINGER_MCP, :2]
+    palm = np.linalg.norm(axis, axis=1)
+    palm = np.where(palm > 1e-6, palm, 1.0)
+    ux = axis[:, 0] / palm
+    uy = axis[:, 1] / palm
+
+    # 旋转矩阵 [[-uy, ux], [-ux, -uy]] 把掌轴方向映射到 (0, -1)
+    x = points[:, 1:, 0]
+    y = points[:, 1:, 1]
+    features = np.empty((len(points), NUM_LANDMARKS - 1, 3), dtype=np.float32)
+    features[:, :, 0] = -uy[:, None] * x + ux[:, None] * y
+    features[:, :, 1] = -ux[:, None] * x - uy[:, None] * y
+    features[:, :, 2] = points[:, 1:, 2]
+    features /= palm[:, None, None]
+
+    if handedness is not None:
+        features[np.asarray(handedness) == HANDEDNESS_LEFT, :, 0] *= -1
+    return features.reshape(len(points), FEATURE_DIM)
+
+class GestureTemplateIndex:
+    """
+    手势模板索引
+
+    所有模板的特征向量保存在一个连续的 (模板数, 60) 数组中，并缓存各行的平方范数，
+    分类时一次矩阵乘法算出所有手到所有模板的距离，再做k近邻投票；
+    模板持久化到 config/gesture_templates.npz
+    """
+    def __init__(self, path=None, k=None, max_distance=None):
+        """
+        @param {str|None} path - 模板文件路径，默认 config/gesture_templates.npz
+        @param {int|None} k - 近邻数，默认读取 GESTURE_TEMPLATE_K
+        @param {float|None} max_distance - 最近模板的最大特征距离，超过时不识别，默认读取 GESTURE_TEMPLATE_MAX_DISTANCE
+        """
+        if k is None:
+            k = int(os.environ.get('GESTURE_TEMPLATE_K', 3))
+        if max_distance is None:
+            max_distance = float(os.environ.get('GESTURE_TEMPLATE_MAX_DISTANCE', 1.0))
+
+        self.path = path or os.path.join('config', 'gesture_templates.npz')
+        self.k = max(1, k)
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+
+        self.names = []  # 标签编号到手势名称
+        self.count = 0
+        self.features = np.empty((64, FEATURE_DIM), dtype=np.float32)
+        self.sq_norms = np.empty(64, dtype=np.float32)
+        self.labels = np.empty(64, dtype=np.int32)
+
+        self.load()
+
+    def __len__(self):
+        return self.count
+
+    def add(self, name, features):
+        """
+        添加一个手势的模板
+
+        @param {str} name - 手势名称
+        @param {numpy.ndarray} features - (样本数, 60) 特征向量
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(-1, FEATURE_DIM)
+        with self.lock:
+            if name not in self.names:
+                self.names.append(name)
+            label = self.names.index(name)
+
+            needed = self.count + len(features)
+            if needed > len(self.features):
+                capacity = max(needed, len(self.features) * 2)
+                self.features = self._grow(self.features, capacity)
+                self.sq_norms = self._grow(self.sq_norms, capacity)
+                self.labels = self._grow(self.labels, capacity)
+
+            self.features[self.count:needed] = features
+            self.sq_norms[self.count:needed] = np.einsum('ij,ij->i', features, features)
+            self.labels[self.count:needed] = label
+            self.count = needed
+
+    def remove(self, name):
+        """
+        删除一个手势的所有模板
+
+        @param {str} name - 手势名称
+        @returns {bool} 是否存在该手势
+        """
+        with self.lock:
+            if name not in self.names:
+                return False
+            label = self.names.index(name)
+            keep = self.labels[:self.count] != label
+            kept = int(keep.sum())
+            self.features[:kept] = self.features[:self.count][keep]
+            self.sq_norms[:kept] = self.sq_norms[:self.count][keep]
+            labels = self.labels[:self.count][keep]
+            # 后面的标签编号前移一位
+            labels[labels > label] -= 1
+            self.labels[:kept] = labels
+            self.count = kept
+            del self.names[label]
+            return True
+
+    def classify(self, features):
+        """
+        对一组手的特征向量做k近邻分类
+
+        @param {numpy.ndarray} features - (手数, 60) 特征向量
+        @returns {list} 各手匹配到的手势名称，没有足够接近的模板时为None
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(-1, FEATURE_DIM)
+        with self.lock:
+            if not self.count or not len(features):
+                return [None] * len(features)
+
+            templates = self.features[:self.count]
+            # |a-b|^2 = |a|^2 + |b|^2 - 2ab，所有手到所有模板一次算完
+            distances = (
+                np.einsum('ij,ij->i', features, features)[:, None]
+                + self.sq_norms[:self.count][None, :]
+                - 2.0 * features @ templates.T
+            )
+            np.maximum(distances, 0.0, out=distances)
+            np.sqrt(distances, out=distances)
+
+            k = min(self.k, self.count)
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+            nearest_labels = self.labels[:self.count][nearest]
+
+            names = []
+            for i in range(len(features)):
+                within = nearest_distances[i] <= self.max_distance
+                if not within.any():
+                    names.append(None)
+                    continue
+                # 距离越近权重越大
+                votes = np.bincount(
+                    nearest_labels[i][within],
+                    weights=1.0 / (nearest_distances[i][within] + 1e-3),
+                    minlength=len(self.names)
+                )
+                names.append(self.names[int(votes.argmax())])
+            return names
+
+    def get_templates(self):
+        """
+        获取各手势的模板数量
+
+        @returns {dict} 手势名称到模板数量
+        """
+        with self.lock:
+            counts = np.bincount(self.labels[:self.count], minlength=len(self.names))
+            return {name: int(counts[i]) for i, name in enumerate(self.names)}
+
+    def load(self):
+        """
+        从模板文件加载
+
+        @returns {bool} 是否加载成功
+        """
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                features = data['features'].astype(np.float32).reshape(-1, FEATURE_DIM)
+                labels = data['labels'].astype(np.int32)
+                names = [str(name) for name in data['names']]
+            with self.lock:
+                self.names = []
+                self.count = 0
+            for label, name in enumerate(names):
+                self.add(name, features[labels == label])
+            logger.info(f"从 {self.path} 加载 {self.count} 个手势模板（{len(self.names)} 种手势）")
+            return True
+        except Exception as e:
+            logger.error(f"加载手势模板时出错: {str(e)}")
+            return False
+
+    def save(self):
+        """
+        保存到模板文件
+
+        @returns {bool} 是否保存成功
+        """
+        try:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with self.lock:
+                features = self.features[:self.count].copy()
+                labels = self.labels[:self.count].copy()
+                names = np.array(self.names, dtype=str)
+            with open(self.path, 'wb') as f:
+                np.savez(f, features=features, labels=labels, names=names)
+            logger.info(f"手势模板已保存到 {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"保存手势模板时出错: {str(e)}")
+            return False
+
+    @staticmethod
+    def _grow(array, capacity):
+        grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+class TemplateRecorder:
+    """
+    从实时画面录制一个手势的模板：画面中恰好一只手时，每隔几帧采集一个样本
+    """
+    def __init__(self, name, samples=30, stride=2):
+        """
+        @param {str} name - 手势名称
+        @param {int} samples - 需要采集的样本数
+        @param {int} stride - 每隔多少帧采集一次，避免样本过于相似
+        """
+        self.name = name
+        self.samples = max(1, samples)
+        self.stride = max(1, stride)
+        self.collected = []
+        self.frames = 0
+
+    @property
+    def done(self):
+        return len(self.collected) >= self.samples
+
+    def feed(self, features):
+        """
+        送入一帧的手部特征
+
+        @param {numpy.ndarray} features - (手数, 60) 特征向量
+        @returns {bool} 是否已采集完成
+        """
+        if len(features) != 1 or self.done:
+            return self.done
+        self.frames += 1
+        if self.frames % self.stride == 0:
+            self.collected.append(features[0].copy())
+        return self.done
+
+    def get_status(self):
+        """
+        @returns {dict} 录制进度
+        """
+        return {
+            'name': self.name,
+            'collected': len(self.collected),
+            'samples': self.samples,
+            'done': self.done
+        }
@@ -0,0 +1,192 @@
+import numpy as np
+
+# MediaPipe 手部关键点索引
+WRIST = 0
+THUMB_IP = 3
+THUMB_TIP = 4
+INDEX_FINGER_MCP = 5
+INDEX_FINGER_PIP = 6
+INDEX_FINGER_TIP = 8
+MIDDLE_FINGER_MCP = 9
+MIDDLE_FINGER_PIP = 10
+MIDDLE_FINGER_TIP = 12
+RING_FINGER_PIP = 14
+RING_FINGER_TIP = 16
+PINKY_PIP = 18
+PINKY_TIP = 20
+NUM_LANDMARKS = 21
+
+# 五根手指（拇指、食指、中指、无名指、小指）的指尖和用于判断伸展的关节
+FINGER_TIPS = np.array([THUMB_TIP, INDEX_FINGER_TIP, MIDDLE_FINGER_TIP, RING_FINGER_TIP, PINKY_TIP])
+FINGER_JOINTS = np.array([THUMB_IP, INDEX_FINGER_PIP, MIDDLE_FINGER_PIP, RING_FINGER_PIP, PINKY_PIP])
+FINGER_BITS = np.array([1, 2, 4, 8, 16])
+
+# 左右手编码
+HANDEDNESS_UNKNOWN = -1
+HANDEDNESS_LEFT = 0
+HANDEDNESS_RIGHT = 1
+
+def _build_gesture_table():
+    """
+    构建手指伸展状态到手势的查找表
+
+    每个规则都完整指定了五根手指的状态，因此可以用5位掩码（拇指为最低位）直接查表
+
+    @returns {numpy.ndarray} 长度32的手势名称表，无法识别的组合为None
+    """
+    table = np.full(32, None, dtype=object)
+    patterns = {
+        "fist": (0, 0, 0, 0, 0),  # 握拳：所有手指都弯曲
+        "palm": (1, 1, 1, 1, 1),  # 手掌：所有手指都伸展
+        "thumb_up": (1, 0, 0, 0, 0),  # 点赞：只有拇指伸展
+        "peace": (0, 1, 1, 0, 0),  # 剪刀手：食指和中指伸展，其他弯曲
+        "pointing": (0, 1, 0, 0, 0)  # 指向：只有食指伸展
+    }
+    for gesture, pattern in patterns.items():
+        table[int(np.dot(pattern, FINGER_BITS))] = gesture
+    return table
+
+GESTURE_TABLE = _build_gesture_table()
+
+class HandFrame:
+    """
+    一帧中所有手的关键点，以NumPy数组表示
+
+    landmarks 为 (手数, 21, 3) 的归一化坐标，handedness 为左右手编码，scores 为左右手置信度；
+    手势、食指方向、双手距离等计算都对整组数组向量化进行
+    """
+    def __init__(self, landmarks, handedness=None, scores=None):
+        """
+        @param {numpy.ndarray} landmarks - (手数, 21, 3) float32 归一化坐标
+        @param {numpy.ndarray|None} handedness - (手数,) int8 左右手编码
+        @param {numpy.ndarray|None} scores - (手数,) float32 左右手置信度
+        """
+        self.landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        count = len(self.landmarks)
+        self.handedness = (
+            np.asarray(handedness, dtype=np.int8) if handedness is not None
+            else np.full(count, HANDEDNESS_UNKNOWN, dtype=np.int8)
+        )
+        self.scores = (
+            np.asarray(scores, dtype=np.float32) if scores is not None
+            else np.zeros(count, dtype=np.float32)
+        )
+
+    @classmethod
+    def empty(cls):
+        """
+        @returns {HandFrame} 没有手的结果
+        """
+        return cls(np.empty((0, NUM_LANDMARKS, 3), dtype=np.float32))
+
+    @classmethod
+    def from_results(cls, results):
+        """
+        从MediaPipe Hands结果转换，每帧只遍历一次protobuf对象
+
+        @param {object} results - hands.process 的返回值
+        @returns {HandFrame} 手部关键点数组
+        """
+        if results is None or not results.multi_hand_landmarks:
+            return cls.empty()
+
+        landmarks = np.array(
+            [[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in results.multi_hand_landmarks],
+            dtype=np.float32
+        )
+        count = len(landmarks)
+        handedness = np.full(count, HANDEDNESS_UNKNOWN, dtype=np.int8)
+        scores = np.zeros(count, dtype=np.float32)
+        if results.multi_handedness:
+            for i, item in enumerate(results.multi_handedness[:count]):
+                classification = item.classification[0]
+                handedness[i] = HANDEDNESS_LEFT if classification.label == 'Left' else HANDEDNESS_RIGHT
+                scores[i] = classification.score
+        return cls(landmarks, handedness, scores)
+
+    def __len__(self):
+        return len(self.landmarks)
+
+    @property
+    def count(self):
+        return len(self.landmarks)
+
+    def centers(self):
+        """
+        @returns {numpy.ndarray} (手数, 2) 各手所有关键点的平均位置
+        """
+        return self.landmarks[:, :, :2].mean(axis=1)
+
+    def pixel_coords(self, width, height):
+        """
+        @param {int} width - 图像宽度
+        @param {int} height - 图像高度
+        @returns {numpy.ndarray} (手数, 21, 2) int32 像素坐标
+        """
+        return (self.landmarks[:, :, :2] * np.array([width, height], dtype=np.float32)).astype(np.int32)
+
+    def finger_extended(self):
+        """
+        判断各手各手指是否伸展（指尖的Y坐标高于对应关节）
+
+        @returns {numpy.ndarray} (手数, 5) bool
+        """
+        return self.landmarks[:, FINGER_TIPS, 1] < self.landmarks[:, FINGER_JOINTS, 1]
+
+    def gestures(self):
+        """
+        识别各手的单手手势
+
+        @returns {list} 各手的手势名称，无法识别为None
+        """
+        if not len(self):
+            return []
+        codes = self.finger_extended().astype(np.int64) @ FINGER_BITS
+        return list(GESTURE_TABLE[codes])
+
+    def finger_directions(self):
+        """
+        计算各手食指的指向（指根到指尖的单位向量）和方向名称
+
+        @returns {tuple} ((手数, 2) 单位向量, 方向名称列表)
+        """
+        if not len(self):
+            return np.empty((0, 2), dtype=np.float32), []
+
+        vectors = self.landmarks[:, INDEX_FINGER_TIP, :2] - self.landmarks[:, INDEX_FINGER_MCP, :2]
+        lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, lengths, out=vectors.copy(), where=lengths > 0)
+        return vectors, direction_names(vectors)
+
+    def two_hand_distance(self):
+        """
+        @returns {float|None} 两只手中心点之间的距离，手数不为2时返回None
+        """
+        if len(self) != 2:
+            return None
+        centers = self.centers()
+        return float(np.linalg.norm(centers[0] - centers[1]))
+
+def direction_names(vectors):
+    """
+    将方向向量批量转换为方向名称，水平/垂直分量超过另一分量1.2倍时视为主方向，否则为对角线方向
+
+    @param {numpy.ndarray} vectors - (N, 2) 方向向量
+    @returns {list} 方向名称
+    """
+    dx = vectors[:, 0]
+    dy = vectors[:, 1]
+    horizontal = np.abs(dx) > np.abs(dy) * 1.2
+    vertical = ~horizontal & (np.abs(dy) > np.abs(dx) * 1.2)
+    diagonal = ~horizontal & ~vertical
+    names = np.select(
+        [
+            horizontal & (dx > 0), horizontal,
+            vertical & (dy > 0), vertical,
+            diagonal & (dx > 0) & (dy < 0), diagonal & (dx > 0) & (dy > 0),
+            diagonal & (dx < 0) & (dy < 0), diagonal & (dx < 0) & (dy > 0)
+        ],
+        ["右", "左", "下", "上", "右上", "右下", "左上", "左下"],
+        default="未知"
+    )
+    return names.tolist()
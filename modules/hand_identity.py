@@ -0,0 +1,195 @@
+import numpy as np
+import logging
+import os
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.hand_frame import HANDEDNESS_UNKNOWN
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/hand_identity_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("hand_identity")
+
+class HandState:
+    """
+    一只手跨帧的状态：位置、左右手、稳定手势以及进入/退出滞回计数
+    """
+    __slots__ = ('hand_id', 'handedness', 'center_x', 'center_y', 'missed',
+                 'gesture', 'candidate', 'candidate_frames')
+
+    def __init__(self, hand_id, handedness, center):
+        self.hand_id = hand_id
+        self.handedness = int(handedness)
+        self.center_x = float(center[0])
+        self.center_y = float(center[1])
+        self.missed = 0
+        self.gesture = None  # 当前稳定的手势
+        self.candidate = None  # 正在等待确认的手势
+        self.candidate_frames = 0
+
+class HandIdentityTracker:
+    """
+    手部身份跟踪器
+
+    按中心位置和左右手把每帧的手与已有的手匹配，得到跨帧稳定的手部ID；
+    每只手的手势经过滞回：新手势连续出现若干帧才进入，手势消失连续若干帧才退出，
+    只在稳定手势变化时产生开始/结束事件
+    """
+    def __init__(self, enter_frames=None, exit_frames=None, max_distance=0.25, max_missed=5,
+                 handedness_penalty=0.5):
+        """
+        @param {int|None} enter_frames - 新手势需要连续出现的帧数，默认读取 HAND_GESTURE_ENTER_FRAMES
+        @param {int|None} exit_frames - 手势消失需要持续的帧数，默认读取 HAND_GESTURE_EXIT_FRAMES
+        @param {float} max_distance - 同一只手相邻两次出现的最大中心距离（归一化坐标）
+        @param {int} max_missed - 手连续未检测到多少帧后移除其身份
+        @param {float} handedness_penalty - 左右手不一致时附加的匹配代价
+        """
+        if enter_frames is None:
+            enter_frames = int(os.environ.get('HAND_GESTURE_ENTER_FRAMES', 3))
+        if exit_frames is None:
+            exit_frames = int(os.environ.get('HAND_GESTURE_EXIT_FRAMES', 5))
+
+        self.enter_frames = max(1, enter_frames)
+        self.exit_frames = max(1, exit_frames)
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.handedness_penalty = handedness_penalty
+
+        self.states = []
+        self.next_id = 1
+
+    def update(self, hand_frame, hand_gestures):
+        """
+        为当前帧的手分配稳定ID并更新各手的稳定手势
+
+        @param {HandFrame} hand_frame - 当前帧的手部关键点
+        @param {list} hand_gestures - 各手本帧的原始手势
+        @returns {tuple} ((手数,) int32 手部ID, 各手的稳定手势列表, 本帧事件列表)
+        """
+        events = []
+        centers = hand_frame.centers()
+        count = len(centers)
+        assigned = self._match(centers, hand_frame.handedness)
+
+        ids = np.empty(count, dtype=np.int32)
+        stable = [None] * count
+        matched = set()
+        for i in range(count):
+            state = assigned[i]
+            if state is None:
+                state = HandState(self.next_id, hand_frame.handedness[i], centers[i])
+                self.next_id += 1
+                self.states.append(state)
+                logger.debug(f"新的手 {state.hand_id}")
+            else:
+                state.center_x, state.center_y = float(centers[i, 0]), float(centers[i, 1])
+                if hand_frame.handedness[i] != HANDEDNESS_UNKNOWN:
+                    state.handedness = int(hand_frame.handedness[i])
+                state.missed = 0
+            matched.add(state.hand_id)
+            self._update_gesture(state, hand_gestures[i] if i < len(hand_gestures) else None, events)
+            ids[i] = state.hand_id
+            stable[i] = state.gesture
+
+        # 未匹配到的手累计丢失帧数，超过上限后移除并结束其手势
+        remaining = []
+        for state in self.states:
+            if state.hand_id not in matched:
+                state.missed += 1
+                if state.missed > self.max_missed:
+                    if state.gesture is not None:
+                        events.append({'hand_id': state.hand_id, 'gesture': state.gesture, 'type': 'end'})
+                    logger.debug(f"手 {state.hand_id} 已离开")
+                    continue
+            remaining.append(state)
+        self.states = remaining
+        return ids, stable, events
+
+    def _match(self, centers, handedness):
+        """
+        按代价从小到大贪心匹配（每帧只有几只手，贪心与最优匹配几乎一致）
+
+        @param {numpy.ndarray} centers - (手数, 2) 当前帧各手中心
+        @param {numpy.ndarray} handedness - (手数,) 左右手编码
+        @returns {list} 各手匹配到的 HandState，没有匹配时为None
+        """
+        assigned = [None] * len(centers)
+        if not len(centers) or not self.states:
+            return assigned
+
+        previous = np.array([(s.center_x, s.center_y) for s in self.states], dtype=np.float32)
+        previous_handedness = np.array([s.handedness for s in self.states])
+        costs = np.linalg.norm(centers[:, None, :] - previous[None, :, :], axis=2)
+        known = (handedness[:, None] != HANDEDNESS_UNKNOWN) & (previous_handedness[None, :] != HANDEDNESS_UNKNOWN)
+        costs += (known & (handedness[:, None] != previous_handedness[None, :])) * self.handedness_penalty
+
+        used = set()
+        for flat in np.argsort(costs, axis=None):
+            i, j = divmod(int(flat), costs.shape[1])
+            if costs[i, j] > self.max_distance:
+                break
+            if assigned[i] is not None or j in used:
+                continue
+            assigned[i] = self.states[j]
+            used.add(j)
+        return assigned
+
+    def _update_gesture(self, state, gesture, events):
+        """
+        手势滞回：与当前稳定手势不同的手势需要连续出现若干帧才生效
+
+        @param {HandState} state - 手的状态
+        @param {str|None} gesture - 本帧的原始手势
+        @param {list} events - 事件列表，稳定手势变化时追加开始/结束事件
+        """
+        if gesture == state.gesture:
+            state.candidate = None
+            state.candidate_frames = 0
+            return
+
+        if gesture == state.candidate:
+            state.candidate_frames += 1
+        else:
+            state.candidate = gesture
+            state.candidate_frames = 1
+
+        required = self.exit_frames if gesture is None else self.enter_frames
+        if state.candidate_frames < required:
+            return
+
+        if state.gesture is not None:
+            events.append({'hand_id': state.hand_id, 'gesture': state.gesture, 'type': 'end'})
+        if gesture is not None:
+            events.append({'hand_id': state.hand_id, 'gesture': gesture, 'type': 'start'})
+        state.gesture = gesture
+        state.candidate = None
+        state.candidate_frames = 0
+
+    def reset(self):
+        """
+        清除所有手的身份和状态
+        """
+        self.states = []
+
+    def get_stats(self):
+        """
+        获取身份跟踪统计数据
+
+        @returns {dict} 当前的手和已分配的ID数
+        """
+        return {
+            'hands': [
+                {'id': s.hand_id, 'gesture': s.gesture, 'missed': s.missed} for s in self.states
+            ],
+            'ids_assigned': self.next_id - 1
+        }
@@ -0,0 +1,487 @@
+import numpy as np
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from multiprocessing.connection import Client, Listener, wait
+from rich.logging import RichHandler
+from modules.hand_frame import HandFrame, NUM_LANDMARKS
+from modules.preprocess import FramePreprocessor
+from modules.face_frame import empty_faces, faces_to_array
+from modules.shared_frames import SharedFramePublisher, SharedFrameClient
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/inference_pool_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("inference_pool")
+
+# 推理任务
+TASK_HANDS = "hands"
+TASK_FACE = "face"
+DEFAULT_TASKS = (TASK_HANDS, TASK_FACE)
+
+# 工作进程通过环境变量获取连接密钥，避免出现在命令行中
+AUTHKEY_ENV = "NYSM_INFERENCE_AUTHKEY"
+
+# 工作进程以 python -m modules.inference_pool 方式在项目根目录启动
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def create_inference_pool():
+    """
+    根据环境变量创建推理进程池
+
+    INFERENCE_WORKERS 为工作进程数，0（默认）表示不使用进程池；
+    INFERENCE_MAX_IN_FLIGHT 为同时在处理中的最大帧数，默认为工作进程数的2倍
+
+    @returns {InferencePool|None} 已启动的进程池，未启用或启动失败时返回None
+    """
+    workers = int(os.environ.get('INFERENCE_WORKERS', '0'))
+    if workers <= 0:
+        return None
+    max_in_flight = int(os.environ.get('INFERENCE_MAX_IN_FLIGHT', str(workers * 2)))
+
+    pool = InferencePool(num_workers=workers, max_in_flight=max_in_flight)
+    try:
+        pool.start()
+        return pool
+    except Exception as e:
+        logger.error(f"启动推理进程池失败，使用进程内推理: {str(e)}")
+        pool.close()
+        return None
+
+class InferenceResult:
+    """
+    进程池返回的一帧推理结果
+
+    帧数据保留在进程池的共享内存槽中，使用完后必须调用 release 归还槽位
+    """
+    def __init__(self, pool, job_id, slot, timestamp, tag, hands, faces):
+        """
+        @param {InferencePool} pool - 所属进程池
+        @param {int} job_id - 提交序号
+        @param {int} slot - 帧所在的共享内存槽
+        @param {float} timestamp - 捕获时间戳（time.monotonic）
+        @param {object} tag - 提交时附带的对象（如延迟追踪记录）
+        @param {HandFrame} hands - 手部关键点
+        @param {numpy.ndarray|None} faces - (面部数, 468, 3) 面部关键点，未运行面部检测时为None
+        """
+        self.job_id = job_id
+        self.timestamp = timestamp
+        self.tag = tag
+        self.hands = hands
+        self.faces = faces
+        self._pool = pool
+        self._slot = slot
+        self._released = False
+
+    @property
+    def frame(self):
+        """
+        @returns {numpy.ndarray} 提交时的帧（只读视图）
+        """
+        frame = self._pool.publisher.ring.frames[self._slot].view()
+        frame.flags.writeable = False
+        return frame
+
+    def release(self):
+        """
+        归还共享内存槽，之后不能再访问 frame
+        """
+        if not self._released:
+            self._released = True
+            self._pool._release_slot(self._slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+class InferencePool:
+    """
+    MediaPipe推理进程池
+
+    每个工作进程持有自己的 Hands/FaceMesh 图，帧通过共享内存环形缓冲区传递，
+    工作进程只返回紧凑的关键点数组。结果按提交顺序交付，同时在处理中的帧数有上限，
+    吞吐随核数增加而延迟保持有界
+    """
+    def __init__(self, num_workers=2, max_in_flight=None, tasks=DEFAULT_TASKS, startup_timeout=30.0):
+        """
+        @param {int} num_workers - 工作进程数
+        @param {int|None} max_in_flight - 同时在处理中的最大帧数，默认为工作进程数的2倍
+        @param {tuple} tasks - 工作进程加载的推理任务
+        @param {float} startup_timeout - 等待工作进程连接的最长时间（秒）
+        """
+        self.num_workers = max(1, num_workers)
+        self.max_in_flight = max(1, max_in_flight or self.num_workers * 2)
+        self.tasks = tuple(tasks)
+        self.startup_timeout = startup_timeout
+
+        # 共享内存槽比在处理中的帧多留两个，供消费方持有的结果和正在写入的帧使用
+        self.num_slots = self.max_in_flight + 2
+        self.publisher = None
+        self.ring_generation = 0
+        self.slot_busy = np.zeros(self.num_slots, dtype=bool)
+
+        self.listener = None
+        self.processes = []
+        self.connections = []
+        self.outstanding = []  # 每个工作进程尚未返回的 [(提交序号, 是否运行面部检测)]
+
+        self.next_job = 0  # 下一个提交序号
+        self.next_delivery = 0  # 下一个按顺序交付的提交序号
+        self.jobs = {}  # 提交序号 -> (槽, 时间戳, 附带对象)
+        self.completed = {}  # 提交序号 -> (手部关键点, 面部关键点)
+        self.submitted = 0
+        self.dropped = 0
+
+    @property
+    def alive(self):
+        return any(conn is not None for conn in self.connections)
+
+    @property
+    def in_flight(self):
+        return self.next_job - self.next_delivery
+
+    def start(self):
+        """
+        启动工作进程并等待它们连接
+        """
+        authkey = secrets.token_bytes(32)
+        self.listener = Listener(authkey=authkey)
+        env = dict(os.environ, **{AUTHKEY_ENV: authkey.hex()})
+        address = self.listener.address
+        if isinstance(address, tuple):
+            address = f"{address[0]}:{address[1]}"
+
+        for i in range(self.num_workers):
+            self.processes.append(subprocess.Popen(
+                [sys.executable, '-m', 'modules.inference_pool',
+                 '--address', address, '--tasks', ','.join(self.tasks), '--worker-id', str(i)],
+                env=env,
+                cwd=PROJECT_ROOT
+            ))
+
+        # Listener.accept 没有超时参数，在线程中接受连接并限制等待时间
+        accepted = []
+        errors = []
+        timed_out = threading.Event()
+
+        def accept_workers():
+            try:
+                for _ in range(self.num_workers):
+                    conn = self.listener.accept()
+                    if timed_out.is_set():
+                        # 超时后的连接（包括用于唤醒的空连接）直接丢弃
+                        conn.close()
+                        return
+                    accepted.append(conn)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=accept_workers, name='inference-pool-accept', daemon=True)
+        thread.start()
+        thread.join(self.startup_timeout)
+        if thread.is_alive():
+            # 用一个空连接唤醒阻塞在 accept 中的线程
+            timed_out.set()
+            try:
+                Client(self.listener.address, authkey=authkey).close()
+            except Exception:
+                pass
+            thread.join(1.0)
+        self.connections = list(accepted)
+        self.outstanding = [[] for _ in self.connections]
+        if errors or len(self.connections) < self.num_workers:
+            raise TimeoutError(
+                f"{self.startup_timeout:g} 秒内只有 {len(self.connections)}/{self.num_workers} 个工作进程连接"
+                + (f": {errors[0]}" if errors else "")
+            )
+        logger.info(f"推理进程池已启动: {self.num_workers} 个工作进程，最多 {self.max_in_flight} 帧在处理中")
+
+    def can_submit(self):
+        """
+        @returns {bool} 是否可以提交新帧（在处理中的帧数未达上限且下一个槽空闲）
+        """
+        if not self.alive or self.in_flight >= self.max_in_flight:
+            return False
+        if self.publisher is None:
+            return True
+        return not self.slot_busy[(self.publisher.ring.latest_seq + 1) % self.num_slots]
+
+    def submit(self, frame, timestamp, tag=None, face=True):
+        """
+        提交一帧进行推理，帧被复制到共享内存后即可释放调用方的缓冲区
+
+        @param {numpy.ndarray} frame - BGR视频帧
+        @param {float} timestamp - 捕获时间戳（time.monotonic）
+        @param {object} tag - 随结果返回的附带对象
+        @param {bool} face - 是否运行面部检测
+        @returns {int|None} 提交序号，窗口已满时返回None（该帧被丢弃）
+        """
+        if not self.can_submit() or not self._ensure_ring(frame.shape):
+            self.dropped += 1
+            return None
+
+        slot, view = self.publisher.begin_write()
+        np.copyto(view, frame)
+        self.publisher.commit(slot, timestamp)
+        self.slot_busy[slot] = True
+
+        job_id = self.next_job
+        self.next_job += 1
+        self.jobs[job_id] = (slot, timestamp, tag)
+        run_face = face and TASK_FACE in self.tasks
+
+        # 分配给未完成任务最少的工作进程
+        worker = min(
+            (i for i, conn in enumerate(self.connections) if conn is not None),
+            key=lambda i: len(self.outstanding[i])
+        )
+        try:
+            self.connections[worker].send((job_id, self.publisher.name, slot, self.publisher.ring.latest_seq, run_face))
+            self.outstanding[worker].append((job_id, run_face))
+        except (OSError, EOFError) as e:
+            logger.error(f"向工作进程 {worker} 发送任务失败: {str(e)}")
+            self.outstanding[worker].append((job_id, run_face))
+            self._worker_failed(worker)
+        self.submitted += 1
+        return job_id
+
+    def get_result(self, timeout=None):
+        """
+        按提交顺序获取下一帧的推理结果
+
+        @param {float|None} timeout - 最长等待时间（秒），None表示一直等待
+        @returns {InferenceResult|None} 推理结果，超时或没有在处理中的帧时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.next_delivery not in self.completed:
+            if self.in_flight == 0:
+                return None
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            live = [conn for conn in self.connections if conn is not None]
+            if not live:
+                return None
+            ready = wait(live, remaining)
+            if not ready:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                continue
+            for conn in ready:
+                self._receive(self.connections.index(conn))
+
+        job_id = self.next_delivery
+        self.next_delivery += 1
+        hands, faces = self.completed.pop(job_id)
+        slot, timestamp, tag = self.jobs.pop(job_id)
+        return InferenceResult(self, job_id, slot, timestamp, tag, hands, faces)
+
+    def get_stats(self):
+        """
+        @returns {dict} 进程池统计信息
+        """
+        return {
+            'workers': sum(1 for conn in self.connections if conn is not None),
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self.in_flight,
+            'submitted': self.submitted,
+            'dropped': self.dropped
+        }
+
+    def _receive(self, worker):
+        """
+        读取工作进程返回的一个结果
+
+        @param {int} worker - 工作进程索引
+        """
+        try:
+            job_id, landmarks, handedness, scores, faces = self.connections[worker].recv()
+        except (OSError, EOFError) as e:
+            logger.error(f"工作进程 {worker} 已断开: {str(e)}")
+            self._worker_failed(worker)
+            return
+
+        self.outstanding[worker] = [job for job in self.outstanding[worker] if job[0] != job_id]
+        hands = HandFrame(landmarks, handedness, scores) if landmarks is not None else HandFrame.empty()
+        self.completed[job_id] = (hands, faces)
+
+    def _worker_failed(self, worker):
+        """
+        工作进程异常退出时，将它未完成的帧标记为空结果，避免按顺序交付被阻塞
+
+        @param {int} worker - 工作进程索引
+        """
+        conn = self.connections[worker]
+        self.connections[worker] = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        for job_id, run_face in self.outstanding[worker]:
+            faces = empty_faces() if run_face else None
+            self.completed[job_id] = (HandFrame.empty(), faces)
+        self.outstanding[worker] = []
+        if not self.alive:
+            logger.error("推理进程池的所有工作进程都已退出")
+
+    def _ensure_ring(self, shape):
+        """
+        确保共享内存环形缓冲区与帧形状一致，形状变化时在所有槽空闲后重建
+
+        @param {tuple} shape - 帧形状
+        @returns {bool} 缓冲区是否可用
+        """
+        if self.publisher is not None and self.publisher.shape == tuple(shape):
+            return True
+        if self.slot_busy.any():
+            return False
+        if self.publisher is not None:
+            self.publisher.close()
+        self.ring_generation += 1
+        name = f"nysm_infer_{os.getpid()}_{self.ring_generation}"
+        self.publisher = SharedFramePublisher(name, shape, num_slots=self.num_slots)
+        return True
+
+    def _release_slot(self, slot):
+        """
+        @param {int} slot - 结果持有的共享内存槽
+        """
+        self.slot_busy[slot] = False
+
+    def close(self):
+        """
+        停止工作进程并释放共享内存
+        """
+        for i, conn in enumerate(self.connections):
+            if conn is None:
+                continue
+            try:
+                conn.send(None)
+                conn.close()
+            except (OSError, EOFError):
+                pass
+            self.connections[i] = None
+        # 所有工作进程共用一个等待期限，未连接上的工作进程不会让关闭时间成倍增加
+        deadline = time.monotonic() + 5.0
+        for process in self.processes:
+            try:
+                process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
+        logger.info("推理进程池已关闭")
+
+def run_worker(address, tasks, worker_id=0):
+    """
+    工作进程主循环：加载推理图，从共享内存读取帧并返回关键点数组
+
+    @param {str|tuple} address - 进程池监听地址
+    @param {tuple} tasks - 推理任务
+    @param {int} worker_id - 工作进程编号
+    """
+    # 先连接进程池再加载推理图，进程池只需等待进程启动而不是模型加载
+    conn = Client(address, authkey=bytes.fromhex(os.environ[AUTHKEY_ENV]))
+
+    import mediapipe as mp
+    hands = None
+    face_mesh = None
+    # 帧轮流分配给各工作进程，同一进程收到的帧并不相邻，不能依赖上一帧的跟踪状态，按独立图片推理
+    if TASK_HANDS in tasks:
+        hands = mp.solutions.hands.Hands(
+            static_image_mode=True,
+            max_num_hands=int(os.environ.get('MAX_NUM_HANDS', 2)),
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    if TASK_FACE in tasks:
+        face_mesh = mp.solutions.face_mesh.FaceMesh(
+            static_image_mode=True,
+            max_num_faces=max(1, int(os.environ.get('MAX_NUM_FACES', 1))),
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    logger.info(f"推理工作进程 {worker_id} 已就绪: {', '.join(tasks)}")
+
+    client = None
+    # 与进程内推理一致，按 INFERENCE_SIZE 缩小后再推理（环境变量由主进程继承）
+    preprocessor = FramePreprocessor()
+    empty_hands = np.empty((0, NUM_LANDMARKS, 3), dtype=np.float32)
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except EOFError:
+                break
+            if job is None:
+                break
+
+            job_id, ring_name, slot, seq, run_face = job
+            landmarks, handedness, scores, faces = empty_hands, None, None, None
+            try:
+                if client is None or client.name != ring_name:
+                    if client is not None:
+                        client.close()
+                    client = SharedFrameClient(ring_name)
+
+                if int(client.ring.slot_seqs[slot]) == seq:
+                    rgb = preprocessor.prepare(client.ring.frames[slot]).inference_rgb
+
+                    if hands is not None:
+                        hand_frame = HandFrame.from_results(hands.process(rgb))
+                        landmarks, handedness, scores = hand_frame.landmarks, hand_frame.handedness, hand_frame.scores
+                    if run_face and face_mesh is not None:
+                        faces = faces_to_array(face_mesh.process(rgb))
+                else:
+                    logger.warning(f"工作进程 {worker_id}: 槽 {slot} 已被覆盖，跳过任务 {job_id}")
+            except Exception as e:
+                logger.error(f"工作进程 {worker_id} 推理出错: {str(e)}")
+
+            if run_face and faces is None:
+                faces = empty_faces()
+            conn.send((job_id, landmarks, handedness, scores, faces))
+    finally:
+        if client is not None:
+            client.close()
+        if hands is not None:
+            hands.close()
+        if face_mesh is not None:
+            face_mesh.close()
+        conn.close()
+        logger.info(f"推理工作进程 {worker_id} 已退出")
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='MediaPipe推理工作进程（由 InferencePool 启动）')
+    parser.add_argument('--address', required=True, help='进程池监听地址')
+    parser.add_argument('--tasks', default=','.join(DEFAULT_TASKS), help='推理任务，逗号分隔')
+    parser.add_argument('--worker-id', type=int, default=0, help='工作进程编号')
+    args = parser.parse_args()
+
+    address = args.address
+    if ':' in address and not address.startswith('/'):
+        host, port = address.rsplit(':', 1)
+        address = (host, int(port))
+    run_worker(address, tuple(t for t in args.tasks.split(',') if t), args.worker_id)
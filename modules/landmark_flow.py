@@ -0,0 +1,179 @@
+import cv2
+import numpy as np
+import logging
+import os
+import time
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.hand_frame import HandFrame
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/landmark_flow_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("landmark_flow")
+
+class LandmarkTracker:
+    """
+    关键点光流跟踪器
+
+    每 N 帧（或按每秒检测次数预算）运行一次完整推理，中间帧以上一次的21个关键点为种子，
+    用稀疏光流（calcOpticalFlowPyrLK）传播关键点；前后向误差过大或有效点过少时要求重新推理
+    """
+    def __init__(self, detect_interval=None, detect_fps=None, max_error=None, min_valid_ratio=0.6,
+                 win_size=(21, 21), max_level=3):
+        """
+        @param {int|None} detect_interval - 每隔多少帧完整推理一次，默认读取 HAND_DETECT_INTERVAL（1表示每帧推理）
+        @param {float|None} detect_fps - 每秒最多完整推理次数，默认读取 HAND_DETECT_FPS（0表示不限制）
+        @param {float|None} max_error - 允许的前后向跟踪误差中位数（像素），默认读取 HAND_TRACK_MAX_ERROR
+        @param {float} min_valid_ratio - 每只手跟踪成功的关键点比例下限
+        @param {tuple} win_size - 光流搜索窗口
+        @param {int} max_level - 光流金字塔层数
+        """
+        if detect_interval is None:
+            detect_interval = int(os.environ.get('HAND_DETECT_INTERVAL', 1))
+        if detect_fps is None:
+            detect_fps = float(os.environ.get('HAND_DETECT_FPS', 0))
+        if max_error is None:
+            max_error = float(os.environ.get('HAND_TRACK_MAX_ERROR', 3.0))
+
+        self.detect_interval = max(1, detect_interval)
+        self.detect_fps = max(0.0, detect_fps)
+        self.max_error = max_error
+        self.min_valid_ratio = min_valid_ratio
+        self.lk_params = dict(
+            winSize=win_size,
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        )
+
+        # 预分配的灰度图，上一帧和当前帧交替使用
+        self.gray = None
+        self.prev_gray = None
+        self.hand_frame = None
+        self.frames_since_detect = 0
+        self.last_detect_time = 0.0
+
+        # 计数器
+        self.detections = 0
+        self.tracked_frames = 0
+        self.fallbacks = 0
+
+    @property
+    def enabled(self):
+        return self.detect_interval > 1 or self.detect_fps > 0
+
+    def should_detect(self):
+        """
+        判断当前帧是否需要完整推理
+
+        @returns {bool} 是否需要推理
+        """
+        if not self.enabled or self.hand_frame is None:
+            return True
+        if self.detect_interval > 1 and self.frames_since_detect + 1 >= self.detect_interval:
+            return True
+        if self.detect_fps > 0 and time.monotonic() - self.last_detect_time >= 1.0 / self.detect_fps:
+            return True
+        return False
+
+    def update_gray(self, frame):
+        """
+        将当前帧转换为灰度图（写入预分配缓冲区），每帧调用一次
+
+        @param {numpy.ndarray} frame - BGR视频帧
+        """
+        height, width = frame.shape[:2]
+        if self.gray is None or self.gray.shape != (height, width):
+            self.gray = np.empty((height, width), dtype=np.uint8)
+            self.prev_gray = np.empty((height, width), dtype=np.uint8)
+            self.hand_frame = None
+        self.gray, self.prev_gray = self.prev_gray, self.gray
+        cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=self.gray)
+
+    def set_detection(self, hand_frame):
+        """
+        以完整推理的结果作为新的跟踪种子
+
+        @param {HandFrame} hand_frame - 当前帧的推理结果
+        """
+        self.hand_frame = hand_frame
+        self.frames_since_detect = 0
+        self.last_detect_time = time.monotonic()
+        self.detections += 1
+
+    def track(self):
+        """
+        用光流把上一帧的关键点传播到当前帧
+
+        @returns {HandFrame|None} 传播后的关键点，跟踪失败时返回None（应重新推理）
+        """
+        self.frames_since_detect += 1
+        if not len(self.hand_frame):
+            # 上一次推理没有手，推理之间的帧直接返回空结果
+            self.tracked_frames += 1
+            return self.hand_frame
+
+        height, width = self.gray.shape
+        scale = np.array([width, height], dtype=np.float32)
+        landmarks = self.hand_frame.landmarks
+        points = (landmarks[:, :, :2] * scale).reshape(-1, 1, 2)
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, self.gray, points, None, **self.lk_params)
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(self.gray, self.prev_gray, next_points, None, **self.lk_params)
+
+        # 前后向误差：正向跟踪后再反向跟踪回来，与起点的距离
+        hands = len(landmarks)
+        errors = np.linalg.norm(points - back_points, axis=2).reshape(hands, -1)
+        valid = ((status & back_status).reshape(hands, -1) == 1) & (errors < self.max_error * 2)
+
+        valid_ratio = valid.mean(axis=1)
+        median_errors = np.array([
+            np.median(errors[i][valid[i]]) if valid[i].any() else np.inf for i in range(hands)
+        ])
+        if (valid_ratio < self.min_valid_ratio).any() or (median_errors > self.max_error).any():
+            self.fallbacks += 1
+            logger.debug(f"光流跟踪失败，有效点比例 {valid_ratio.min():.2f}，误差中位数 {median_errors.max():.2f}")
+            return None
+
+        # 跟踪失败的点按同一只手有效点的中位位移移动
+        displacement = (next_points - points).reshape(hands, -1, 2)
+        for i in range(hands):
+            if not valid[i].all():
+                displacement[i][~valid[i]] = np.median(displacement[i][valid[i]], axis=0)
+
+        tracked = landmarks.copy()
+        tracked[:, :, :2] += displacement / scale
+        self.hand_frame = HandFrame(tracked, self.hand_frame.handedness, self.hand_frame.scores)
+        self.tracked_frames += 1
+        return self.hand_frame
+
+    def reset(self):
+        """
+        清除跟踪种子，下一帧必定推理
+        """
+        self.hand_frame = None
+
+    def get_stats(self):
+        """
+        获取跟踪统计数据
+
+        @returns {dict} 推理次数、光流跟踪帧数和跟踪失败回退次数
+        """
+        return {
+            'enabled': self.enabled,
+            'detect_interval': self.detect_interval,
+            'detect_fps': self.detect_fps,
+            'detections': self.detections,
+            'tracked': self.tracked_frames,
+            'fallbacks': self.fallbacks
+        }
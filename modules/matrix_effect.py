@@ -0,0 +1,167 @@
+import cv2
+import numpy as np
+import os
+from modules.effects import Effect
+
+# 字符的初始布局按此分辨率生成，第一次应用时按实际图像尺寸缩放
+NOMINAL_SIZE = (640, 480)
+
+def build_glyph_atlas(chars, scales, font=cv2.FONT_HERSHEY_SIMPLEX, thickness=1):
+    """
+    预先渲染所有 (字符, 字号) 组合，每个字形只保留非零像素的偏移和亮度
+
+    偏移相对于 cv2.putText 的文字原点（左下角基线）
+
+    @param {str} chars - 字符集
+    @param {numpy.ndarray} scales - 字号列表
+    @param {int} font - OpenCV字体
+    @param {int} thickness - 笔画粗细
+    @returns {list} 每个字形的 (行偏移, 列偏移, 亮度)，字形编号为 字符序号 * 字号数 + 字号序号
+    """
+    glyphs = []
+    for char in chars:
+        for scale in scales:
+            (text_w, text_h), baseline = cv2.getTextSize(char, font, float(scale), thickness)
+            pad = 2
+            tile = np.zeros((text_h + baseline + 2 * pad, text_w + 2 * pad), dtype=np.uint8)
+            origin = (pad, pad + text_h)
+            cv2.putText(tile, char, origin, font, float(scale), 255, thickness, cv2.LINE_AA)
+            rows, cols = np.nonzero(tile)
+            glyphs.append((rows - origin[1], cols - origin[0], tile[rows, cols]))
+    return glyphs
+
+class MatrixEffect(Effect):
+    """
+    黑客帝国特效
+
+    下落字符是一个粒子系统：位置、速度和字形编号都保存在数组中，每次更新一步推进。
+    字形在创建时预先渲染为非零像素表；粒子按字形排序，绘制时每种字形一次散射写入
+    缓冲区池中带边距的画布，字符靠近边缘也不需要逐像素越界判断
+    """
+    name = 'matrix'
+
+    def __init__(self, count=None, chars="01", min_scale=0.5, max_scale=1.5, scale_levels=5,
+                 min_speed=5, max_speed=15, alpha=0.7, beta=0.5, seed=None, interval=None):
+        """
+        @param {int|None} count - 字符数量，默认读取 MATRIX_CHAR_COUNT
+        @param {str} chars - 字符集
+        @param {float} min_scale - 最小字号
+        @param {float} max_scale - 最大字号
+        @param {int} scale_levels - 字号分档数，每档预渲染一套字形
+        @param {int} min_speed - 最小下落速度（像素/帧）
+        @param {int} max_speed - 最大下落速度（像素/帧）
+        @param {float} alpha - 绿色调原图的权重
+        @param {float} beta - 字符叠加层的权重
+        @param {int|None} seed - 随机种子
+        @param {int|None} interval - 字符图层的更新间隔（帧），默认读取 MATRIX_EFFECT_INTERVAL
+        """
+        if count is None:
+            count = int(os.environ.get('MATRIX_CHAR_COUNT', 100))
+        if interval is None:
+            interval = int(os.environ.get('MATRIX_EFFECT_INTERVAL', 1))
+        self.interval = max(1, interval)
+
+        self.count = max(1, count)
+        self.chars = chars
+        self.scale_levels = max(1, scale_levels)
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+        self.beta = beta
+        self.rng = np.random.default_rng(seed)
+
+        scales = np.linspace(min_scale, max_scale, self.scale_levels)
+        self.glyphs = build_glyph_atlas(chars, scales)
+        # 画布四周的边距，保证任何位置的字形像素都落在画布内
+        self.margin = 1 + max(int(max(np.abs(dy).max(), np.abs(dx).max())) for dy, dx, _ in self.glyphs)
+
+        # 先转为绿色调：0.1*原图 + 0.9*只保留绿色通道的原图，再乘以alpha，合并为一次逐通道线性变换
+        self.tint_weights = (np.diag([0.1, 1.0, 0.1]) * alpha).astype(np.float32)
+
+        self.size = None
+        self.overlay = None
+        self.canvas_shape = None
+        self.glyph_offsets = None
+        self.reset()
+
+    def reset(self):
+        """
+        重新随机生成所有字符
+        """
+        width, height = NOMINAL_SIZE
+        count = self.count
+        self.x = self.rng.integers(0, width + 1, count).astype(np.intp)
+        self.y = self.rng.integers(0, height + 1, count).astype(np.intp)
+        self.speed = self.rng.integers(self.min_speed, self.max_speed + 1, count).astype(np.intp)
+        # 字形在字符的生命周期内不变，排序后每种字形对应一段连续的粒子
+        glyph = np.sort(self.rng.integers(0, len(self.glyphs), count))
+        bounds = np.searchsorted(glyph, np.arange(len(self.glyphs) + 1))
+        self.glyph_ranges = [(g, int(bounds[g]), int(bounds[g + 1]))
+                             for g in range(len(self.glyphs)) if bounds[g + 1] > bounds[g]]
+        self.size = NOMINAL_SIZE
+
+    def _resize(self, width, height):
+        """
+        图像尺寸变化时把字符位置按比例缩放到新尺寸
+
+        @param {int} width - 图像宽度
+        @param {int} height - 图像高度
+        """
+        if self.size != (width, height):
+            old_width, old_height = self.size
+            self.x = self.x * width // max(1, old_width)
+            self.y = self.y * height // max(1, old_height)
+            self.size = (width, height)
+
+    def step(self, frames=1):
+        """
+        所有字符下落，落出画面的字符回到顶部并随机选择新的列
+
+        @param {int} frames - 推进的帧数
+        """
+        width, height = self.size
+        self.y += self.speed * frames
+        wrapped = self.y > height
+        count = int(np.count_nonzero(wrapped))
+        if count:
+            self.y[wrapped] = 0
+            self.x[wrapped] = self.rng.integers(0, width + 1, count)
+
+    def update(self, image, pool, frames=1):
+        """
+        推进字符并重新渲染字符图层
+
+        @param {numpy.ndarray} image - 当前帧（BGR）
+        @param {BufferPool} pool - 缓冲区池
+        @param {int} frames - 距上次更新经过的帧数
+        """
+        height, width = image.shape[:2]
+        self._resize(width, height)
+        self.step(frames)
+
+        margin = self.margin
+        canvas = pool.get('matrix.canvas', (height + 2 * margin, width + 2 * margin, 3))
+        if self.canvas_shape != canvas.shape:
+            # 字形像素相对原点的扁平偏移（只写绿色通道），画布宽度变化时重算
+            row_stride = canvas.shape[1] * 3
+            self.glyph_offsets = [(dy * row_stride + dx * 3 + 1).astype(np.intp) for dy, dx, _ in self.glyphs]
+            self.canvas_shape = canvas.shape
+
+        canvas.fill(0)
+        flat = canvas.reshape(-1)
+        origins = (self.y + margin) * (canvas.shape[1] * 3) + (self.x + margin) * 3
+
+        # 每种字形一次写入该字形所有字符的全部像素
+        for glyph, start, end in self.glyph_ranges:
+            flat[origins[start:end, None] + self.glyph_offsets[glyph]] = self.glyphs[glyph][2]
+        self.overlay = canvas[margin:margin + height, margin:margin + width]
+
+    def compose(self, image, pool):
+        """
+        把原图转为绿色调并叠加字符图层，直接写回输入图像
+
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {BufferPool} pool - 缓冲区池
+        """
+        tint = pool.get('matrix.tint', image.shape)
+        cv2.transform(image, self.tint_weights, dst=tint)
+        cv2.addWeighted(tint, 1.0, self.overlay, self.beta, 0, dst=image)
@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+import logging
+import os
+import time
+from datetime import datetime
+from rich.logging import RichHandler
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/motion_gate_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("motion_gate")
+
+class MotionGate:
+    """
+    运动门控，画面静止时跳过推理
+
+    将帧缩小为灰度小图，与上次推理时的参考图逐像素比较，统计灰度差超过阈值的像素数；
+    变化像素数低于下限认为画面未变化，调用方应复用上一次的推理结果。
+    按变化像素数而不是全图平均差判断，画面中只有手这样的小区域移动时也能及时推理
+    """
+    def __init__(self, threshold=None, min_changed=None, refresh_interval=None, size=(64, 48), enabled=None):
+        """
+        @param {float|None} threshold - 认为像素发生变化的灰度差（0-255），默认读取 MOTION_GATE_THRESHOLD
+        @param {int|None} min_changed - 需要推理的最少变化像素数（按小图计），默认读取 MOTION_GATE_MIN_PIXELS
+        @param {float|None} refresh_interval - 强制推理的最长间隔（秒），默认读取 MOTION_GATE_REFRESH
+        @param {tuple} size - 比较用小图尺寸 (宽, 高)
+        @param {bool|None} enabled - 是否启用，默认读取 MOTION_GATE_ENABLED
+        """
+        if threshold is None:
+            threshold = float(os.environ.get('MOTION_GATE_THRESHOLD', 12.0))
+        if min_changed is None:
+            min_changed = int(os.environ.get('MOTION_GATE_MIN_PIXELS', 3))
+        if refresh_interval is None:
+            refresh_interval = float(os.environ.get('MOTION_GATE_REFRESH', 1.0))
+        if enabled is None:
+            # 默认关闭：跳过推理会让手势、轨迹和缩放按刷新间隔而不是摄像头帧率更新
+            enabled = os.environ.get('MOTION_GATE_ENABLED', '0') in ('1', 'true', 'True')
+
+        self.threshold = threshold
+        self.min_changed = max(1, min_changed)
+        self.refresh_interval = refresh_interval
+        self.size = size
+        self.enabled = enabled
+
+        # 预分配的比较缓冲区
+        width, height = size
+        self.small = np.empty((height, width, 3), dtype=np.uint8)
+        self.gray = np.empty((height, width), dtype=np.uint8)
+        self.diff = np.empty((height, width), dtype=np.uint8)
+        self.reference = np.empty((height, width), dtype=np.uint8)
+        self.has_reference = False
+        self.last_inference_time = 0.0
+        self.last_score = 0
+
+        # 计数器
+        self.total_frames = 0
+        self.skipped_frames = 0
+
+    def should_process(self, frame):
+        """
+        判断当前帧是否需要推理
+
+        @param {numpy.ndarray} frame - BGR视频帧
+        @returns {bool} 是否需要推理，返回False时应复用上次结果
+        """
+        self.total_frames += 1
+        if not self.enabled:
+            return True
+
+        cv2.resize(frame, self.size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+
+        now = time.monotonic()
+        if self.has_reference and now - self.last_inference_time < self.refresh_interval:
+            cv2.absdiff(self.gray, self.reference, dst=self.diff)
+            cv2.threshold(self.diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self.diff)
+            self.last_score = cv2.countNonZero(self.diff)
+            if self.last_score < self.min_changed:
+                self.skipped_frames += 1
+                return False
+
+        np.copyto(self.reference, self.gray)
+        self.has_reference = True
+        self.last_inference_time = now
+        return True
+
+    def reset(self):
+        """
+        清除参考帧，下一帧必定推理
+        """
+        self.has_reference = False
+
+    def get_stats(self):
+        """
+        获取门控统计数据
+
+        @returns {dict} 帧数、推理次数、跳过次数和跳过比例
+        """
+        inferences = self.total_frames - self.skipped_frames
+        return {
+            'enabled': self.enabled,
+            'frames': self.total_frames,
+            'inferences': inferences,
+            'skipped': self.skipped_frames,
+            'skip_ratio': round(self.skipped_frames / self.total_frames, 3) if self.total_frames else 0.0
+        }
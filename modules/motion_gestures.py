@@ -0,0 +1,336 @@
+import numpy as np
+import logging
+import os
+import time
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.hand_frame import INDEX_FINGER_TIP
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/motion_gestures_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("motion_gestures")
+
+def resample_path(points, samples):
+    """
+    按弧长把轨迹重采样为固定点数
+
+    @param {numpy.ndarray} points - (点数, 2) 轨迹
+    @param {int} samples - 重采样后的点数
+    @returns {numpy.ndarray} (samples, 2) float32
+    """
+    lengths = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    distance = np.concatenate([[0.0], np.cumsum(lengths)])
+    targets = np.linspace(0.0, distance[-1], samples)
+    resampled = np.empty((samples, 2), dtype=np.float32)
+    resampled[:, 0] = np.interp(targets, distance, points[:, 0])
+    resampled[:, 1] = np.interp(targets, distance, points[:, 1])
+    return resampled
+
+def path_straightness(path):
+    """
+    轨迹的平直度：首尾距离与路径长度之比，直线为1，闭合的圆接近0
+
+    @param {numpy.ndarray} path - (点数, 2) 轨迹
+    @returns {float} 平直度
+    """
+    length = np.linalg.norm(np.diff(path, axis=0), axis=1).sum()
+    return float(np.linalg.norm(path[-1] - path[0]) / length) if length > 0 else 0.0
+
+def normalize_path(path):
+    """
+    以重心为原点、按包围盒长边缩放到单位大小，保留方向（挥动方向有意义）
+
+    @param {numpy.ndarray} path - (点数, 2) 轨迹
+    @returns {numpy.ndarray} 归一化后的轨迹
+    """
+    path = path - path.mean(axis=0)
+    extent = (path.max(axis=0) - path.min(axis=0)).max()
+    return path / extent if extent > 0 else path
+
+def build_motion_templates(samples=16, phases=8):
+    """
+    生成内置动态手势模板：四个方向的挥动，以及顺/逆时针画圈（每个起始相位一个模板，
+    画圈可以从任意位置开始）
+
+    @param {int} samples - 每个模板的点数
+    @param {int} phases - 画圈模板的起始相位数
+    @returns {tuple} ((模板数, samples, 2) 模板数组, 各模板的手势名称列表)
+    """
+    line = np.linspace(-0.5, 0.5, samples, dtype=np.float32)
+    zeros = np.zeros(samples, dtype=np.float32)
+    templates = [
+        np.stack([-line, zeros], axis=1),  # 向左挥动
+        np.stack([line, zeros], axis=1),  # 向右挥动
+        np.stack([zeros, -line], axis=1),  # 向上挥动（图像Y轴向下）
+        np.stack([zeros, line], axis=1)  # 向下挥动
+    ]
+    names = ["swipe_left", "swipe_right", "swipe_up", "swipe_down"]
+
+    angles = np.linspace(0.0, 2 * np.pi, samples, dtype=np.float32)
+    for phase in np.arange(phases) * (2 * np.pi / phases):
+        # 图像Y轴向下，角度增加在屏幕上为顺时针
+        clockwise = np.stack([np.cos(angles + phase), np.sin(angles + phase)], axis=1) * 0.5
+        templates.append(clockwise)
+        names.append("circle_cw")
+        templates.append(clockwise[::-1].copy())
+        names.append("circle_ccw")
+    return np.stack(templates).astype(np.float32), names
+
+def dtw_band_index(samples, window=None):
+    """
+    预计算倾斜布局（按反对角线存放）的代价矩阵取值索引
+
+    倾斜布局中第 d 行第 i 列对应原矩阵的 (i, d-i)，同一条反对角线上的格子互不依赖且在内存中连续，
+    动态规划的三个前驱都是相邻两行的切片；带宽外和越界的格子指向填充的 inf
+
+    @param {int} samples - 轨迹点数
+    @param {int|None} window - Sakoe-Chiba 带宽，None表示不限制
+    @returns {tuple} (行索引, 列索引)，形状均为 (2×点数+1, 点数+1)
+    """
+    diagonal = np.arange(2 * samples + 1)[:, None]
+    i = np.arange(samples + 1)[None, :]
+    j = diagonal - i
+    valid = (i >= 1) & (j >= 1) & (j <= samples)
+    if window is not None:
+        valid &= np.abs(i - j) <= window
+    rows = np.where(valid, i - 1, samples)
+    cols = np.where(valid, j - 1, samples)
+    return rows, cols
+
+def batched_dtw(queries, templates, index=None, window=None):
+    """
+    批量动态时间规整距离：所有轨迹与所有模板一次计算
+
+    沿反对角线推进动态规划，循环次数只有 2×点数，每次对该对角线上的所有格子和所有（轨迹，模板）对向量化
+
+    @param {numpy.ndarray} queries - (轨迹数, 点数, 2)
+    @param {numpy.ndarray} templates - (模板数, 点数, 2)
+    @param {tuple|None} index - dtw_band_index 的结果，None时按 window 现算
+    @param {int|None} window - Sakoe-Chiba 带宽
+    @returns {numpy.ndarray} (轨迹数, 模板数) 按 2×点数 归一化的累计代价
+    """
+    n = queries.shape[1]
+    pairs = len(queries) * len(templates)
+    rows, cols = index if index is not None else dtw_band_index(n, window)
+
+    # 点对距离，x、y 分开广播避免末维为2的五维数组
+    padded = np.full((n + 1, n + 1, len(queries), len(templates)), np.inf, dtype=np.float32)
+    dx = queries[:, :, 0].T[:, None, :, None] - templates[:, :, 0].T[None, :, None, :]
+    dy = queries[:, :, 1].T[:, None, :, None] - templates[:, :, 1].T[None, :, None, :]
+    np.multiply(dx, dx, out=dx)
+    np.multiply(dy, dy, out=dy)
+    np.add(dx, dy, out=dx)
+    np.sqrt(dx, out=padded[:n, :n])
+    cost = padded.reshape(n + 1, n + 1, pairs)[rows, cols]
+
+    accumulated = np.full((2 * n + 1, n + 1, pairs), np.inf, dtype=np.float32)
+    accumulated[0, 0] = 0.0
+    for diagonal in range(2, 2 * n + 1):
+        lo, hi = max(1, diagonal - n), min(n, diagonal - 1) + 1
+        # 前驱 (i-1, j)、(i-1, j-1)、(i, j-1)
+        best = np.minimum(accumulated[diagonal - 1, lo - 1:hi - 1], accumulated[diagonal - 2, lo - 1:hi - 1])
+        np.minimum(best, accumulated[diagonal - 1, lo:hi], out=best)
+        np.add(cost[diagonal, lo:hi], best, out=accumulated[diagonal, lo:hi])
+    return (accumulated[2 * n, n] / (2 * n)).reshape(len(queries), len(templates))
+
+class MotionGestureRecognizer:
+    """
+    动态手势识别器
+
+    每只手在固定大小的NumPy环形缓冲区中记录最近的食指指尖轨迹（位置和时间戳），
+    每帧取时间窗口内、移动幅度足够的轨迹，重采样、归一化后与所有模板一次性做批量DTW匹配；
+    手静止或移动幅度不足时不做匹配
+    """
+    def __init__(self, enabled=None, window=None, max_cost=None, min_extent=None,
+                 max_hands=2, capacity=64, samples=16, cooldown=0.5, margin=0.6, straightness_tolerance=0.1):
+        """
+        @param {bool|None} enabled - 是否启用，默认读取 MOTION_GESTURES_ENABLED
+        @param {float|None} window - 轨迹时间窗口（秒），默认读取 MOTION_GESTURE_WINDOW
+        @param {float|None} max_cost - 允许的最大DTW平均代价，默认读取 MOTION_GESTURE_MAX_COST
+        @param {float|None} min_extent - 轨迹包围盒长边的最小值（相对画面高度），默认读取 MOTION_GESTURE_MIN_EXTENT
+        @param {int} max_hands - 同时跟踪的最大手数
+        @param {int} capacity - 每只手环形缓冲区的容量（帧）
+        @param {int} samples - 重采样点数
+        @param {float} cooldown - 识别到动态手势后该手的冷却时间（秒）
+        @param {float} margin - 最佳手势的代价需低于其他手势最佳代价的该比例
+        @param {float} straightness_tolerance - 轨迹与手势模板的平直度之差超过该值时不参与匹配，避免画圈的一段被识别为挥动
+        """
+        if enabled is None:
+            enabled = os.environ.get('MOTION_GESTURES_ENABLED', '1') in ('1', 'true', 'True')
+        if window is None:
+            window = float(os.environ.get('MOTION_GESTURE_WINDOW', 0.8))
+        if max_cost is None:
+            max_cost = float(os.environ.get('MOTION_GESTURE_MAX_COST', 0.06))
+        if min_extent is None:
+            min_extent = float(os.environ.get('MOTION_GESTURE_MIN_EXTENT', 0.25))
+
+        self.enabled = enabled
+        self.window = window
+        self.max_cost = max_cost
+        self.min_extent = min_extent
+        self.samples = samples
+        self.cooldown = cooldown
+        self.margin = margin
+        self.straightness_tolerance = straightness_tolerance
+        self.dtw_index = dtw_band_index(samples, max(2, samples // 4))
+        self.set_templates(*build_motion_templates(samples))
+
+        # 环形缓冲区：(手, 容量, 2) 位置，(手, 容量) 时间戳
+        self.capacity = capacity
+        self.positions = np.zeros((max_hands, capacity, 2), dtype=np.float32)
+        self.timestamps = np.full((max_hands, capacity), -np.inf, dtype=np.float64)
+        self.heads = np.zeros(max_hands, dtype=np.int64)
+        self.cooldown_until = np.zeros(max_hands, dtype=np.float64)
+        self.buffer_ids = np.full(max_hands, -1, dtype=np.int64)  # 各缓冲区所属的手部ID
+        self.hand_count = 0
+
+        # 计数器
+        self.matches = 0
+        self.recognized = 0
+
+    def set_templates(self, templates, names):
+        """
+        设置匹配模板，同名手势的模板排在一起，便于按手势一次取最小代价
+
+        @param {numpy.ndarray} templates - (模板数, 点数, 2) 归一化轨迹
+        @param {list} names - 各模板的手势名称
+        """
+        self.gesture_names = list(dict.fromkeys(names))
+        labels = np.array([self.gesture_names.index(name) for name in names])
+        order = np.argsort(labels, kind='stable')
+        self.templates = np.ascontiguousarray(templates[order], dtype=np.float32)
+        self.template_starts = np.searchsorted(labels[order], np.arange(len(self.gesture_names)))
+        self.gesture_straightness = np.array([path_straightness(self.templates[start]) for start in self.template_starts])
+
+    def update(self, hand_frame, aspect=1.0, timestamp=None, hand_ids=None):
+        """
+        记录一帧各手的位置并识别动态手势
+
+        @param {HandFrame} hand_frame - 当前帧的手部关键点
+        @param {float} aspect - 图像宽高比，X坐标乘以该值后与Y同一单位
+        @param {float|None} timestamp - 帧时间（秒），默认当前单调时间
+        @param {numpy.ndarray|None} hand_ids - 各手的稳定ID，提供时每个ID固定使用一个缓冲区，手的顺序变化不影响轨迹
+        @returns {list} 本帧识别到的动态手势名称
+        """
+        if not self.enabled:
+            return []
+        count = min(len(hand_frame), len(self.positions))
+        buffers = self._assign_buffers(count, hand_ids)
+        if not count:
+            return []
+
+        now = time.monotonic() if timestamp is None else timestamp
+        slots = self.heads[buffers] % self.capacity
+        self.positions[buffers, slots, 0] = hand_frame.landmarks[:count, INDEX_FINGER_TIP, 0] * aspect
+        self.positions[buffers, slots, 1] = hand_frame.landmarks[:count, INDEX_FINGER_TIP, 1]
+        self.timestamps[buffers, slots] = now
+        self.heads[buffers] += 1
+
+        # 取各手时间窗口内、移动幅度足够且不在冷却中的轨迹
+        candidates = []
+        queries = []
+        straightness = []
+        for hand in buffers:
+            if now < self.cooldown_until[hand]:
+                continue
+            order = (np.arange(self.heads[hand] - self.capacity, self.heads[hand]) % self.capacity)
+            recent = self.timestamps[hand, order] >= now - self.window
+            if recent.sum() < 6:
+                continue
+            path = self.positions[hand, order[recent]]
+            if (path.max(axis=0) - path.min(axis=0)).max() < self.min_extent:
+                continue
+            resampled = resample_path(path, self.samples)
+            candidates.append(hand)
+            queries.append(normalize_path(resampled))
+            straightness.append(path_straightness(resampled))
+        if not candidates:
+            return []
+
+        costs = batched_dtw(np.stack(queries), self.templates, self.dtw_index)
+        self.matches += len(candidates)
+
+        # 每种手势取其所有模板中的最小代价
+        gesture_costs = np.minimum.reduceat(costs, self.template_starts, axis=1)
+        mismatched = np.abs(np.array(straightness)[:, None] - self.gesture_straightness[None, :]) > self.straightness_tolerance
+        gesture_costs[mismatched] = np.inf
+        ranked = np.sort(gesture_costs, axis=1)
+        best = gesture_costs.argmin(axis=1)
+
+        gestures = []
+        for i, hand in enumerate(candidates):
+            cost = float(ranked[i, 0])
+            if not cost <= self.max_cost or (ranked.shape[1] > 1 and cost > self.margin * ranked[i, 1]):
+                continue
+            name = self.gesture_names[best[i]]
+            if name not in gestures:
+                gestures.append(name)
+            # 识别后清空该手轨迹，避免同一段动作重复触发
+            self.timestamps[hand].fill(-np.inf)
+            self.cooldown_until[hand] = now + self.cooldown
+            self.recognized += 1
+            logger.info(f"检测到动态手势 {name}，DTW代价 {cost:.3f}")
+        return gestures
+
+    def _assign_buffers(self, count, hand_ids):
+        """
+        为当前帧的各手分配轨迹缓冲区
+
+        @param {int} count - 手数
+        @param {numpy.ndarray|None} hand_ids - 各手的稳定ID
+        @returns {numpy.ndarray} 各手使用的缓冲区编号
+        """
+        if hand_ids is None:
+            if count != self.hand_count:
+                # 没有稳定ID时，手数变化后各手的对应关系不可靠，清空轨迹
+                self.reset()
+                self.hand_count = count
+            return np.arange(count)
+
+        hand_ids = np.asarray(hand_ids[:count])
+        # 释放已离开的手占用的缓冲区
+        self.buffer_ids[~np.isin(self.buffer_ids, hand_ids)] = -1
+        buffers = np.empty(count, dtype=np.int64)
+        for i, hand_id in enumerate(hand_ids):
+            owned = np.flatnonzero(self.buffer_ids == hand_id)
+            if len(owned):
+                buffers[i] = owned[0]
+                continue
+            free = int(np.flatnonzero(self.buffer_ids == -1)[0])
+            self.buffer_ids[free] = hand_id
+            self.timestamps[free].fill(-np.inf)
+            self.cooldown_until[free] = 0.0
+            buffers[i] = free
+        return buffers
+
+    def reset(self):
+        """
+        清空所有轨迹
+        """
+        self.timestamps.fill(-np.inf)
+        self.buffer_ids.fill(-1)
+        self.hand_count = 0
+
+    def get_stats(self):
+        """
+        获取动态手势统计数据
+
+        @returns {dict} 匹配次数和识别次数
+        """
+        return {
+            'enabled': self.enabled,
+            'templates': len(self.templates),
+            'matches': self.matches,
+            'recognized': self.recognized
+        }
@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+import logging
+import os
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.frame_source import parse_size
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/preprocess_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("preprocess")
+
+class PreparedFrame:
+    """
+    一帧的预处理结果，手势识别和面部识别共用
+
+    推理用的RGB图在第一次访问时计算并写入预处理器的预分配缓冲区，
+    之后同一帧的所有访问都直接复用；下一帧 prepare 之后旧结果失效
+    """
+    def __init__(self, preprocessor, bgr):
+        """
+        @param {FramePreprocessor} preprocessor - 所属预处理器
+        @param {numpy.ndarray} bgr - 原始BGR帧
+        """
+        self.bgr = bgr
+        self._preprocessor = preprocessor
+        self._inference_rgb = None
+
+    @property
+    def inference_rgb(self):
+        """
+        @returns {numpy.ndarray} 送入MediaPipe的RGB图（可能已缩小）
+        """
+        if self._inference_rgb is None:
+            self._inference_rgb = self._preprocessor._convert(self.bgr)
+        return self._inference_rgb
+
+class FramePreprocessor:
+    """
+    帧预处理器，每帧只做一次颜色转换（和缩放），结果写入预分配缓冲区
+
+    每个处理循环持有一个预处理器
+    """
+    def __init__(self, inference_size=None):
+        """
+        @param {tuple|None} inference_size - 推理分辨率 (宽, 高)，默认读取 INFERENCE_SIZE，都未设置时使用原始分辨率
+        """
+        if inference_size is None:
+            inference_size = parse_size(os.environ.get('INFERENCE_SIZE'))
+        self.inference_size = tuple(inference_size) if inference_size else None
+        self.rgb = None
+        self.small = None
+        self.conversions = 0
+
+    def prepare(self, frame):
+        """
+        为一帧创建预处理结果
+
+        @param {numpy.ndarray} frame - BGR视频帧
+        @returns {PreparedFrame} 预处理结果
+        """
+        return PreparedFrame(self, frame)
+
+    def _convert(self, bgr):
+        """
+        BGR转RGB（需要时先缩小），写入预分配缓冲区
+
+        @param {numpy.ndarray} bgr - BGR视频帧
+        @returns {numpy.ndarray} RGB图
+        """
+        self.conversions += 1
+        height, width = bgr.shape[:2]
+        if self.inference_size is None or self.inference_size == (width, height):
+            self.rgb = self._ensure(self.rgb, (height, width, 3))
+            cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=self.rgb)
+            return self.rgb
+
+        # 先缩小再转换颜色，只处理小图的像素
+        target_width, target_height = self.inference_size
+        self.small = self._ensure(self.small, (target_height, target_width, 3))
+        self.rgb = self._ensure(self.rgb, (target_height, target_width, 3))
+        cv2.resize(bgr, self.inference_size, dst=self.small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        return self.rgb
+
+    @staticmethod
+    def _ensure(buffer, shape):
+        """
+        形状不符时重新分配缓冲区
+
+        @param {numpy.ndarray|None} buffer - 现有缓冲区
+        @param {tuple} shape - 需要的形状
+        @returns {numpy.ndarray} 缓冲区
+        """
+        if buffer is None or buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+        return buffer
+
+class FrameContext:
+    """
+    流水线槽位的帧上下文
+
+    持有一个可复用的标注缓冲区和预处理器：每帧开始时把原始帧复制（或缩放到输出分辨率）进标注缓冲区一次，
+    之后手势标注、面部标注、特效和画布叠加都直接在该缓冲区上原地绘制。
+    关键点都是归一化坐标，标注时按标注缓冲区的尺寸换算，推理分辨率和输出分辨率可以各自独立设置
+    """
+    def __init__(self, inference_size=None, output_size=None):
+        """
+        @param {tuple|None} inference_size - 推理分辨率 (宽, 高)，默认读取 INFERENCE_SIZE，都未设置时使用原始分辨率
+        @param {tuple|None} output_size - 输出（显示）分辨率 (宽, 高)，默认读取 OUTPUT_SIZE，都未设置时使用原始分辨率
+        """
+        if output_size is None:
+            output_size = parse_size(os.environ.get('OUTPUT_SIZE'))
+        self.preprocessor = FramePreprocessor(inference_size)
+        self.output_size = tuple(output_size) if output_size else None
+        self.annotated = None
+        self.frame = None
+        self.prepared = None
+
+    def begin(self, frame):
+        """
+        开始处理新的一帧
+
+        @param {numpy.ndarray} frame - 原始BGR帧（可以是只读视图）
+        @returns {FrameContext} 自身
+        """
+        height, width = frame.shape[:2]
+        if self.output_size is None or self.output_size == (width, height):
+            self.annotated = FramePreprocessor._ensure(self.annotated, frame.shape)
+            np.copyto(self.annotated, frame)
+        else:
+            output_width, output_height = self.output_size
+            self.annotated = FramePreprocessor._ensure(self.annotated, (output_height, output_width) + frame.shape[2:])
+            interpolation = cv2.INTER_AREA if output_width < width else cv2.INTER_LINEAR
+            cv2.resize(frame, self.output_size, dst=self.annotated, interpolation=interpolation)
+        self.frame = frame
+        self.prepared = self.preprocessor.prepare(frame)
+        return self
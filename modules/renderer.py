@@ -0,0 +1,149 @@
+import cv2
+import numpy as np
+import os
+import mediapipe as mp
+
+# 面部网格的细节级别
+FACE_DETAIL_TESSELATION = 'tesselation'
+FACE_DETAIL_CONTOURS = 'contours'
+FACE_DETAIL_NONE = 'none'
+
+# 取不到MediaPipe默认样式时使用的样式 (颜色, 线宽/半径)
+FALLBACK_CONNECTION_STYLE = ((224, 224, 224), 2)
+FALLBACK_LANDMARK_STYLE = ((0, 0, 255), 4)
+WHITE_COLOR = (224, 224, 224)
+
+def _group_connections(connections, styles):
+    """
+    按 (颜色, 线宽) 将连线分组，每组一个 (连线数, 2) 索引数组
+
+    @param {iterable} connections - 关键点索引对
+    @param {dict|None} styles - 连线到 DrawingSpec 的映射
+    @returns {list} [(颜色, 线宽, 索引数组)]
+    """
+    groups = {}
+    for connection in sorted(connections):
+        spec = styles.get(connection) if styles else None
+        key = (tuple(spec.color), spec.thickness) if spec is not None else FALLBACK_CONNECTION_STYLE
+        groups.setdefault(key, []).append(connection)
+    return [(color, thickness, np.array(pairs, dtype=np.int32)) for (color, thickness), pairs in groups.items()]
+
+def _dot_stroke(points):
+    """
+    把点复制为首尾相同的两点折线，配合粗线宽一次 polylines 调用画出所有实心圆点
+
+    @param {numpy.ndarray} points - (点数, 2) 像素坐标
+    @returns {numpy.ndarray} (点数, 2, 2)
+    """
+    return np.repeat(points[:, None, :], 2, axis=1)
+
+class HandRenderer:
+    """
+    手部关键点渲染器
+
+    MediaPipe 默认样式在创建时只读取一次，连线按颜色和线宽分组为索引数组，
+    绘制时每组连线一次 cv2.polylines；实心圆点用线宽 2r-1 的单点折线同样批量绘制，
+    与 cv2.circle 的实心圆像素一致
+    """
+    def __init__(self):
+        styles = mp.solutions.drawing_styles
+        try:
+            landmark_styles = styles.get_default_hand_landmarks_style()
+            connection_styles = styles.get_default_hand_connections_style()
+        except Exception:
+            landmark_styles = connection_styles = None
+
+        self.connection_groups = _group_connections(mp.solutions.hands.HAND_CONNECTIONS, connection_styles)
+
+        # 关键点按 (颜色, 半径, 线宽) 分组；与 draw_landmarks 一致，先画白色描边再画彩色圆点
+        groups = {}
+        for index in range(21):
+            spec = landmark_styles.get(index) if landmark_styles else None
+            if spec is None:
+                color, radius = FALLBACK_LANDMARK_STYLE
+                key = (None, color, radius, -1)
+            else:
+                border = max(spec.circle_radius + 1, int(spec.circle_radius * 1.2))
+                key = (border, tuple(spec.color), spec.circle_radius, spec.thickness)
+            groups.setdefault(key, []).append(index)
+        self.landmark_groups = [(key, np.array(indices, dtype=np.int32)) for key, indices in groups.items()]
+
+    def draw(self, image, pixels):
+        """
+        绘制一组手的关键点和连线
+
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {numpy.ndarray} pixels - (手数, 21, 2) 或 (21, 2) int32 像素坐标
+        """
+        pixels = np.asarray(pixels, dtype=np.int32).reshape(-1, 21, 2)
+        if not len(pixels):
+            return image
+
+        for color, thickness, index in self.connection_groups:
+            cv2.polylines(image, pixels[:, index].reshape(-1, 2, 2), False, color, thickness)
+
+        for (border, color, radius, thickness), index in self.landmark_groups:
+            points = pixels[:, index].reshape(-1, 2)
+            if thickness is not None and thickness < 0:
+                if border is not None:
+                    cv2.polylines(image, _dot_stroke(points), False, WHITE_COLOR, 2 * border - 1)
+                cv2.polylines(image, _dot_stroke(points), False, color, 2 * radius - 1)
+            else:
+                # 空心圆无法用折线批量绘制，逐点绘制
+                for x, y in points:
+                    cv2.circle(image, (int(x), int(y)), border, WHITE_COLOR, thickness)
+                    cv2.circle(image, (int(x), int(y)), radius, color, thickness)
+        return image
+
+class FaceRenderer:
+    """
+    面部网格渲染器
+
+    连线索引数组只在创建时构建一次，每张脸的所有连线一次 cv2.polylines 绘制；
+    细节级别可选完整网格（约2500条连线）、只画轮廓（眼睛、眉毛、嘴唇、脸廓）或不绘制
+    """
+    def __init__(self, detail=None, color=(0, 255, 0), thickness=1):
+        """
+        @param {str|None} detail - 细节级别 tesselation/contours/none，默认读取 FACE_MESH_DETAIL
+        @param {tuple} color - 连线颜色 (B, G, R)
+        @param {int} thickness - 线宽
+        """
+        if detail is None:
+            detail = os.environ.get('FACE_MESH_DETAIL', FACE_DETAIL_TESSELATION)
+        self.color = color
+        self.thickness = thickness
+        self.set_detail(detail)
+
+    def set_detail(self, detail):
+        """
+        切换细节级别
+
+        @param {str} detail - tesselation/contours/none
+        @returns {str} 实际使用的细节级别
+        """
+        face_mesh = mp.solutions.face_mesh
+        if detail == FACE_DETAIL_CONTOURS:
+            connections = face_mesh.FACEMESH_CONTOURS
+        elif detail == FACE_DETAIL_NONE:
+            connections = ()
+        else:
+            detail = FACE_DETAIL_TESSELATION
+            connections = face_mesh.FACEMESH_TESSELATION
+        self.detail = detail
+        self.connection_index = np.array(sorted(connections), dtype=np.int32).reshape(-1, 2)
+        return detail
+
+    def draw(self, image, pixels):
+        """
+        绘制一张或多张脸的网格
+
+        @param {numpy.ndarray} image - 可写的BGR图像
+        @param {numpy.ndarray} pixels - (脸数, 468, 2) 或 (468, 2) int32 像素坐标
+        """
+        if not len(self.connection_index):
+            return image
+        pixels = np.asarray(pixels, dtype=np.int32)
+        if pixels.ndim == 2:
+            pixels = pixels[None]
+        cv2.polylines(image, pixels[:, self.connection_index].reshape(-1, 2, 2), False, self.color, self.thickness)
+        return image
@@ -0,0 +1,187 @@
+import numpy as np
+import logging
+import os
+from datetime import datetime
+from rich.logging import RichHandler
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/roi_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("roi")
+
+class RoiCropper:
+    """
+    感兴趣区域裁剪器
+
+    根据上一次结果中各目标的关键点包围盒（加边距后取并集）裁剪下一帧的推理输入，
+    推理得到的关键点再映射回整帧坐标；每隔一段帧数或目标丢失时回到整帧搜索。
+    区域坐标均为归一化坐标，因此与推理图的分辨率无关
+    """
+    def __init__(self, env_prefix='HAND_ROI', padding=None, full_interval=None, enabled=None,
+                 min_size=0.25, max_area=0.7):
+        """
+        @param {str} env_prefix - 环境变量前缀，读取 <前缀>_ENABLED、<前缀>_PADDING、<前缀>_FULL_INTERVAL
+        @param {float|None} padding - 包围盒每边扩展的比例（相对包围盒长边）
+        @param {int|None} full_interval - 每隔多少帧强制整帧搜索一次
+        @param {bool|None} enabled - 是否启用
+        @param {float} min_size - 裁剪区域的最小宽高（相对整帧）
+        @param {float} max_area - 裁剪区域面积超过整帧的该比例时直接使用整帧
+        """
+        if enabled is None:
+            enabled = os.environ.get(f'{env_prefix}_ENABLED', '0') in ('1', 'true', 'True')
+        if padding is None:
+            padding = float(os.environ.get(f'{env_prefix}_PADDING', 0.5))
+        if full_interval is None:
+            full_interval = int(os.environ.get(f'{env_prefix}_FULL_INTERVAL', 15))
+
+        self.enabled = enabled
+        self.padding = padding
+        self.full_interval = max(1, full_interval)
+        self.min_size = min_size
+        self.max_area = max_area
+
+        self.roi = None  # 下一帧的裁剪区域 (x0, y0, x1, y1)，None表示整帧
+        self.frames_since_full = 0
+        self.crop_buffer = None
+
+        # 计数器
+        self.crop_frames = 0
+        self.full_frames = 0
+        self.pixel_ratio_sum = 0.0
+
+    def begin(self, image):
+        """
+        为当前帧选择推理输入
+
+        @param {numpy.ndarray} image - 推理用的整帧图像
+        @returns {tuple} (推理输入图像, 实际裁剪区域 (x, y, 宽, 高) 的归一化坐标，整帧时为None)
+        """
+        if not self.enabled or self.roi is None or self.frames_since_full + 1 >= self.full_interval:
+            return self.full(image), None
+
+        height, width = image.shape[:2]
+        x0 = int(self.roi[0] * width)
+        y0 = int(self.roi[1] * height)
+        x1 = min(width, int(np.ceil(self.roi[2] * width)))
+        y1 = min(height, int(np.ceil(self.roi[3] * height)))
+
+        # 复制到连续的预分配缓冲区
+        shape = (y1 - y0, x1 - x0) + image.shape[2:]
+        if self.crop_buffer is None or self.crop_buffer.shape != shape:
+            self.crop_buffer = np.empty(shape, dtype=image.dtype)
+        np.copyto(self.crop_buffer, image[y0:y1, x0:x1])
+
+        self.frames_since_full += 1
+        self.crop_frames += 1
+        self.pixel_ratio_sum += (shape[0] * shape[1]) / (height * width)
+        return self.crop_buffer, (x0 / width, y0 / height, (x1 - x0) / width, (y1 - y0) / height)
+
+    def full(self, image):
+        """
+        当前帧使用整帧搜索
+
+        @param {numpy.ndarray} image - 推理用的整帧图像
+        @returns {numpy.ndarray} 同一个图像
+        """
+        self.frames_since_full = 0
+        self.full_frames += 1
+        self.pixel_ratio_sum += 1.0
+        return image
+
+    @staticmethod
+    def map_landmarks(landmarks, rect):
+        """
+        将裁剪图上的归一化关键点映射回整帧归一化坐标
+
+        @param {numpy.ndarray} landmarks - (目标数, 关键点数, 3) 裁剪图上的归一化坐标
+        @param {tuple} rect - begin 返回的裁剪区域 (x, y, 宽, 高)
+        @returns {numpy.ndarray} 整帧上的归一化坐标（新数组）
+        """
+        x, y, w, h = rect
+        mapped = landmarks.copy()
+        mapped[..., 0] = x + landmarks[..., 0] * w
+        mapped[..., 1] = y + landmarks[..., 1] * h
+        # 深度与图像宽度成比例
+        mapped[..., 2] = landmarks[..., 2] * w
+        return mapped
+
+    def update(self, landmarks):
+        """
+        根据当前帧的整帧关键点计算下一帧的裁剪区域
+
+        @param {numpy.ndarray} landmarks - (目标数, 关键点数, 3) 整帧归一化坐标
+        """
+        if not self.enabled:
+            return
+        if not len(landmarks):
+            # 目标丢失，下一帧整帧搜索
+            self.roi = None
+            return
+
+        xy = landmarks[:, :, :2]
+        mins = xy.min(axis=1)
+        maxs = xy.max(axis=1)
+        pad = (maxs - mins).max(axis=1, keepdims=True) * self.padding
+        needed = np.concatenate([(mins - pad).min(axis=0), (maxs + pad).max(axis=0)])
+
+        # 滞回：当前区域仍能覆盖且不过大时保持不变，避免裁剪区域逐帧抖动
+        if self.roi is not None:
+            current = self.roi
+            contains = current[0] <= needed[0] and current[1] <= needed[1] and current[2] >= needed[2] and current[3] >= needed[3]
+            if contains and self._area(current) <= 2.0 * self._area(needed):
+                return
+
+        # 新区域每边再留出10%的余量，目标小幅移动时不必更换区域
+        slack = (needed[2:] - needed[:2]) * 0.1
+        self.roi = self._fit(np.concatenate([needed[:2] - slack, needed[2:] + slack]))
+
+    def _fit(self, box):
+        """
+        将区域扩展到最小尺寸并限制在画面内，面积过大时返回None（使用整帧）
+
+        @param {numpy.ndarray} box - (x0, y0, x1, y1)
+        @returns {tuple|None} 调整后的区域
+        """
+        center = (box[:2] + box[2:]) / 2
+        size = np.maximum(box[2:] - box[:2], self.min_size)
+        size = np.minimum(size, 1.0)
+        x0, y0 = np.clip(center - size / 2, 0.0, 1.0 - size)
+        x1, y1 = x0 + size[0], y0 + size[1]
+        box = (float(x0), float(y0), float(x1), float(y1))
+        if self._area(box) > self.max_area:
+            return None
+        return box
+
+    @staticmethod
+    def _area(box):
+        return (box[2] - box[0]) * (box[3] - box[1])
+
+    def reset(self):
+        """
+        清除裁剪区域，下一帧整帧搜索
+        """
+        self.roi = None
+
+    def get_stats(self):
+        """
+        获取裁剪统计数据
+
+        @returns {dict} 裁剪帧数、整帧搜索帧数和平均推理像素比例
+        """
+        frames = self.crop_frames + self.full_frames
+        return {
+            'enabled': self.enabled,
+            'crop_frames': self.crop_frames,
+            'full_frames': self.full_frames,
+            'pixel_ratio': round(self.pixel_ratio_sum / frames, 3) if frames else 1.0
+        }
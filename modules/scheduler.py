@@ -0,0 +1,288 @@
+import numpy as np
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from rich.logging import RichHandler
+from modules.hand_frame import HandFrame
+from modules.face_frame import empty_faces
+from modules.preprocess import FramePreprocessor
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/scheduler_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("scheduler")
+
+def create_inference_scheduler(get_camera, get_gesture_recognizer, get_face_recognizer, face_enabled=False):
+    """
+    根据环境变量创建并启动推理调度器
+
+    @param {callable} get_camera - 返回当前摄像头的函数
+    @param {callable} get_gesture_recognizer - 返回当前手势识别器的函数
+    @param {callable} get_face_recognizer - 返回当前面部识别器的函数
+    @param {bool} face_enabled - 面部检测是否开启
+    @returns {InferenceScheduler|None} 调度器，INFERENCE_SCHEDULER 未开启时返回None
+    """
+    if os.environ.get('INFERENCE_SCHEDULER', '0') not in ('1', 'true', 'True'):
+        return None
+    scheduler = InferenceScheduler(get_camera, get_gesture_recognizer, get_face_recognizer)
+    scheduler.set_face_enabled(face_enabled)
+    scheduler.start()
+    return scheduler
+
+class InferenceStage:
+    """
+    一个推理阶段：独立线程按目标频率从摄像头取最新帧运行检测，只保留最新结果
+
+    MediaPipe 执行计算图时释放GIL，手部和面部两个阶段可以真正并行。
+    摄像头每次循环通过 get_camera 重新获取，摄像头对象被重新创建后自动切换并丢弃旧结果
+    """
+    def __init__(self, name, get_camera, detect, empty, rate, enabled=True, window=120):
+        """
+        @param {str} name - 阶段名称
+        @param {callable} get_camera - 返回当前摄像头的函数
+        @param {callable} detect - 检测函数 detect(frame, prepared) -> 结果
+        @param {callable} empty - 返回空结果的函数，还没有结果或阶段关闭时使用
+        @param {float} rate - 目标频率（Hz）
+        @param {bool} enabled - 是否开启
+        @param {int} window - 耗时统计保留的最近次数
+        """
+        self.name = name
+        self.get_camera = get_camera
+        self.detect = detect
+        self.empty = empty
+        self.rate = max(0.1, float(rate))
+        self.enabled = enabled
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()  # 开启或停止时唤醒线程
+        self.running = False
+        self.thread = None
+
+        self.result = empty()
+        self.result_seq = None
+        self.result_timestamp = None
+
+        self.runs = 0
+        self.inference_ms = deque(maxlen=window)
+        self.run_times = deque(maxlen=window)
+
+    def start(self):
+        """
+        启动推理线程
+        """
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name=f"inference-{self.name}", daemon=True)
+        self.thread.start()
+        logger.info(f"推理阶段 {self.name} 已启动，目标频率 {self.rate:g} Hz")
+
+    def stop(self):
+        """
+        停止推理线程并等待退出
+        """
+        self.running = False
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def set_enabled(self, enabled):
+        """
+        开启或关闭阶段，关闭时清除旧结果，重新开启后不会交付过期的结果
+
+        @param {bool} enabled - 是否开启
+        """
+        self.enabled = bool(enabled)
+        if not self.enabled:
+            self._clear()
+        self.wake.set()
+
+    def _clear(self):
+        """
+        清除最新结果
+        """
+        with self.lock:
+            self.result = self.empty()
+            self.result_seq = None
+            self.result_timestamp = None
+
+    def latest(self):
+        """
+        @returns {tuple} (最新结果, 结果对应的帧序号, 捕获时间戳)
+        """
+        with self.lock:
+            return self.result, self.result_seq, self.result_timestamp
+
+    def _loop(self):
+        """
+        推理线程主循环：等到下一个周期后取最新帧检测，处理慢于周期时不累积补跑
+        """
+        preprocessor = FramePreprocessor()  # 每个线程独立的预处理缓冲区
+        period = 1.0 / self.rate
+        next_time = time.monotonic()
+        camera = None
+        last_seq = None
+
+        while self.running:
+            if not self.enabled:
+                self.wake.wait(0.5)
+                self.wake.clear()
+                next_time = time.monotonic()
+                continue
+
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                self.wake.wait(delay)
+                self.wake.clear()
+                continue
+
+            # 摄像头对象被重新创建后帧序号从头开始，旧摄像头的结果作废
+            current = self.get_camera()
+            if current is not camera:
+                if camera is not None:
+                    logger.info(f"推理阶段 {self.name} 切换到新的摄像头")
+                    self._clear()
+                camera = current
+                last_seq = None
+            elif last_seq is not None and camera.latest_seq < last_seq:
+                last_seq = None
+
+            handle = camera.wait_for_frame(timeout=0.5, after_seq=last_seq)
+            if handle is None:
+                if not camera.is_running:
+                    # 摄像头已停止时 wait_for_frame 立即返回，稍等再检查，避免空转
+                    self.wake.wait(0.1)
+                    self.wake.clear()
+                continue
+
+            try:
+                with handle:
+                    last_seq = handle.seq
+                    start = time.perf_counter()
+                    result = self.detect(handle.frame, preprocessor.prepare(handle.frame))
+                    elapsed = (time.perf_counter() - start) * 1000
+            except Exception as e:
+                logger.error(f"推理阶段 {self.name} 出错: {str(e)}")
+                next_time = time.monotonic() + period
+                continue
+
+            if self.enabled and self.get_camera() is camera:
+                with self.lock:
+                    self.result = result
+                    self.result_seq = handle.seq
+                    self.result_timestamp = handle.timestamp
+
+            now = time.monotonic()
+            self.runs += 1
+            self.inference_ms.append(elapsed)
+            self.run_times.append(now)
+            next_time = max(next_time + period, now)
+
+    def get_stats(self):
+        """
+        获取阶段统计数据
+
+        @returns {dict} 目标频率、实际频率、平均推理耗时（毫秒）和最新结果的时效（毫秒）
+        """
+        run_times = list(self.run_times)
+        achieved = (len(run_times) - 1) / (run_times[-1] - run_times[0]) if len(run_times) > 1 and run_times[-1] > run_times[0] else 0.0
+        _, _, timestamp = self.latest()
+        return {
+            'enabled': self.enabled,
+            'target_hz': self.rate,
+            'achieved_hz': round(achieved, 2),
+            'runs': self.runs,
+            'inference_ms': round(float(np.mean(self.inference_ms)), 2) if self.inference_ms else 0.0,
+            'result_age_ms': round((time.monotonic() - timestamp) * 1000, 2) if timestamp is not None else None
+        }
+
+class InferenceScheduler:
+    """
+    推理调度器
+
+    手部和面部检测分别在独立线程中按各自的目标频率运行，互不等待；
+    处理循环每帧取两者的最新结果合并，再交给识别、标注和发送流程。
+    摄像头和识别器都通过函数获取，重新启动摄像头（重新创建这些对象）后自动使用新的对象
+    """
+    def __init__(self, get_camera, get_gesture_recognizer, get_face_recognizer, hand_rate=None, face_rate=None):
+        """
+        @param {callable} get_camera - 返回当前摄像头的函数
+        @param {callable} get_gesture_recognizer - 返回当前手势识别器的函数，使用其 detect_hands
+        @param {callable} get_face_recognizer - 返回当前面部识别器的函数，使用其 detect_faces
+        @param {float|None} hand_rate - 手部检测目标频率（Hz），默认读取 HAND_INFERENCE_HZ
+        @param {float|None} face_rate - 面部检测目标频率（Hz），默认读取 FACE_INFERENCE_HZ
+        """
+        if hand_rate is None:
+            hand_rate = float(os.environ.get('HAND_INFERENCE_HZ', 30))
+        if face_rate is None:
+            face_rate = float(os.environ.get('FACE_INFERENCE_HZ', 10))
+
+        self.hands = InferenceStage(
+            'hands', get_camera,
+            lambda frame, prepared: get_gesture_recognizer().detect_hands(frame, prepared),
+            HandFrame.empty, hand_rate
+        )
+        self.faces = InferenceStage(
+            'faces', get_camera,
+            lambda frame, prepared: get_face_recognizer().detect_faces(frame, prepared),
+            empty_faces, face_rate, enabled=False
+        )
+
+    def start(self):
+        """
+        启动手部和面部推理线程
+        """
+        self.hands.start()
+        self.faces.start()
+
+    def stop(self):
+        """
+        停止所有推理线程
+        """
+        self.hands.stop()
+        self.faces.stop()
+        logger.info("推理调度器已停止")
+
+    def set_face_enabled(self, enabled):
+        """
+        开启或关闭面部检测线程
+
+        @param {bool} enabled - 是否开启
+        """
+        self.faces.set_enabled(enabled)
+
+    def latest(self):
+        """
+        获取两个阶段的最新结果及其对应的帧序号
+
+        同一结果会在多个输出帧上重复返回，调用方比较帧序号判断结果是否更新，
+        只有新结果才应更新身份跟踪、轨迹等跨帧状态
+
+        @returns {tuple} (HandFrame, 手部结果帧序号, (面部数, 468, 3) 面部关键点, 面部结果帧序号)，还没有结果时序号为None
+        """
+        hand_frame, hand_seq, _ = self.hands.latest()
+        faces, face_seq, _ = self.faces.latest()
+        return hand_frame, hand_seq, faces, face_seq
+
+    def get_stats(self):
+        """
+        @returns {dict} 各阶段的统计数据
+        """
+        return {
+            'hands': self.hands.get_stats(),
+            'faces': self.faces.get_stats()
+        }
@@ -0,0 +1,386 @@
+import numpy as np
+import logging
+import os
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+from rich.logging import RichHandler
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/shared_frames_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("shared_frames")
+
+# 共享内存布局：int64头部 + 按64字节对齐的帧数据
+# 头部字段：魔数、槽数、高、宽、通道数、最新帧序号、代数、保留，之后每个槽两个字段（帧序号、时间戳纳秒）
+# 发布端重新创建共享内存（如帧尺寸变化）时代数加一；关闭时把旧内存的代数置为 GENERATION_CLOSED，
+# 已连接的进程据此按名称重新连接
+MAGIC = 0x4E59534D46  # "NYSMF"
+HEADER_FIELDS = 8
+FIELD_MAGIC = 0
+FIELD_SLOTS = 1
+FIELD_HEIGHT = 2
+FIELD_WIDTH = 3
+FIELD_CHANNELS = 4
+FIELD_LATEST = 5
+FIELD_GENERATION = 6
+GENERATION_CLOSED = -1
+ALIGNMENT = 64
+
+# 本进程创建的共享内存名称，连接自己发布的缓冲区时不能取消 resource_tracker 登记
+_published_names = set()
+
+def _header_bytes(num_slots):
+    """
+    计算头部占用的字节数（按64字节对齐）
+
+    @param {int} num_slots - 槽数
+    @returns {int} 头部字节数
+    """
+    size = (HEADER_FIELDS + 2 * num_slots) * 8
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _attach(name):
+    """
+    以只连接（不负责清理）的方式打开已有共享内存
+
+    Python 3.13 之前，连接方退出时 resource_tracker 会误删共享内存，需要取消登记
+
+    @param {str} name - 共享内存名称
+    @returns {SharedMemory} 共享内存对象
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        if name in _published_names:
+            return shm
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+def _retire(shm):
+    """
+    把共享内存标记为已关闭，仍连接着它的进程会按名称重新连接
+
+    @param {SharedMemory} shm - 共享内存对象
+    """
+    if shm.size < HEADER_FIELDS * 8:
+        return
+    header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+    if int(header[FIELD_MAGIC]) == MAGIC:
+        header[FIELD_GENERATION] = GENERATION_CLOSED
+    del header
+
+class SharedFrameRing:
+    """
+    共享内存中的帧环形缓冲区视图，发布端和连接端共用同一套布局
+    """
+    def __init__(self, shm, num_slots, shape):
+        """
+        @param {SharedMemory} shm - 共享内存对象
+        @param {int} num_slots - 槽数
+        @param {tuple} shape - 帧形状 (高, 宽, 通道)
+        """
+        self.shm = shm
+        self.num_slots = num_slots
+        self.shape = tuple(shape)
+        self.header = np.ndarray((HEADER_FIELDS + 2 * num_slots,), dtype=np.int64, buffer=shm.buf)
+        self.slot_seqs = self.header[HEADER_FIELDS::2]
+        self.slot_timestamps = self.header[HEADER_FIELDS + 1::2]
+        self.frames = np.ndarray(
+            (num_slots,) + self.shape, dtype=np.uint8,
+            buffer=shm.buf, offset=_header_bytes(num_slots)
+        )
+
+    @property
+    def latest_seq(self):
+        return int(self.header[FIELD_LATEST])
+
+    @property
+    def generation(self):
+        return int(self.header[FIELD_GENERATION])
+
+    def release_views(self):
+        """
+        释放对共享内存缓冲区的引用，关闭共享内存前必须调用
+        """
+        self.header = None
+        self.slot_seqs = None
+        self.slot_timestamps = None
+        self.frames = None
+
+class SharedFramePublisher:
+    """
+    共享内存帧发布端，由持有摄像头的进程创建
+
+    帧按序号轮流写入 N 个槽，写入期间槽序号置0，写完后更新槽序号、时间戳和最新帧序号
+    """
+    def __init__(self, name, shape, num_slots=8, generation=1):
+        """
+        @param {str} name - 共享内存名称
+        @param {tuple} shape - 帧形状 (高, 宽, 通道)
+        @param {int} num_slots - 槽数，决定连接端持有视图的最长有效时间
+        @param {int} generation - 代数，同名共享内存每次重新创建时加一
+        """
+        self.name = name
+        self.num_slots = max(2, num_slots)
+        size = _header_bytes(self.num_slots) + self.num_slots * int(np.prod(shape))
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # 上次异常退出遗留的共享内存
+            logger.warning(f"共享内存 {name} 已存在，重新创建")
+            stale = shared_memory.SharedMemory(name=name)
+            _retire(stale)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        _published_names.add(name)
+        self.ring = SharedFrameRing(self.shm, self.num_slots, shape)
+        self.ring.header[:] = 0
+        self.ring.header[FIELD_SLOTS] = self.num_slots
+        self.ring.header[FIELD_HEIGHT:FIELD_CHANNELS + 1] = shape
+        self.ring.header[FIELD_GENERATION] = max(1, generation)
+        self.ring.header[FIELD_MAGIC] = MAGIC
+        logger.info(f"共享内存帧发布端已创建: {name}, {self.num_slots} x {tuple(shape)}")
+
+    @property
+    def shape(self):
+        return self.ring.shape
+
+    @property
+    def generation(self):
+        return self.ring.generation
+
+    def begin_write(self):
+        """
+        开始写入下一帧
+
+        @returns {tuple} (槽索引, 可写的帧视图)
+        """
+        seq = self.ring.latest_seq + 1
+        slot = seq % self.num_slots
+        self.ring.slot_seqs[slot] = 0
+        return slot, self.ring.frames[slot]
+
+    def commit(self, slot, timestamp):
+        """
+        完成写入并发布
+
+        @param {int} slot - begin_write 返回的槽索引
+        @param {float} timestamp - 捕获时间戳（time.monotonic）
+        """
+        seq = self.ring.latest_seq + 1
+        self.ring.slot_timestamps[slot] = int(timestamp * 1e9)
+        self.ring.slot_seqs[slot] = seq
+        self.ring.header[FIELD_LATEST] = seq
+
+    def publish(self, frame, timestamp):
+        """
+        复制一帧到共享内存并发布
+
+        @param {numpy.ndarray} frame - 视频帧，形状必须与创建时一致
+        @param {float} timestamp - 捕获时间戳（time.monotonic）
+        """
+        slot, view = self.begin_write()
+        np.copyto(view, frame)
+        self.commit(slot, timestamp)
+
+    def close(self):
+        """
+        关闭并删除共享内存，已连接的进程通过代数得知需要重新连接
+        """
+        self.ring.header[FIELD_GENERATION] = GENERATION_CLOSED
+        self.ring.release_views()
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning(f"仍有帧视图引用共享内存 {self.name}，将在进程退出时释放")
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+        _published_names.discard(self.name)
+        logger.info(f"共享内存帧发布端已关闭: {self.name}")
+
+class SharedFrameHandle:
+    """
+    共享内存中一帧的只读视图
+
+    发布端不会等待连接端，视图所在槽在 num_slots 帧之后会被覆盖；
+    对结果有一致性要求时应在使用后调用 is_valid() 确认
+    """
+    def __init__(self, ring, slot, seq, timestamp, frame):
+        self.frame = frame
+        self.seq = seq
+        self.timestamp = timestamp
+        self._ring = ring
+        self._slot = slot
+
+    def is_valid(self):
+        """
+        @returns {bool} 视图所在槽是否仍是该帧（未被覆盖）
+        """
+        return self._ring.slot_seqs is not None and int(self._ring.slot_seqs[self._slot]) == self.seq
+
+    def release(self):
+        """
+        与 FrameHandle 接口保持一致，共享内存视图无需归还
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+class SharedFrameClient:
+    """
+    共享内存帧连接端，可在任意进程中读取发布端的帧
+
+    发布端重新创建同名共享内存（帧尺寸变化或守护进程重启）后，旧内存的代数被置为已关闭，
+    连接端在下一次读取时自动按名称重新连接，新内存的帧序号从头开始
+    """
+    def __init__(self, name, retry_interval=0.1):
+        """
+        @param {str} name - 共享内存名称
+        @param {float} retry_interval - 新的共享内存尚未创建时重新连接的间隔（秒）
+        """
+        self.name = name
+        self.retry_interval = retry_interval
+        self.retry_at = 0.0
+        self.shm = None
+        self.ring = None
+        self.generation = None
+        self.reattached = False  # 重新连接后还没有读到新内存的帧
+        self._connect()
+
+    def _connect(self):
+        """
+        连接共享内存并读取布局
+
+        @raises {FileNotFoundError} 共享内存不存在
+        @raises {ValueError} 共享内存不是帧缓冲区或已关闭
+        """
+        shm = _attach(self.name)
+        header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        if int(header[FIELD_MAGIC]) != MAGIC or int(header[FIELD_GENERATION]) == GENERATION_CLOSED:
+            closed = int(header[FIELD_MAGIC]) == MAGIC
+            del header
+            shm.close()
+            raise ValueError(f"共享内存 {self.name} {'已关闭' if closed else '不是帧缓冲区'}")
+        num_slots = int(header[FIELD_SLOTS])
+        shape = tuple(int(v) for v in header[FIELD_HEIGHT:FIELD_CHANNELS + 1])
+        del header
+        self.shm = shm
+        self.ring = SharedFrameRing(shm, num_slots, shape)
+        self.generation = self.ring.generation
+        logger.info(f"已连接共享内存帧缓冲区: {self.name}, {num_slots} x {shape}，代数 {self.generation}")
+
+    def _check_generation(self):
+        """
+        代数变化时断开旧内存并重新连接
+
+        @returns {bool} 当前是否连接着有效的共享内存
+        """
+        if self.ring.generation == self.generation:
+            return True
+        now = time.monotonic()
+        if now < self.retry_at:
+            return False
+        self.retry_at = now + self.retry_interval
+
+        old_shm, old_ring = self.shm, self.ring
+        try:
+            self._connect()
+        except (FileNotFoundError, ValueError):
+            # 发布端还没有创建新的共享内存，保留旧连接稍后重试
+            return False
+        old_ring.release_views()
+        try:
+            old_shm.close()
+        except BufferError:
+            logger.warning(f"仍有帧视图引用旧的共享内存 {self.name}，将在进程退出时释放")
+        self.reattached = True
+        return True
+
+    @property
+    def latest_seq(self):
+        return self.ring.latest_seq
+
+    @property
+    def shape(self):
+        return self.ring.shape
+
+    def get_frame(self, after_seq=None):
+        """
+        获取最新帧的只读视图
+
+        重新连接后新内存的帧序号从头开始，第一次读取时忽略 after_seq
+
+        @param {int|None} after_seq - 只返回序号大于该值的帧
+        @returns {SharedFrameHandle|None} 帧句柄，没有（新）帧时返回None
+        """
+        if not self._check_generation():
+            return None
+        if self.reattached:
+            after_seq = None
+        seq = self.ring.latest_seq
+        if seq <= 0 or (after_seq is not None and seq <= after_seq):
+            return None
+        slot = seq % self.ring.num_slots
+        if int(self.ring.slot_seqs[slot]) != seq:
+            # 发布端已开始覆盖该槽（连接端落后整整一圈），放弃这一帧
+            return None
+        self.reattached = False
+        timestamp = int(self.ring.slot_timestamps[slot]) / 1e9
+        frame = self.ring.frames[slot].view()
+        frame.flags.writeable = False
+        return SharedFrameHandle(self.ring, slot, seq, timestamp, frame)
+
+    def wait_for_frame(self, timeout=None, after_seq=None, poll_interval=0.001):
+        """
+        等待序号大于 after_seq 的新帧
+
+        跨进程没有条件变量可用，这里以很短的间隔轮询头部中的最新帧序号
+
+        @param {float|None} timeout - 最长等待时间（秒），None表示一直等待
+        @param {int|None} after_seq - 只返回序号大于该值的帧
+        @param {float} poll_interval - 轮询间隔（秒）
+        @returns {SharedFrameHandle|None} 帧句柄，超时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            handle = self.get_frame(after_seq)
+            if handle is not None:
+                return handle
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval)
+
+    def close(self):
+        """
+        断开连接（不删除共享内存）
+        """
+        self.ring.release_views()
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning(f"仍有帧视图引用共享内存 {self.name}，将在进程退出时释放")
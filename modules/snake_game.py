@@ -168,6 +168,20 @@ class SnakeGame:
             # 删除尾部
             self.snake.pop()
     
+    def handle_gesture_result(self, result):
+        """
+        处理手势识别结果：检测到食指方向时无论是否有手势都更新方向，只有手势时也传递手势；
+        手势取当前保持的手势而不是一次性的开始事件，暂停期间和冷却中的手势依靠持续保持来消耗冷却，
+        重复触发由游戏自身的手势冷却避免
+        
+        @param {GestureResult} result - GestureRecognizer.recognize 返回的识别结果
+        """
+        gesture = result.gestures[0] if result.gestures else None
+        if result.finger_direction:
+            self.handle_gesture(gesture, result.finger_direction)
+        elif gesture:
+            self.handle_gesture(gesture, None)
+    
     def handle_gesture(self, gesture, finger_direction):
         """
         处理手势输入
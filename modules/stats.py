@@ -32,6 +32,7 @@ class StatsTracker:
         # 总计数器
         self.gesture_counts = defaultdict(int)
         self.expression_counts = defaultdict(int)
+        self.face_expression_counts = defaultdict(lambda: defaultdict(int))  # 按面部ID的表情计数
         
         # 时间窗口计数器（用于计算频率）
         self.window_size = 60  # 60秒窗口
@@ -65,17 +66,20 @@ class StatsTracker:
             # 记录时间戳用于频率计算
             self.gesture_history[gesture].append(current_time)
     
-    def record_expressions(self, expressions):
+    def record_expressions(self, expressions, face_id=None):
         """
         记录面部表情
         
         @param {list} expressions - 检测到的表情列表
+        @param {int|None} face_id - 表情所属的面部ID，提供时同时计入该脸的计数
         """
         current_time = time.time()
         
         for expression in expressions:
             # 增加总计数
             self.expression_counts[expression] += 1
+            if face_id is not None:
+                self.face_expression_counts[face_id][expression] += 1
             
             # 记录时间戳用于频率计算
             self.expression_history[expression].append(current_time)
@@ -141,7 +145,10 @@ class StatsTracker:
             },
             "expressions": {
                 "counts": dict(self.expression_counts),
-                "frequencies": {}
+                "frequencies": {},
+                "faces": {
+                    str(face_id): dict(counts) for face_id, counts in self.face_expression_counts.items()
+                }
             }
         }
         
@@ -178,6 +185,7 @@ class StatsTracker:
         # 重置计数器
         self.gesture_counts = defaultdict(int)
         self.expression_counts = defaultdict(int)
+        self.face_expression_counts = defaultdict(lambda: defaultdict(int))
         self.gesture_history = defaultdict(lambda: deque(maxlen=100))
         self.expression_history = defaultdict(lambda: deque(maxlen=100))
         self.session_start_time = time.time()
@@ -0,0 +1,144 @@
+import numpy as np
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from rich.logging import RichHandler
+
+# 设置日志
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+log_file = f"logs/tracing_{datetime.now().strftime('%Y%m%d')}.log"
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    handlers=[
+        RichHandler(rich_tracebacks=True),
+        logging.FileHandler(log_file)
+    ]
+)
+logger = logging.getLogger("tracing")
+
+# 单调时钟与系统时钟的差值，用于把捕获时间换算成浏览器可比较的时间
+MONOTONIC_TO_WALL = time.time() - time.monotonic()
+
+class FrameTrace:
+    """
+    单帧的延迟追踪记录
+
+    从捕获时间戳开始，各处理阶段结束时调用 mark 记录单调时钟时间
+    """
+    def __init__(self, loop, seq, capture_time):
+        """
+        @param {str} loop - 处理循环名称
+        @param {int} seq - 帧序号
+        @param {float} capture_time - 捕获时间戳（time.monotonic）
+        """
+        self.loop = loop
+        self.seq = seq
+        self.stamps = [('capture', capture_time)]
+
+    def mark(self, stage):
+        """
+        记录某个阶段结束的时间
+
+        @param {str} stage - 阶段名称
+        """
+        self.stamps.append((stage, time.monotonic()))
+
+    def durations(self):
+        """
+        @returns {list} 各阶段耗时 [(阶段名称, 毫秒)]，阶段耗时为与上一个时间点的差
+        """
+        return [
+            (stage, (stamp - prev) * 1000)
+            for (_, prev), (stage, stamp) in zip(self.stamps, self.stamps[1:])
+        ]
+
+    def total_ms(self):
+        """
+        @returns {float} 从捕获到最后一个阶段的总耗时（毫秒）
+        """
+        return (self.stamps[-1][1] - self.stamps[0][1]) * 1000
+
+    def to_payload(self):
+        """
+        转换为随帧发送给客户端的数据，capture_time 为系统时间（毫秒），
+        浏览器可用 Date.now() - capture_time 计算端到端延迟
+
+        @returns {dict} 追踪数据
+        """
+        return {
+            'seq': self.seq,
+            'capture_time': (self.stamps[0][1] + MONOTONIC_TO_WALL) * 1000,
+            'stages': {stage: round(ms, 2) for stage, ms in self.durations()},
+            'total': round(self.total_ms(), 2)
+        }
+
+class LatencyTracker:
+    """
+    延迟统计器，按处理循环和阶段维护滚动窗口并计算分位数
+    """
+    def __init__(self, window=300):
+        """
+        @param {int} window - 每个阶段保留的最近样本数
+        """
+        self.window = window
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.lock = threading.Lock()
+
+    def start(self, loop, seq, capture_time):
+        """
+        为一帧创建追踪记录
+
+        @param {str} loop - 处理循环名称
+        @param {int} seq - 帧序号
+        @param {float} capture_time - 捕获时间戳（time.monotonic）
+        @returns {FrameTrace} 追踪记录
+        """
+        return FrameTrace(loop, seq, capture_time)
+
+    def record(self, trace):
+        """
+        将一帧的追踪记录计入统计
+
+        @param {FrameTrace} trace - 追踪记录
+        """
+        with self.lock:
+            for stage, ms in trace.durations():
+                self.samples[(trace.loop, stage)].append(ms)
+            self.samples[(trace.loop, 'total')].append(trace.total_ms())
+
+    def get_summary(self):
+        """
+        获取各循环各阶段的延迟分位数
+
+        @returns {dict} {循环: {阶段: {count, mean, p50, p95, p99}}}，单位毫秒
+        """
+        with self.lock:
+            snapshot = {key: np.fromiter(values, dtype=np.float64) for key, values in self.samples.items()}
+
+        summary = {}
+        for (loop, stage), data in snapshot.items():
+            if data.size == 0:
+                continue
+            p50, p95, p99 = np.percentile(data, [50, 95, 99])
+            summary.setdefault(loop, {})[stage] = {
+                'count': int(data.size),
+                'mean': round(float(data.mean()), 2),
+                'p50': round(float(p50), 2),
+                'p95': round(float(p95), 2),
+                'p99': round(float(p99), 2)
+            }
+        return summary
+
+    def reset(self):
+        """
+        清空统计样本
+        """
+        with self.lock:
+            self.samples.clear()
+        logger.info("延迟统计已重置")
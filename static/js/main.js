@@ -6,6 +6,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const stopBtn = document.getElementById('stop-btn');
     const gestureResult = document.getElementById('gesture-result');
     const effectBtn = document.getElementById('effect-btn');
+    const backgroundBtn = document.getElementById('background-btn');
     const faceBtn = document.getElementById('face-btn');
     const keyboardBtn = document.getElementById('keyboard-btn');
     
@@ -72,6 +73,12 @@ document.addEventListener('DOMContentLoaded', function() {
             resultText += '<br>表情: 未检测到';
         }
         
+        // 端到端延迟（从摄像头捕获到浏览器收到），需服务端开启追踪数据
+        if (data.trace) {
+            const glassToGlass = Date.now() - data.trace.capture_time;
+            resultText += '<br>延迟: ' + Math.round(glassToGlass) + ' ms（服务端 ' + Math.round(data.trace.total) + ' ms）';
+        }
+        
         gestureResult.innerHTML = resultText;
         gestureResult.style.color = resultText.includes('未检测到') ? '#f44336' : '#4caf50';
         
@@ -95,6 +102,7 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
     let effectEnabled = false;
+    let backgroundEnabled = false;
     let faceRecognitionEnabled = false;
     let keyboardShortcutsEnabled = false;
     
@@ -115,6 +123,23 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
     
+    // 背景虚化按钮点击事件
+    backgroundBtn.addEventListener('click', function() {
+        socket.emit('toggle_effect', {effect: 'background'}, function(response) {
+            console.log('收到切换背景虚化响应:', response);
+            if (response && response.status === 'success') {
+                backgroundEnabled = response.enabled;
+                if (backgroundEnabled) {
+                    backgroundBtn.textContent = '关闭背景虚化';
+                    backgroundBtn.classList.add('active');
+                } else {
+                    backgroundBtn.textContent = '开启背景虚化';
+                    backgroundBtn.classList.remove('active');
+                }
+            }
+        });
+    });
+    
     // 面部识别按钮点击事件
     faceBtn.addEventListener('click', function() {
         socket.emit('toggle_face_recognition', {}, function(response) {
@@ -168,6 +193,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 startBtn.disabled = true;
                 stopBtn.disabled = false;
                 effectBtn.disabled = false;  // 启用特效按钮
+                backgroundBtn.disabled = false;  // 启用背景虚化按钮
                 faceBtn.disabled = false;    // 启用面部识别按钮
                 keyboardBtn.disabled = false;  // 启用键盘快捷键按钮
             } else {
@@ -196,6 +222,10 @@ document.addEventListener('DOMContentLoaded', function() {
         effectBtn.textContent = '开启黑客帝国特效';
         effectBtn.classList.remove('active');
         effectEnabled = false;
+        backgroundBtn.disabled = true;  // 禁用背景虚化按钮
+        backgroundBtn.textContent = '开启背景虚化';
+        backgroundBtn.classList.remove('active');
+        backgroundEnabled = false;
         faceBtn.disabled = true;    // 禁用面部识别按钮
         faceBtn.textContent = '开启面部识别';
         faceBtn.classList.remove('active');